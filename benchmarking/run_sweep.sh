@@ -0,0 +1,22 @@
+#!/bin/bash
+# run_sweep.sh
+
+python src/evaluator.py \
+--mode sweep \
+--model-names "llama3-8b" \
+--results-dir "./data/results/llmperf" \
+--timeout 600 \
+--num-input-tokens 1000 4000 \
+--num-output-tokens 100 1000 \
+--num-concurrent-requests-list 1 2 4 8 16 \
+--requests-per-concurrency 4 \
+--dispatcher async \
+--llm-api sncloud
+
+# Notes:
+# 1. Add `--slo-threshold 2.0` to search, for each input and output tokens combination, the highest concurrency whose
+#   p99 time to first token stays under 2 seconds instead of running the concurrency grid. The metric and quantile
+#   can be changed with `--slo-metric` and `--slo-quantile`, and the search range with `--max-concurrency`.
+#
+# 2. All the points are saved to a single `sweep_<model>_<timestamp>.csv` table in the results directory, next to the
+#   usual summary and individual responses files of each point.
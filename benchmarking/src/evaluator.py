@@ -38,30 +38,39 @@ def str2bool(value: str) -> bool:
 
 def main() -> None:
     from benchmarking.src.performance_evaluation import CustomPerformanceEvaluator, SyntheticPerformanceEvaluator
+    from benchmarking.src.sweep_evaluation import SLO_METRICS, SLO_QUANTILES, SweepPerformanceEvaluator
 
     parser = argparse.ArgumentParser(
-        description="""Run a token throughput and latency benchmark. You have the option of running in two different 
-            modes - 'custom' or 'synthetic'.
+        description="""Run a token throughput and latency benchmark. You have the option of running in three different 
+            modes - 'custom', 'synthetic' or 'sweep'.
             
             Custom: You provide your own dataset via the `input-file-path argument. We will run the performance 
                     evaluation with the provided dataset.
                     
             Synthetic: You provide the number of input tokens, number of output tokens, and number of requests. We 
-                    will generate n input prompts for you where n is the number of requests specified."""
+                    will generate n input prompts for you where n is the number of requests specified.
+
+            Sweep: You provide lists of concurrencies, input tokens and output tokens, and a synthetic run is made 
+                    for each combination. Alternatively, you provide a latency threshold and we search the highest 
+                    concurrency meeting it."""
     )
 
     # Distinguish between custom and synthetic dataset runs
     parser.add_argument(
         '--mode',
-        choices=['custom', 'synthetic'],
+        choices=['custom', 'synthetic', 'sweep'],
         required=True,
-        help="""Run mode for the performance evaluation. You have two options to choose from - 'custom' or 'synthetic'.
+        help="""Run mode for the performance evaluation. You have three options to choose from - 'custom',
+            'synthetic' or 'sweep'.
             
             Custom: You provide your own dataset via the `input-file-path argument. We will run the performance 
                     evaluation with the provided dataset.
                 
             Synthetic: You provide the number of input tokens, number of output tokens, and number of requests. We 
-                    will generate n input prompts for you where n is the number of requests specified.""",
+                    will generate n input prompts for you where n is the number of requests specified.
+
+            Sweep: You provide lists of concurrencies, input tokens and output tokens, or a latency threshold for 
+                    searching the highest concurrency meeting it. Results are consolidated in a single table.""",
     )
 
     # Required Common Argurments
@@ -108,6 +117,49 @@ def main() -> None:
         help='Sampling parameters to send with the each request to the LLM API. (default: %(default)s)',
     )
 
+    parser.add_argument(
+        '--dispatcher',
+        choices=['threads', 'async'],
+        required=False,
+        default='threads',
+        help="""How requests are sent. 'threads' uses one thread per concurrent request, 'async' sends all requests
+            from a single event loop and supports thousands of concurrent streams. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--request-rate',
+        type=float,
+        required=False,
+        default=None,
+        help="""Target arrival rate in requests per second. When set, requests are sent in open loop at this rate
+            no matter how fast the server answers. Requires `--dispatcher async`. (default: closed loop)""",
+    )
+
+    parser.add_argument(
+        '--arrival-distribution',
+        choices=['poisson', 'constant'],
+        required=False,
+        default='poisson',
+        help='Distribution of the inter-arrival times in open loop mode. (default: %(default)s)',
+    )
+
+    parser.add_argument(
+        '--keep-alive',
+        type=str2bool,
+        required=False,
+        default=True,
+        help="""Whether HTTP connections are kept open and reused between requests. Set it to False to measure the
+            time to first token of cold connections on every request. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        '--http2',
+        type=str2bool,
+        required=False,
+        default=False,
+        help='Whether to negotiate HTTP/2 with the endpoint. (default: %(default)s)',
+    )
+
     args, unknown = parser.parse_known_args()
 
     # Parse user metadata.
@@ -153,6 +205,11 @@ def main() -> None:
             input_file_path=args.input_file_path,
             save_response_texts=args.save_llm_responses,
             llm_api=args.llm_api,
+            dispatcher=args.dispatcher,
+            request_rate=args.request_rate,
+            arrival_distribution=args.arrival_distribution,
+            keep_alive=args.keep_alive,
+            http2=args.http2,
         )
 
         # Run performance evaluation
@@ -205,6 +262,11 @@ def main() -> None:
                 timeout=args.timeout,
                 user_metadata=user_metadata,
                 llm_api=args.llm_api,
+                dispatcher=args.dispatcher,
+                request_rate=args.request_rate,
+                arrival_distribution=args.arrival_distribution,
+                keep_alive=args.keep_alive,
+                http2=args.http2,
             )
 
             # Run performance evaluation
@@ -215,8 +277,116 @@ def main() -> None:
                 sampling_params=json.loads(args.sampling_params),
             )
 
+    # Parameter sweep path
+    elif args.mode == 'sweep':
+        # Sweep specific arguments
+        parser.add_argument(
+            '--model-names',
+            type=str,
+            required=True,
+            help='The name of the models to use for this performance evaluation.',
+        )
+        parser.add_argument(
+            '--num-input-tokens',
+            type=int,
+            nargs='+',
+            default=[550],
+            help='The numbers of input tokens to sweep over. (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--num-output-tokens',
+            type=int,
+            nargs='+',
+            default=[150],
+            help='The numbers of output tokens to sweep over. (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--num-concurrent-requests-list',
+            type=int,
+            nargs='+',
+            default=[1, 2, 4, 8, 16],
+            help='The numbers of concurrent requests to sweep over in grid mode. (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--num-requests',
+            type=int,
+            required=False,
+            default=None,
+            help="""The number of requests of each point. When not set, each point sends `requests-per-concurrency` 
+                requests per concurrent request. (default: %(default)s)""",
+        )
+        parser.add_argument(
+            '--requests-per-concurrency',
+            type=int,
+            default=4,
+            help='The number of requests per concurrent request of each point. (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--slo-threshold',
+            type=float,
+            required=False,
+            default=None,
+            help="""Latency threshold in seconds. When set, instead of running the grid we search the highest 
+                concurrency whose `slo-quantile` of `slo-metric` stays under it. (default: grid mode)""",
+        )
+        parser.add_argument(
+            '--slo-metric',
+            choices=list(SLO_METRICS),
+            default='ttft',
+            help='Latency metric compared to the threshold. (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--slo-quantile',
+            choices=SLO_QUANTILES,
+            default='p99',
+            help='Quantile of the latency metric compared to the threshold. (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--max-concurrency',
+            type=int,
+            default=256,
+            help='Highest concurrency tried by the search. (default: %(default)s)',
+        )
+
+        # Parse arguments and run the sweep for each model
+        args = parser.parse_args()
+        model_names = args.model_names.strip().split()
+
+        for model_idx, model_name in enumerate(model_names):
+            user_metadata['model_idx'] = model_idx
+            with SweepPerformanceEvaluator(
+                model_name=model_name,
+                results_dir=args.results_dir,
+                llm_api=args.llm_api,
+                user_metadata=user_metadata,
+                timeout=args.timeout,
+                dispatcher=args.dispatcher,
+                sampling_params=json.loads(args.sampling_params),
+                num_requests=args.num_requests,
+                requests_per_concurrency=args.requests_per_concurrency,
+                keep_alive=args.keep_alive,
+                http2=args.http2,
+            ) as sweep_evaluator:
+                if args.slo_threshold is None:
+                    sweep_evaluator.run_grid(
+                        args.num_concurrent_requests_list, args.num_input_tokens, args.num_output_tokens
+                    )
+                else:
+                    for num_input_tokens in args.num_input_tokens:
+                        for num_output_tokens in args.num_output_tokens:
+                            sweep_evaluator.find_max_concurrency(
+                                num_input_tokens,
+                                num_output_tokens,
+                                slo_threshold=args.slo_threshold,
+                                slo_metric=args.slo_metric,
+                                slo_quantile=args.slo_quantile,
+                                max_concurrency=args.max_concurrency,
+                            )
+                print(sweep_evaluator.get_table().to_string(index=False))
+                print(f'Consolidated results saved to {sweep_evaluator.table_file_path}')
+
     else:
-        raise Exception("Performance eval mode not valid. Available values are 'custom', 'synthetic'")
+        raise Exception("Performance eval mode not valid. Available values are 'custom', 'synthetic', 'sweep'")
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 # General metrics
+REQUEST_IDX = 'request_idx'
 ERROR_MSG = 'error_msg'
 ERROR_CODE = 'error_code'
 ERROR_CODE_FREQ = 'error_code_frequency'
@@ -11,6 +12,9 @@ REQ_START_TIME = 'start_time'
 REQ_END_TIME = 'end_time'
 BATCH_SIZE_USED = 'batch_size_used'
 QUEUE_TIME = 'queue_time'
+DISPATCH_DELAY = 'client_dispatch_delay_s'
+STREAM_RECORD = 'stream_record'
+TOKEN_COUNTING_TIME = 'token_counting_time_s'
 
 # Client-side metrics
 TTFT = 'client_ttft_s'
@@ -21,6 +25,11 @@ OUTPUT_THROUGHPUT = 'client_mean_output_token_per_s'
 NUM_INPUT_TOKENS = 'number_input_tokens'
 NUM_OUTPUT_TOKENS = 'number_output_tokens'
 NUM_TOTAL_TOKENS = 'number_total_tokens'
+CLIENT_OVERHEAD = 'client_overhead_s'
+CONNECTION_REUSED = 'client_connection_reused'
+CONNECT_TIME = 'client_connect_time_s'
+TTFT_COLD = 'client_ttft_cold_connection_s'
+TTFT_WARM = 'client_ttft_warm_connection_s'
 
 # Server-side metrics
 TTFT_SERVER = 'server_ttft_s'
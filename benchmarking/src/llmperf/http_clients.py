@@ -0,0 +1,96 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from benchmarking.src.llmperf import common_metrics
+
+# Read timeout is disabled because long generations may stream for minutes
+HTTP_TIMEOUT = httpx.Timeout(60.0, read=None)
+# httpx connection pools scan all their connections on every request, so large numbers of streams are spread over
+# several small clients instead of a single big one
+CONNECTIONS_PER_CLIENT = 16
+
+
+def _get_limits(max_connections: Optional[int], keep_alive: bool) -> httpx.Limits:
+    # without keep-alive, connections are closed after each response so every request opens a new one
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections if keep_alive else 0)
+
+
+def create_client(keep_alive: bool = True, http2: bool = False, max_connections: Optional[int] = None) -> httpx.Client:
+    """Creates a sync HTTP client, meant to be used by a single thread for all its requests
+
+    Args:
+        keep_alive (bool): whether connections are kept open and reused between requests
+        http2 (bool): whether to negotiate HTTP/2 with the server. Requires the `h2` package.
+        max_connections (int, optional): connection limit of the client. None means no limit.
+
+    Returns:
+        httpx.Client: HTTP client
+    """
+    return httpx.Client(limits=_get_limits(max_connections, keep_alive), timeout=HTTP_TIMEOUT, http2=http2)
+
+
+class AsyncClientPool:
+    """Set of async HTTP clients sharing the load of many concurrent streams"""
+
+    def __init__(
+        self,
+        num_streams: int,
+        max_connections_per_client: Optional[int] = CONNECTIONS_PER_CLIENT,
+        keep_alive: bool = True,
+        http2: bool = False,
+    ) -> None:
+        """
+        Args:
+            num_streams (int): expected number of concurrent streams
+            max_connections_per_client (int, optional): connection limit of each client. None means no limit.
+            keep_alive (bool): whether connections are kept open and reused between requests
+            http2 (bool): whether to negotiate HTTP/2 with the server. Requires the `h2` package.
+        """
+        num_clients = max(1, math.ceil(num_streams / CONNECTIONS_PER_CLIENT))
+        limits = _get_limits(max_connections_per_client, keep_alive)
+        self.clients = [httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT, http2=http2) for _ in range(num_clients)]
+
+    def get(self, idx: int) -> httpx.AsyncClient:
+        """Gets the client assigned to a stream or request index"""
+        return self.clients[idx % len(self.clients)]
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(client.aclose() for client in self.clients))
+
+
+class ConnectionTrace:
+    """Records from the httpcore trace events of a request whether it opened a new connection, and how long the TCP
+    and TLS setup took. Pass it as the `trace` extension of the request, using `atrace` for async clients.
+    """
+
+    def __init__(self) -> None:
+        self.connect_start_time: Optional[float] = None
+        self.connect_end_time: Optional[float] = None
+
+    def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == 'connection.connect_tcp.started':
+            self.connect_start_time = time.monotonic()
+        elif event_name in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+            self.connect_end_time = time.monotonic()
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self(event_name, info)
+
+    def populate_metrics(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds the connection reuse and setup time metrics
+
+        Args:
+            metrics (dict): metrics dictionary
+
+        Returns:
+            dict: updated metrics dictionary
+        """
+        metrics[common_metrics.CONNECTION_REUSED] = self.connect_start_time is None
+        metrics[common_metrics.CONNECT_TIME] = 0.0
+        if self.connect_start_time is not None and self.connect_end_time is not None:
+            metrics[common_metrics.CONNECT_TIME] = self.connect_end_time - self.connect_start_time
+        return metrics
@@ -1,9 +1,10 @@
 import json
 import time
 from collections.abc import Iterable
+from functools import lru_cache
 from typing import Any, Dict, Generator, List, Optional, Tuple, Union
 
-from transformers import AutoTokenizer
+from transformers import AutoTokenizer, PreTrainedTokenizerBase
 
 SAMBANOVA_URL = 'https://api.sambanova.ai/v1/chat/completions'
 NUM_RNG_ATTEMPTS = 10  # Unlikely to be used in practice: prevents eternal WHILE-loops
@@ -53,14 +54,16 @@ class LLMPerfResults:
         return json.dumps(data)
 
 
-def get_tokenizer(model_name: str) -> AutoTokenizer:
-    """Gets generic tokenizer according to model type
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str) -> PreTrainedTokenizerBase:
+    """Gets generic tokenizer according to model type. Tokenizers are loaded once per process and shared by all
+    the evaluators.
 
     Args:
         model_name (str): model name
 
     Returns:
-        AutoTokenizer: generic HuggingFace tokenizer
+        PreTrainedTokenizerBase: generic HuggingFace tokenizer
     """
     # Using NousrResearch for calling out model tokenizers without requesting access.
     # Ref: https://huggingface.co/NousResearch
@@ -0,0 +1,229 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import httpx
+from transformers import PreTrainedTokenizerBase
+
+from benchmarking.src.llmperf import common_metrics
+from benchmarking.src.llmperf.http_clients import AsyncClientPool
+from benchmarking.src.llmperf.models import LLMResponse, RequestConfig
+from benchmarking.src.llmperf.sambanova_client import allm_request
+
+ARRIVAL_DISTRIBUTIONS = ['poisson', 'constant']
+
+
+class AsyncLoadGenerator:
+    """Asyncio based dispatcher that sends LLM requests over pooled async HTTP clients.
+
+    Two load modes are supported:
+        - closed loop (`request_rate` is None): `num_concurrent_requests` workers keep exactly that many streams in
+          flight, sending a new request as soon as the previous one finishes.
+        - open loop (`request_rate` set): requests are launched following a target arrival rate in requests per
+          second, no matter how fast the server answers. Inter-arrival times follow a Poisson process or a constant
+          rate.
+    """
+
+    def __init__(
+        self,
+        tokenizer: PreTrainedTokenizerBase,
+        num_concurrent_requests: int,
+        timeout: int = 600,
+        request_rate: Optional[float] = None,
+        arrival_distribution: str = 'poisson',
+        max_in_flight: Optional[int] = None,
+        stop_event: Optional[threading.Event] = None,
+        client_pool: Optional[AsyncClientPool] = None,
+        keep_alive: bool = True,
+        http2: bool = False,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            tokenizer (PreTrainedTokenizerBase): tokenizer for counting tokens
+            num_concurrent_requests (int): number of concurrent streams kept in closed loop mode
+            timeout (int): time in seconds after which no new requests are sent
+            request_rate (float, optional): target arrival rate in requests per second. When set, the generator runs
+                in open loop mode. Defaults to None.
+            arrival_distribution (str): 'poisson' or 'constant' inter-arrival times for open loop mode.
+            max_in_flight (int, optional): safety cap of outstanding requests in open loop mode. Requests that
+                cannot be sent on time are delayed and the delay is recorded in the request metrics.
+            stop_event (threading.Event, optional): event that stops sending new requests when set.
+            client_pool (AsyncClientPool, optional): clients to reuse across runs. New ones are created per run if not
+                provided.
+            keep_alive (bool): whether the created clients keep connections open between requests. When False,
+                every request opens a new connection.
+            http2 (bool): whether the created clients negotiate HTTP/2. Requires the `h2` package.
+            seed (int, optional): seed for the Poisson arrival times.
+        """
+        if request_rate is not None and request_rate <= 0:
+            raise ValueError(f'request_rate must be a positive number. Got {request_rate}')
+        if arrival_distribution not in ARRIVAL_DISTRIBUTIONS:
+            raise ValueError(f'arrival_distribution must be one of {ARRIVAL_DISTRIBUTIONS}. Got {arrival_distribution}')
+
+        self.tokenizer = tokenizer
+        self.num_concurrent_requests = num_concurrent_requests
+        self.timeout = timeout
+        self.request_rate = request_rate
+        self.arrival_distribution = arrival_distribution
+        self.max_in_flight = max_in_flight
+        self.stop_event = stop_event or threading.Event()
+        self.client_pool = client_pool
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        self.rng = random.Random(seed)
+
+    @property
+    def is_open_loop(self) -> bool:
+        return self.request_rate is not None
+
+    def _next_interarrival_time(self) -> float:
+        """Gets the time to wait before launching the next request in open loop mode"""
+        assert self.request_rate is not None
+        if self.arrival_distribution == 'poisson':
+            return self.rng.expovariate(self.request_rate)
+        return 1.0 / self.request_rate
+
+    def _should_stop(self, start_time: float) -> bool:
+        return self.stop_event.is_set() or (time.monotonic() - start_time >= self.timeout)
+
+    def _create_client_pool(self) -> AsyncClientPool:
+        """Creates clients able to hold the configured number of concurrent streams"""
+        if self.is_open_loop:
+            return AsyncClientPool(
+                self.max_in_flight or self.num_concurrent_requests,
+                max_connections_per_client=None,
+                keep_alive=self.keep_alive,
+                http2=self.http2,
+            )
+        return AsyncClientPool(self.num_concurrent_requests, keep_alive=self.keep_alive, http2=self.http2)
+
+    async def _send(
+        self,
+        client: httpx.AsyncClient,
+        request_config: RequestConfig,
+        dispatch_delay: float,
+        on_response: Optional[Callable[[LLMResponse], None]],
+    ) -> LLMResponse:
+        req_metrics, response_text, request_config = await allm_request(
+            request_config, self.tokenizer, client, defer_token_counting=True
+        )
+        req_metrics[common_metrics.DISPATCH_DELAY] = dispatch_delay
+
+        # Create response object containing metrics, generated text, and corresponding request config. Tokens are
+        # counted off the receive path, see `BasePerformanceEvaluator.finalize_responses`
+        response_object = LLMResponse(
+            metrics=req_metrics,
+            response_text=response_text,
+            request_config=request_config,
+            stream_record=req_metrics.pop(common_metrics.STREAM_RECORD, None),
+        )
+        if on_response:
+            on_response(response_object)
+        return response_object
+
+    async def _run_closed_loop(
+        self,
+        client_pool: AsyncClientPool,
+        request_configs: List[RequestConfig],
+        start_time: float,
+        on_response: Optional[Callable[[LLMResponse], None]],
+        keep_responses: bool,
+    ) -> List[LLMResponse]:
+        pending = iter(request_configs)
+        llm_responses: List[LLMResponse] = []
+
+        async def worker(worker_idx: int) -> None:
+            client = client_pool.get(worker_idx)
+            for request_config in pending:
+                if self._should_stop(start_time):
+                    break
+                response = await self._send(client, request_config, 0.0, on_response)
+                if keep_responses:
+                    llm_responses.append(response)
+
+        await asyncio.gather(*(worker(worker_idx) for worker_idx in range(self.num_concurrent_requests)))
+        return llm_responses
+
+    async def _run_open_loop(
+        self,
+        client_pool: AsyncClientPool,
+        request_configs: List[RequestConfig],
+        start_time: float,
+        on_response: Optional[Callable[[LLMResponse], None]],
+        keep_responses: bool,
+    ) -> List[LLMResponse]:
+        semaphore = asyncio.Semaphore(self.max_in_flight) if self.max_in_flight else None
+        # Only the tasks in flight are referenced, so finished responses can be released
+        tasks: Set[asyncio.Task[None]] = set()
+        llm_responses: Dict[int, LLMResponse] = {}
+
+        async def launch(launch_idx: int, request_config: RequestConfig, scheduled_time: float) -> None:
+            client = client_pool.get(request_config.request_idx)
+            if semaphore is None:
+                response = await self._send(client, request_config, time.monotonic() - scheduled_time, on_response)
+            else:
+                async with semaphore:
+                    response = await self._send(client, request_config, time.monotonic() - scheduled_time, on_response)
+            if keep_responses:
+                llm_responses[launch_idx] = response
+
+        # Arrival times are computed from the schedule, not from the previous launch, so slow launches don't
+        # lower the effective rate
+        scheduled_time = time.monotonic()
+        for launch_idx, request_config in enumerate(request_configs):
+            if self._should_stop(start_time):
+                break
+            delay = scheduled_time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(launch(launch_idx, request_config, scheduled_time))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled_time += self._next_interarrival_time()
+
+        await asyncio.gather(*tasks)
+        return [llm_responses[launch_idx] for launch_idx in sorted(llm_responses)]
+
+    async def arun(
+        self,
+        request_configs: List[RequestConfig],
+        start_time: Optional[float] = None,
+        on_response: Optional[Callable[[LLMResponse], None]] = None,
+        keep_responses: bool = True,
+    ) -> List[LLMResponse]:
+        """Sends all the requests following the configured load mode
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+            start_time (float, optional): monotonic start time used for the timeout. Defaults to now.
+            on_response (callable, optional): callback called with each completed response, e.g. to update
+                progress bars.
+            keep_responses (bool): whether to return the completed responses. When False, each response is only
+                handed to `on_response`, so long runs don't hold all of them in memory.
+
+        Returns:
+            list: completed LLMResponse objects, in completion order for closed loop and arrival order for open loop.
+            Empty when `keep_responses` is False.
+        """
+        start_time = time.monotonic() if start_time is None else start_time
+        client_pool = self.client_pool or self._create_client_pool()
+        try:
+            if self.is_open_loop:
+                return await self._run_open_loop(client_pool, request_configs, start_time, on_response, keep_responses)
+            return await self._run_closed_loop(client_pool, request_configs, start_time, on_response, keep_responses)
+        finally:
+            if self.client_pool is None:
+                await client_pool.aclose()
+
+    def run(
+        self,
+        request_configs: List[RequestConfig],
+        start_time: Optional[float] = None,
+        on_response: Optional[Callable[[LLMResponse], None]] = None,
+        keep_responses: bool = True,
+    ) -> List[LLMResponse]:
+        """Synchronous entry point of `arun` that runs the requests on a new event loop"""
+        return asyncio.run(self.arun(request_configs, start_time, on_response, keep_responses))
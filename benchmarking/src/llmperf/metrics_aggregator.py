@@ -0,0 +1,234 @@
+import json
+import math
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+from benchmarking.src.llmperf import common_metrics
+
+# Metrics with descriptive statistics in the benchmark summary
+SUMMARY_METRICS = [
+    common_metrics.TTFT,
+    common_metrics.TTFT_COLD,
+    common_metrics.TTFT_WARM,
+    common_metrics.E2E_LAT,
+    common_metrics.REQ_OUTPUT_THROUGHPUT,
+    common_metrics.NUM_INPUT_TOKENS,
+    common_metrics.NUM_OUTPUT_TOKENS,
+    common_metrics.CLIENT_OVERHEAD,
+]
+SUMMARY_QUANTILES = [0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+# Metrics and quantiles shown in the progress bars while a benchmark runs
+LIVE_METRICS = {
+    'TTFT': common_metrics.TTFT,
+    'E2E': common_metrics.E2E_LAT,
+    'tok/s': common_metrics.REQ_OUTPUT_THROUGHPUT,
+}
+LIVE_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error, in the style of DDSketch and HDR histograms.
+
+    Values are counted in logarithmic buckets whose width keeps every estimated quantile within `relative_accuracy`
+    of an actual value, so memory only grows with the range of the values and not with their number. Count, sum,
+    min and max are kept exactly.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.005) -> None:
+        """
+        Args:
+            relative_accuracy (float): maximum relative error of the estimated quantiles
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f'relative_accuracy must be between 0 and 1. Got {relative_accuracy}')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Counter[int] = Counter()
+        # values lower or equal to zero are counted apart since they have no logarithm
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        if value > 0:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.sum += value
+        self.sum_squares += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Adds all the values of another sketch with the same relative accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Only sketches with the same relative accuracy can be merged.')
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Gets the estimated value at a quantile between 0 and 1, or NaN if the sketch is empty"""
+        if not self.count:
+            return math.nan
+        # same rank as the linear interpolation of pandas and numpy, without interpolating
+        rank = q * (self.count - 1)
+        cumulative_count = self.zero_count
+        if rank < cumulative_count:
+            return max(self.min, 0.0)
+        for idx in sorted(self.buckets):
+            cumulative_count += self.buckets[idx]
+            if rank < cumulative_count:
+                value = 2 * self.gamma**idx / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
+
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation, as computed by pandas"""
+        if self.count < 2:
+            return math.nan
+        variance = (self.sum_squares - self.sum * self.sum / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class StreamingMetricsAggregator:
+    """Aggregates per request metrics as the responses arrive, keeping a quantile sketch per metric instead of the
+    full list of responses. Optionally spills every record to a JSON lines file as soon as it is added, so long runs
+    keep their raw data even if they are interrupted.
+    """
+
+    def __init__(
+        self,
+        metrics: List[str] = SUMMARY_METRICS,
+        relative_accuracy: float = 0.005,
+        spill_file_path: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            metrics (list): metrics to keep statistics for
+            relative_accuracy (float): maximum relative error of the estimated quantiles
+            spill_file_path (str, optional): JSON lines file the records are appended to
+        """
+        self.metrics = metrics
+        self.sketches = {metric: QuantileSketch(relative_accuracy) for metric in metrics}
+        self.num_records = 0
+        self.num_output_tokens = 0.0
+        self.error_codes: Counter[Any] = Counter()
+        self.spill_file_path = spill_file_path
+        self._spill_file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+        if spill_file_path is not None:
+            Path(spill_file_path).parent.mkdir(parents=True, exist_ok=True)
+            self._spill_file = open(spill_file_path, 'w')
+
+    @staticmethod
+    def _values(value: Any) -> Iterable[float]:
+        """Gets the numeric values of a metric, which may hold a single value or a list of them"""
+        values = value if isinstance(value, (list, tuple)) else [value]
+        return [v for v in values if v is not None and not (isinstance(v, float) and math.isnan(v))]
+
+    def add(self, metrics: Dict[str, Any]) -> None:
+        """Adds the final metrics of a request. Errored requests only count towards the error statistics.
+
+        Args:
+            metrics (dict): metrics of the request
+        """
+        with self._lock:
+            self.num_records += 1
+            error_code = metrics.get(common_metrics.ERROR_CODE)
+            if error_code is not None and not (isinstance(error_code, float) and math.isnan(error_code)):
+                self.error_codes[error_code] += 1
+            else:
+                for metric in self.metrics:
+                    for value in self._values(metrics.get(metric)):
+                        self.sketches[metric].add(value)
+                self.num_output_tokens += sum(self._values(metrics.get(common_metrics.NUM_OUTPUT_TOKENS)))
+
+            if self._spill_file is not None:
+                self._spill_file.write(json.dumps(metrics, default=str) + '\n')
+                self._spill_file.flush()
+
+    def merge(self, other: 'StreamingMetricsAggregator') -> None:
+        """Adds the statistics of another aggregator, e.g. one per worker process"""
+        with self._lock:
+            for metric, sketch in other.sketches.items():
+                if metric in self.sketches:
+                    self.sketches[metric].merge(sketch)
+            self.num_records += other.num_records
+            self.num_output_tokens += other.num_output_tokens
+            self.error_codes.update(other.error_codes)
+
+    @property
+    def num_errors(self) -> int:
+        return sum(self.error_codes.values())
+
+    def format_live_stats(self) -> str:
+        """Formats the rolling quantiles of the main metrics for the progress bars, e.g.
+        'TTFT p50/p90/p99 0.21/0.35/0.52s'
+        """
+        stats = []
+        with self._lock:
+            for label, metric in LIVE_METRICS.items():
+                sketch = self.sketches.get(metric)
+                if sketch is None or not sketch.count:
+                    continue
+                values = '/'.join(f'{sketch.quantile(q):.2f}' for q in LIVE_QUANTILES)
+                quantiles = '/'.join(f'p{int(q * 100)}' for q in LIVE_QUANTILES)
+                stats.append(f'{label} {quantiles} {values}{"s" if label != "tok/s" else ""}')
+            if self.error_codes:
+                stats.append(f'errors {self.num_errors}')
+        return ' | '.join(stats)
+
+    def build_summary(self, duration: float) -> Dict[str, Any]:
+        """Builds the summary of all the added requests, with the same structure as
+        `BasePerformanceEvaluator.build_metrics_summary`
+
+        Args:
+            duration (float): duration of the run in seconds
+
+        Returns:
+            dict: summary metrics
+        """
+        summary: Dict[str, Any] = {}
+        with self._lock:
+            for metric in self.metrics:
+                sketch = self.sketches[metric]
+                summary[metric] = {
+                    'quantiles': {f'p{int(q * 100)}': round(sketch.quantile(q), 4) for q in SUMMARY_QUANTILES},
+                    'mean': round(sketch.mean, 4),
+                    'min': round(sketch.min, 4) if sketch.count else math.nan,
+                    'max': round(sketch.max, 4) if sketch.count else math.nan,
+                    'stddev': round(sketch.stddev, 4),
+                }
+
+            num_completed_requests = self.num_records - self.num_errors
+            summary[common_metrics.NUM_REQ_STARTED] = self.num_records
+            summary[common_metrics.ERROR_RATE] = self.num_errors / self.num_records if self.num_records else 0
+            summary[common_metrics.NUM_ERRORS] = self.num_errors
+            summary[common_metrics.ERROR_CODE_FREQ] = str(dict(self.error_codes))
+            summary[common_metrics.OUTPUT_THROUGHPUT] = round(self.num_output_tokens / duration, 4)
+            summary[common_metrics.NUM_COMPLETED_REQUESTS] = num_completed_requests
+            summary[common_metrics.COMPLETED_REQUESTS_PER_MIN] = round(num_completed_requests / duration * 60, 4)
+        return summary
+
+    def close(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
@@ -0,0 +1,187 @@
+"""Local stand-in for an OpenAI compatible streaming endpoint.
+
+It streams `max_tokens` chunks with a configurable time to first token and inter-token latency, followed by a
+`usage` chunk and `[DONE]`, so the benchmarking dispatchers can be exercised without a real endpoint. An optional
+number of server slots emulates queueing: requests beyond that number wait for a free slot before being answered.
+
+Usage:
+    python -m benchmarking.src.llmperf.mock_sse_server --port 8000 --ttft 0.2 --itl 0.01
+    export SAMBANOVA_URL=http://localhost:8000/v1/chat/completions
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class MockSSEServer:
+    """Minimal asyncio HTTP/1.1 server streaming chat completion chunks with keep-alive support"""
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        ttft: float = 0.1,
+        inter_token_latency: float = 0.01,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            host (str): host to bind to
+            port (int): port to bind to, 0 picks a free port
+            ttft (float): seconds before the first chunk is sent
+            inter_token_latency (float): seconds between consecutive chunks
+            max_concurrency (int, optional): number of requests served at the same time, the rest are queued
+        """
+        self.host = host
+        self.port = port
+        self.ttft = ttft
+        self.inter_token_latency = inter_token_latency
+        self.max_concurrency = max_concurrency
+        self.num_connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def _format_event(payload: Dict[str, Any] | str) -> bytes:
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        event = f'data: {data}\n\n'.encode()
+        # HTTP chunked transfer encoding frame
+        return f'{len(event):x}\r\n'.encode() + event + b'\r\n'
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode().partition(':')
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+        return request_line.decode().strip(), headers, body
+
+    async def _stream_completion(self, writer: asyncio.StreamWriter, body: bytes, queue_start: float) -> None:
+        request = json.loads(body or b'{}')
+        num_tokens = int(request.get('max_tokens') or 16)
+        model = request.get('model', 'mock-model')
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+        # fields of every chunk of the SambaNova Cloud streaming responses, which the clients parsing them expect
+        chunk_fields = {
+            'id': 'mock',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'system_fingerprint': 'mock',
+        }
+
+        writer.write(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/event-stream\r\n'
+            b'Cache-Control: no-cache\r\n'
+            b'Transfer-Encoding: chunked\r\n'
+            b'Connection: keep-alive\r\n\r\n'
+        )
+        start = time.monotonic()
+        await asyncio.sleep(self.ttft)
+        for idx in range(num_tokens):
+            if idx:
+                await asyncio.sleep(self.inter_token_latency)
+            chunk = {
+                **chunk_fields,
+                'choices': [{'index': 0, 'delta': {'content': ' token'}, 'finish_reason': None}],
+            }
+            writer.write(self._format_event(chunk))
+            await writer.drain()
+
+        total_latency = time.monotonic() - start
+        decode_time = max(total_latency - self.ttft, 1e-9)
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': num_tokens,
+            'total_tokens': prompt_tokens + num_tokens,
+            'time_to_first_token': self.ttft,
+            'total_latency': total_latency,
+            'completion_tokens_after_first_per_sec': (num_tokens - 1) / decode_time,
+            'queue_time': start - queue_start,
+        }
+        writer.write(
+            self._format_event(
+                {**chunk_fields, 'choices': [{'index': 0, 'delta': {'content': ''}, 'finish_reason': 'stop'}]}
+            )
+        )
+        writer.write(self._format_event({**chunk_fields, 'choices': [], 'usage': usage}))
+        writer.write(self._format_event('[DONE]'))
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.num_connections += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                _, headers, body = request
+                queue_start = time.monotonic()
+                if self._slots is None:
+                    await self._stream_completion(writer, body, queue_start)
+                else:
+                    async with self._slots:
+                        await self._stream_completion(writer, body, queue_start)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}/v1/chat/completions'
+
+    async def start(self) -> None:
+        """Starts listening. When the port is 0, `port` is updated with the one assigned by the OS"""
+        if self.max_concurrency:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run a local stand-in SSE server for benchmarking dispatchers.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to bind to. (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to bind to. (default: %(default)s)')
+    parser.add_argument('--ttft', type=float, default=0.1, help='Time to first token in s. (default: %(default)s)')
+    parser.add_argument('--itl', type=float, default=0.01, help='Inter-token latency in s. (default: %(default)s)')
+    parser.add_argument(
+        '--max-concurrency',
+        type=int,
+        default=None,
+        help='Requests served at the same time, the rest are queued. (default: unlimited)',
+    )
+    args = parser.parse_args()
+
+    server = MockSSEServer(args.host, args.port, args.ttft, args.itl, args.max_concurrency)
+    print(f'Serving mock completions at {server.url}')
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -28,6 +28,22 @@ class RequestConfig(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
+class StreamRecord(BaseModel):
+    """Raw data received from a streamed response, used to compute the token based metrics after the stream ends
+
+    Args:
+        chunks_received: The text of each streamed chunk
+        chunks_timings: Time elapsed between each chunk and the previous one (or the request start for the first one)
+        generated_text: The complete generated text
+        total_request_time: End-to-end latency of the request measured from client side
+    """
+
+    chunks_received: List[str]
+    chunks_timings: List[float]
+    generated_text: str
+    total_request_time: float
+
+
 class LLMResponse(BaseModel):
     """The response object created from a response from one of the SambaStudio LLM APIs
 
@@ -35,8 +51,10 @@ class LLMResponse(BaseModel):
         metrics: Dictionary containing the throughput metrics from the endpoint
         response_text: The generated text from the LLM
         request_config: The associated request config
+        stream_record: Raw stream data kept until the token based metrics are computed
     """
 
     metrics: Dict[str, Any]
     response_text: str
     request_config: RequestConfig
+    stream_record: Optional[StreamRecord] = None
@@ -0,0 +1,161 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class PromptCache:
+    """Persistent cache of built prompts and prompt token counts, keyed by tokenizer id, text or template hash and
+    target number of tokens.
+
+    Prompt texts are appended to a single data file that is read through a memory map, and an append-only JSON lines
+    index maps each key to the position of its text and its token count. Loading the cache only reads the index, so
+    repeated runs start without tokenizing anything.
+    """
+
+    DATA_FILENAME = 'prompt_cache.bin'
+    INDEX_FILENAME = 'prompt_cache_index.jsonl'
+
+    def __init__(self, cache_dir: str) -> None:
+        """
+        Args:
+            cache_dir (str): directory where the cache files are stored
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.cache_dir / self.DATA_FILENAME
+        self.index_path = self.cache_dir / self.INDEX_FILENAME
+        self.data_path.touch(exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key -> (offset, length, token count)
+        self._index: Dict[str, Tuple[int, int, int]] = self._load_index()
+        self._mmap: Optional[mmap.mmap] = None
+
+    def _load_index(self) -> Dict[str, Tuple[int, int, int]]:
+        index: Dict[str, Tuple[int, int, int]] = {}
+        if not self.index_path.exists():
+            return index
+        data_size = self.data_path.stat().st_size
+        with open(self.index_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a partially written last line from an interrupted run
+                    continue
+                # entries pointing past the data file come from an interrupted write
+                if entry['offset'] + entry['length'] <= data_size:
+                    index[entry['key']] = (entry['offset'], entry['length'], entry['token_count'])
+        return index
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Gets a short stable hash of a text"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def _make_key(tokenizer_id: str, text_hash: str, target_tokens: Optional[int]) -> str:
+        return f'{tokenizer_id}|{text_hash}|{target_tokens if target_tokens is not None else "exact"}'
+
+    def _read_text(self, offset: int, length: int) -> str:
+        if length == 0:
+            return ''
+        # the memory map is recreated when the data file has grown since it was opened
+        if self._mmap is None or offset + length > len(self._mmap):
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[offset : offset + length].decode('utf-8')
+
+    def _put(self, key: str, text: str, token_count: int) -> None:
+        encoded_text = text.encode('utf-8')
+        with self._lock:
+            # a key looked up concurrently is only stored once, so the index does not grow with duplicates
+            if key in self._index:
+                return
+            with open(self.data_path, 'ab') as data_file:
+                # the data file is locked until the index entry is written, so processes sharing the cache do not
+                # append at the same offset
+                fcntl.flock(data_file, fcntl.LOCK_EX)
+                offset = data_file.seek(0, os.SEEK_END)
+                data_file.write(encoded_text)
+                data_file.flush()
+                with open(self.index_path, 'a') as index_file:
+                    entry = {'key': key, 'offset': offset, 'length': len(encoded_text), 'token_count': token_count}
+                    index_file.write(json.dumps(entry) + '\n')
+            self._index[key] = (offset, len(encoded_text), token_count)
+
+    def get_prompt(self, tokenizer_id: str, template_hash: str, target_tokens: int) -> Optional[Tuple[str, int]]:
+        """Gets a prompt built from a template for a target number of tokens
+
+        Args:
+            tokenizer_id (str): name or path of the tokenizer
+            template_hash (str): hash of the template the prompt is built from, see `hash_text`
+            target_tokens (int): target number of tokens of the prompt
+
+        Returns:
+            tuple: prompt and its token count, or None if it is not cached
+        """
+        entry = self._index.get(self._make_key(tokenizer_id, template_hash, target_tokens))
+        if entry is None:
+            return None
+        offset, length, token_count = entry
+        with self._lock:
+            return self._read_text(offset, length), token_count
+
+    def put_prompt(
+        self, tokenizer_id: str, template_hash: str, target_tokens: int, prompt: str, token_count: int
+    ) -> None:
+        """Stores a prompt built from a template for a target number of tokens
+
+        Args:
+            tokenizer_id (str): name or path of the tokenizer
+            template_hash (str): hash of the template the prompt is built from, see `hash_text`
+            target_tokens (int): target number of tokens of the prompt
+            prompt (str): built prompt
+            token_count (int): number of tokens of the prompt
+        """
+        self._put(self._make_key(tokenizer_id, template_hash, target_tokens), prompt, token_count)
+
+    def get_token_count(self, tokenizer_id: str, text: str) -> Optional[int]:
+        """Gets the token count of a text
+
+        Args:
+            tokenizer_id (str): name or path of the tokenizer
+            text (str): text to get the token count of
+
+        Returns:
+            int: number of tokens of the text, or None if it is not cached
+        """
+        entry = self._index.get(self._make_key(tokenizer_id, self.hash_text(text), None))
+        return entry[2] if entry is not None else None
+
+    def put_token_count(self, tokenizer_id: str, text: str, token_count: int) -> None:
+        """Stores the token count of a text. The text itself is not stored, only its hash.
+
+        Args:
+            tokenizer_id (str): name or path of the tokenizer
+            text (str): text the tokens were counted for
+            token_count (int): number of tokens of the text
+        """
+        self._put(self._make_key(tokenizer_id, self.hash_text(text), None), '', token_count)
+
+
+@lru_cache(maxsize=None)
+def get_prompt_cache(cache_dir: str) -> PromptCache:
+    """Gets the prompt cache of a directory, shared by all the evaluators of the process
+
+    Args:
+        cache_dir (str): directory where the cache files are stored
+
+    Returns:
+        PromptCache: shared prompt cache
+    """
+    return PromptCache(cache_dir)
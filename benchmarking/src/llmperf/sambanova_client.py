@@ -5,11 +5,9 @@ import sys
 import time
 from datetime import datetime
 from math import isclose
-from typing import Any, Dict, List, Tuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-import requests
-import sseclient
-from requests import Response
+import httpx
 
 sys.path.append('./src')
 sys.path.append('./src/llmperf')
@@ -17,19 +15,73 @@ sys.path.append('./src/llmperf')
 import warnings
 
 from dotenv import load_dotenv
-from transformers import AutoTokenizer
+from transformers import PreTrainedTokenizerBase
 
 from benchmarking.src.llmperf import common_metrics
+from benchmarking.src.llmperf.http_clients import ConnectionTrace, create_client
 from benchmarking.src.llmperf.llmperf_utils import SAMBANOVA_URL, get_tokenizer
-from benchmarking.src.llmperf.models import RequestConfig
+from benchmarking.src.llmperf.models import RequestConfig, StreamRecord
 
 warnings.filterwarnings('ignore')
 
+# Number of output tokens in the first chunk, after the first chunk, and in total
+TokenCounts = Tuple[int, int, int]
+
+
+def count_stream_tokens(
+    stream_records: List[StreamRecord], server_output_tokens: List[Optional[int]], tokenizer: PreTrainedTokenizerBase
+) -> List[TokenCounts]:
+    """Counts the output tokens of many streamed responses in a single batched tokenizer pass.
+    When the server reports the number of completion tokens, it is used as the total, and chunks are tokenized only
+    if they don't hold exactly one token each.
+
+    Args:
+        stream_records (list): raw stream data of each response
+        server_output_tokens (list): number of completion tokens reported by the server for each response, or None
+        tokenizer (PreTrainedTokenizerBase): tokenizer for counting tokens
+
+    Returns:
+        list: tokens in the first chunk, tokens after the first chunk and total output tokens for each response
+    """
+    texts: List[str] = []
+    # For each response, the position of its texts in the batch
+    text_positions: List[Tuple[int, int]] = []
+
+    for stream_record, server_total in zip(stream_records, server_output_tokens):
+        chunks = stream_record.chunks_received
+        start = len(texts)
+        if server_total is None:
+            texts.extend(chunks)
+            texts.append(stream_record.generated_text)
+        elif len(chunks) != server_total and chunks:
+            texts.append(chunks[0])
+        text_positions.append((start, len(texts)))
+
+    token_lengths = [len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']] if texts else []
+
+    token_counts = []
+    for stream_record, server_total, (start, end) in zip(stream_records, server_output_tokens, text_positions):
+        num_chunks = len(stream_record.chunks_received)
+        if server_total is None:
+            chunk_lengths = token_lengths[start : end - 1]
+            tokens_first = chunk_lengths[0] if chunk_lengths else 0
+            token_counts.append((tokens_first, sum(chunk_lengths[1:]), token_lengths[end - 1]))
+        elif start == end:
+            # one token per chunk, no tokenization needed
+            token_counts.append((min(num_chunks, 1), max(num_chunks - 1, 0), server_total))
+        else:
+            tokens_first = token_lengths[start]
+            token_counts.append((tokens_first, max(server_total - tokens_first, 0), server_total))
+    return token_counts
+
 
 class BaseAPIEndpoint(abc.ABC):
-    def __init__(self, request_config: RequestConfig, tokenizer: AutoTokenizer) -> None:
+    def __init__(
+        self, request_config: RequestConfig, tokenizer: PreTrainedTokenizerBase, defer_token_counting: bool = False
+    ) -> None:
         self.request_config = request_config
         self.tokenizer = tokenizer
+        self.defer_token_counting = defer_token_counting
 
     @abc.abstractmethod
     def _get_url(self, *args: Any, **kwargs: Any) -> str:
@@ -54,62 +106,67 @@ class BaseAPIEndpoint(abc.ABC):
         """
         return len(self.tokenizer.encode(input_text))
 
+    @staticmethod
     def _calculate_tpot_from_streams_after_first(
-        self, chunks_received: List[str], chunks_timings: List[int | float]
+        chunks_timings: List[int | float], tokens_after_first_chunk: int
     ) -> float:
         """Calculates Time per Output Token (TPOT) based on the streaming events coming after the first one.
         In general, the way to calculate this metric is: time_to_generate_tokens/number_of_tokens_generated
 
         Args:
-            chunks_received (list): complete list of events coming from streaming response
             chunks_timings (list): complete list of timings that each event took to process
+            tokens_after_first_chunk (int): number of tokens received after the first chunk
 
         Returns:
             float: calculated tpot
         """
 
-        # Calculate tokens
-        total_tokens_received_after_first_chunk = sum(self._get_token_length(c) for c in chunks_received[1:])
-
         # Calculate time
         total_time_to_receive_tokens_after_first_chunk = sum(chunks_timings[1:])
 
         # Calculate tpot
-        tpot = float(total_time_to_receive_tokens_after_first_chunk / total_tokens_received_after_first_chunk)
+        tpot = float(total_time_to_receive_tokens_after_first_chunk / tokens_after_first_chunk)
 
         return tpot
 
+    @staticmethod
     def _calculate_ttft_from_streams(
-        self, chunks_received: List[str], chunks_timings: List[int | float], total_request_time: int | float
+        number_chunks_recieved: int,
+        chunks_timings: List[int | float],
+        total_request_time: int | float,
+        tokens_in_first_chunk: int,
+        tokens_after_first_chunk: int,
     ) -> float:
         """Calculates Time to First Token (TTFT) based on the streaming events coming from the response.
         If there are enough streaming events, the formula to calculate ttft is:
         time_first_chunk - (tokens_first_chunk - 1) * tpot
 
         Args:
-            chunks_received (list): list of events having the streaming tokens
+            number_chunks_recieved (int): number of events having the streaming tokens
             chunks_timings (list): list of timings for each event
             total_request_time (int): total request time calculated from client side
+            tokens_in_first_chunk (int): number of tokens in the first chunk
+            tokens_after_first_chunk (int): number of tokens received after the first chunk
 
         Returns:
             float: calculated ttft
         """
 
-        number_chunks_recieved = len(chunks_received)
-
         # if one or no chunks were recieved
         if number_chunks_recieved <= 1:
             ttft = total_request_time
+        # if chunks after the first one were empty there is no tpot to discount
+        elif tokens_after_first_chunk == 0:
+            ttft = chunks_timings[0]
         else:
             # calculate tpot
-            tpot = self._calculate_tpot_from_streams_after_first(chunks_received, chunks_timings)
+            tpot = BaseAPIEndpoint._calculate_tpot_from_streams_after_first(chunks_timings, tokens_after_first_chunk)
             # calculate ttft
-            total_tokens_in_first_chunk = self._get_token_length(chunks_received[0])
-            ttft = chunks_timings[0] - (total_tokens_in_first_chunk - 1) * tpot
+            ttft = chunks_timings[0] - (max(tokens_in_first_chunk, 1) - 1) * tpot
         return ttft
 
+    @staticmethod
     def _populate_client_metrics(
-        self,
         prompt_len: int,
         num_output_tokens: int,
         ttft: int | float,
@@ -153,6 +210,11 @@ class BaseAPIEndpoint(abc.ABC):
 
         metrics[common_metrics.TTFT] = ttft
 
+        # TTFT split by whether the request paid the connection setup
+        connection_reused = metrics.get(common_metrics.CONNECTION_REUSED)
+        metrics[common_metrics.TTFT_WARM] = ttft if connection_reused else None
+        metrics[common_metrics.TTFT_COLD] = ttft if connection_reused is False else None
+
         metrics[common_metrics.E2E_LAT] = total_request_time
 
         if number_chunks_recieved == 1:
@@ -170,6 +232,181 @@ class BaseAPIEndpoint(abc.ABC):
 
         return metrics
 
+    @staticmethod
+    def populate_token_metrics(
+        metrics: Dict[str, Any], stream_record: StreamRecord, token_counts: TokenCounts, prompt_len: int
+    ) -> Dict[str, Any]:
+        """Populates the client metrics that depend on token counts, once the tokens have been counted
+
+        Args:
+            metrics (dict): metrics dictionary with server metrics already populated
+            stream_record (StreamRecord): raw stream data of the response
+            token_counts (tuple): tokens in the first chunk, after the first chunk and total output tokens
+            prompt_len (int): prompt's length
+
+        Returns:
+            dict: updated metrics dictionary
+        """
+        tokens_in_first_chunk, tokens_after_first_chunk, num_output_tokens = token_counts
+        number_chunks_recieved = len(stream_record.chunks_received)
+
+        ttft = BaseAPIEndpoint._calculate_ttft_from_streams(
+            number_chunks_recieved,
+            stream_record.chunks_timings,
+            stream_record.total_request_time,
+            tokens_in_first_chunk,
+            tokens_after_first_chunk,
+        )
+        return BaseAPIEndpoint._populate_client_metrics(
+            prompt_len,
+            num_output_tokens,
+            ttft,
+            stream_record.total_request_time,
+            metrics,
+            number_chunks_recieved,
+        )
+
+    def _build_metrics(
+        self,
+        metrics: Dict[str, Any],
+        stream_record: StreamRecord,
+        response_dict: Dict[str, Any],
+        prepare_time: float,
+        processing_start_time: float,
+    ) -> Dict[str, Any]:
+        """Builds the server and client metrics once all the streamed chunks of a request have been received.
+        When token counting is deferred, the client metrics depending on tokens are left to `populate_token_metrics`
+        and the stream record is returned in the metrics under `common_metrics.STREAM_RECORD`.
+
+        Args:
+            metrics (dict): basic metrics dictionary
+            stream_record (StreamRecord): raw stream data of the response
+            response_dict (dict): dict data with performance metrics coming from the server
+            prepare_time (float): time spent building the request before sending it
+            processing_start_time (float): monotonic time the stream finished and its processing started
+
+        Returns:
+            dict: metrics structure with server and client side values
+        """
+        metrics = self._populate_server_metrics(response_dict, metrics)
+
+        if self.defer_token_counting:
+            metrics[common_metrics.STREAM_RECORD] = stream_record
+        else:
+            token_counts = count_stream_tokens(
+                [stream_record], [metrics[common_metrics.NUM_OUTPUT_TOKENS_SERVER]], self.tokenizer
+            )[0]
+            metrics = self.populate_token_metrics(
+                metrics, stream_record, token_counts, self.request_config.prompt_tuple[1]
+            )
+
+        metrics[common_metrics.CLIENT_OVERHEAD] = prepare_time + (time.monotonic() - processing_start_time)
+        return metrics
+
+    @staticmethod
+    def _receive_lines(lines: Iterator[str]) -> List[Tuple[float, str]]:
+        """Records the arrival time and raw content of each streamed line, doing nothing else on the receive path
+
+        Args:
+            lines (iterator): streamed lines
+
+        Returns:
+            list: arrival time and raw content for each line
+        """
+        return [(time.monotonic(), line) for line in lines]
+
+    @staticmethod
+    async def _areceive_lines(lines: AsyncIterator[str]) -> List[Tuple[float, str]]:
+        """Records the arrival time and raw content of each streamed line, doing nothing else on the receive path
+
+        Args:
+            lines (async iterator): streamed lines
+
+        Returns:
+            list: arrival time and raw content for each line
+        """
+        return [(time.monotonic(), line) async for line in lines]
+
+    @staticmethod
+    def _decode_openai_compatible_events(
+        raw_events: List[Tuple[float, str]], event_start_time: float
+    ) -> Tuple[List[str], List[float], Dict[str, Any], str]:
+        """Decodes the raw events of an OpenAI compatible stream
+
+        Args:
+            raw_events (list): arrival time and raw data for each event
+            event_start_time (float): time the request was sent
+
+        Returns:
+            tuple: chunks received, chunks timings, server usage dictionary and complete generated text
+        """
+        events_received = []
+        events_timings = []
+        response_dict: Dict[str, Any] = {}
+
+        for event_time, event_data in raw_events:
+            try:
+                # check streaming events before last stream returns DONE
+                if event_data and event_data != '[DONE]':
+                    data = json.loads(event_data)
+                    # if events don't contain "usage" key, which only shows up in stream returning
+                    # performance metrics
+                    if data.get('usage') is None:
+                        # if streams still don't hit a finish reason
+                        if data['choices'][0]['finish_reason'] is None:
+                            # log s timings
+                            events_timings.append(event_time - event_start_time)
+                            event_start_time = event_time
+                            # collect streaming text pieces
+                            events_received.append(data['choices'][0]['delta']['content'])
+                    # process streaming chunk when performance usage is provided
+                    else:
+                        response_dict = data['usage']
+            except Exception as e:
+                raise Exception(f'Error: {e} at streamed event: {event_data}')
+        return events_received, events_timings, response_dict, ''.join(events_received)
+
+    @staticmethod
+    def _sse_data(raw_lines: List[Tuple[float, str]]) -> List[Tuple[float, str]]:
+        """Keeps the `data:` fields of raw SSE lines, skipping comments and blank separator lines"""
+        return [(line_time, line[len('data:') :].strip()) for line_time, line in raw_lines if line.startswith('data:')]
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        """Raises an exception with the error details when a streamed response is not successful
+
+        Args:
+            response (httpx.Response): streamed response
+
+        Raises:
+            Exception: raises when the response status code is not 200
+        """
+        if response.status_code != 200:
+            response.read()
+            try:
+                error_details = response.json().get('error', 'No additional error details provided.')
+            except ValueError:
+                error_details = response.text
+            raise Exception(f'Error: {response.status_code}, Details: {error_details}')
+
+    @staticmethod
+    async def _araise_for_status(response: httpx.Response) -> None:
+        """Raises an exception with the error details when an async streamed response is not successful
+
+        Args:
+            response (httpx.Response): streamed response
+
+        Raises:
+            Exception: raises when the response status code is not 200
+        """
+        if response.status_code != 200:
+            await response.aread()
+            try:
+                error_details = response.json().get('error', 'No additional error details provided.')
+            except ValueError:
+                error_details = response.text
+            raise Exception(f'Error: {response.status_code}, Details: {error_details}')
+
     def _populate_server_metrics(self, response_dict: Dict[str, Any], metrics: Dict[str, Any]) -> Dict[str, Any]:
         """Parse output data to metrics dictionary structure
 
@@ -327,11 +564,12 @@ class SambaStudioAPI(BaseAPIEndpoint):
 
         return data
 
-    def compute_metrics(self, metrics: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    def compute_metrics(self, metrics: Dict[str, Any], client: httpx.Client) -> Tuple[Dict[str, Any], str]:
         """Computes metrics for SambaStudio API endpoint
 
         Args:
             metrics (dict): basic metrics dictionary
+            client (httpx.Client): HTTP client used to send the request, reused across the requests of a thread
 
         Raises:
             ValueError: raises when streaming is not selected
@@ -342,130 +580,174 @@ class SambaStudioAPI(BaseAPIEndpoint):
         """
 
         # Get API request components
+        prepare_start_time = time.monotonic()
         url = self._get_url()
         headers = self._get_headers()
         json_data = self._get_json_data(url)
 
+        if not self.request_config.is_stream_mode:
+            # TODO: support non-streaming mode
+            raise ValueError('Streaming mode required')
+
         # Start measuring time
         metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
         start_time = time.monotonic()
 
-        if self.request_config.is_stream_mode:
-            with requests.post(
-                url, headers=headers, json=json_data, stream=self.request_config.is_stream_mode
-            ) as response:
-                if response.status_code != 200:
-                    error_details = response.json().get('error', 'No additional error details provided.')
-                    raise Exception(f'Error: {response.status_code}, Details: {error_details}')
-
-                if 'chat/completions' in self.base_url:  # SambaStudio compatible with OpenAI data payload
-                    chunks_received, chunks_timings, response_dict, generated_text = (
-                        self._parse_sambastudio_openai_compatible_response(response, start_time)
-                    )
-                else:  # Regular SambaStudio data payload
-                    chunks_received, chunks_timings, response_dict, generated_text = (
-                        self._parse_regular_sambastudio_response(response, start_time, url)
-                    )
-        else:
+        trace = ConnectionTrace()
+        with client.stream('POST', url, headers=headers, json=json_data, extensions={'trace': trace}) as response:
+            self._raise_for_status(response)
+            raw_lines = self._receive_lines(response.iter_lines())
+
+        # End measuring time
+        metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        processing_start_time = time.monotonic()
+        total_request_time = processing_start_time - start_time
+        metrics = trace.populate_metrics(metrics)
+
+        if 'chat/completions' in self.base_url:  # SambaStudio compatible with OpenAI data payload
+            raw_events = self._sse_data(raw_lines)
+        else:  # Regular SambaStudio data payload
+            raw_events = raw_lines
+
+        return self._process_raw_events(
+            metrics,
+            raw_events,
+            url,
+            start_time,
+            total_request_time,
+            start_time - prepare_start_time,
+            processing_start_time,
+        )
+
+    async def acompute_metrics(self, metrics: Dict[str, Any], client: httpx.AsyncClient) -> Tuple[Dict[str, Any], str]:
+        """Computes metrics for SambaStudio API endpoint without blocking the event loop
+
+        Args:
+            metrics (dict): basic metrics dictionary
+            client (httpx.AsyncClient): async HTTP client used to send the request
+
+        Raises:
+            ValueError: raises when streaming is not selected
+
+        Returns:
+            tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
+            complete generated text
+        """
+
+        # Get API request components
+        prepare_start_time = time.monotonic()
+        url = self._get_url()
+        headers = self._get_headers()
+        json_data = self._get_json_data(url)
+
+        if not self.request_config.is_stream_mode:
             # TODO: support non-streaming mode
             raise ValueError('Streaming mode required')
 
+        # Start measuring time
+        metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        start_time = time.monotonic()
+
+        trace = ConnectionTrace()
+        async with client.stream(
+            'POST', url, headers=headers, json=json_data, extensions={'trace': trace.atrace}
+        ) as response:
+            await self._araise_for_status(response)
+            raw_lines = await self._areceive_lines(response.aiter_lines())
+
         # End measuring time
         metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
-        total_request_time = time.monotonic() - start_time
-        ttft = self._calculate_ttft_from_streams(chunks_received, chunks_timings, total_request_time)
+        processing_start_time = time.monotonic()
+        total_request_time = processing_start_time - start_time
+        metrics = trace.populate_metrics(metrics)
 
-        # Populate server and client metrics
-        prompt_len = self.request_config.prompt_tuple[1]
-        number_chunks_recieved = len(chunks_received)
+        if 'chat/completions' in self.base_url:  # SambaStudio compatible with OpenAI data payload
+            raw_events = self._sse_data(raw_lines)
+        else:  # Regular SambaStudio data payload
+            raw_events = raw_lines
 
-        num_output_tokens = self._get_token_length(generated_text)
-        server_metrics = self._populate_server_metrics(response_dict, metrics)
-        metrics = self._populate_client_metrics(
-            prompt_len,
-            num_output_tokens,
-            ttft,
+        return self._process_raw_events(
+            metrics,
+            raw_events,
+            url,
+            start_time,
             total_request_time,
-            server_metrics,
-            number_chunks_recieved,
+            start_time - prepare_start_time,
+            processing_start_time,
         )
 
-        return metrics, generated_text
+    def _process_raw_events(
+        self,
+        metrics: Dict[str, Any],
+        raw_events: List[Tuple[float, str]],
+        url: str,
+        start_time: float,
+        total_request_time: float,
+        prepare_time: float,
+        processing_start_time: float,
+    ) -> Tuple[Dict[str, Any], str]:
+        """Decodes the events received from a SambaStudio stream and builds the request metrics
 
-    def _parse_sambastudio_openai_compatible_response(
-        self, response: Response, event_start_time: float
-    ) -> Tuple[List[Any], List[Any], Dict[str, Any], str]:
-        # Set variables
-        generated_text = ''
-        events_received = []
-        events_timings = []
+        Args:
+            metrics (dict): basic metrics dictionary
+            raw_events (list): arrival time and raw data for each event
+            url (str): URL used for the API call
+            start_time (float): time the request was sent
+            total_request_time (float): end-to-end latency
+            prepare_time (float): time spent building the request before sending it
+            processing_start_time (float): monotonic time the stream finished and its processing started
 
-        client = sseclient.SSEClient(response)
+        Returns:
+            tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
+            complete generated text
+        """
+        if 'chat/completions' in self.base_url:  # SambaStudio compatible with OpenAI data payload
+            chunks_received, chunks_timings, response_dict, generated_text = self._decode_openai_compatible_events(
+                raw_events, start_time
+            )
+        else:  # Regular SambaStudio data payload
+            chunks_received, chunks_timings, response_dict, generated_text = self._decode_regular_sambastudio_lines(
+                raw_events, start_time, url
+            )
 
-        for event in client.events():
-            try:
-                # check streaming events before last stream returns DONE
-                if event.data != '[DONE]':
-                    data = json.loads(event.data)
-                    # if events don't contain "usage" key, which only shows up in stream returning
-                    # performance metrics
-                    if data.get('usage') is None:
-                        # if streams still don't hit a finish reason
-                        if data['choices'][0]['finish_reason'] is None:
-                            # log s timings
-                            events_timings.append(time.monotonic() - event_start_time)
-                            event_start_time = time.monotonic()
-                            # concatenate streaming text pieces
-                            stream_content = data['choices'][0]['delta']['content']
-                            events_received.append(stream_content)
-                            generated_text += stream_content
-                    # process streaming chunk when performance usage is provided
-                    else:
-                        response_dict = data['usage']
-            except Exception as e:
-                raise Exception(f'Error: {e} at streamed event: {event.data}')
-        return events_received, events_timings, response_dict, generated_text
+        stream_record = StreamRecord(
+            chunks_received=chunks_received,
+            chunks_timings=chunks_timings,
+            generated_text=generated_text,
+            total_request_time=total_request_time,
+        )
+        metrics = self._build_metrics(metrics, stream_record, response_dict, prepare_time, processing_start_time)
 
-    def _parse_regular_sambastudio_response(
-        self, response: Response, chunk_start_time: float, url: str
+        return metrics, generated_text
+
+    @staticmethod
+    def _decode_regular_sambastudio_lines(
+        raw_lines: List[Tuple[float, str]], chunk_start_time: float, url: str
     ) -> Tuple[List[Any], List[Any], Dict[str, Any], str]:
         # Set variables
         generated_text = ''
         chunks_received = []
         chunks_timings = []
-
-        # fetch generated text and metrics for api v2
-        if '/api/v2' in url.lower().strip():
-            for chunk_orig in response.iter_lines(chunk_size=None):
-                chunk = chunk_orig.strip()
-                data = json.loads(chunk)
-
-                completion = data['result']['items'][0]['value']['is_last_response']
-                chunks_timings.append(time.monotonic() - chunk_start_time)
-                chunk_start_time = time.monotonic()
-                if completion is False:
-                    chunks_received.append(data['result']['items'][0]['value']['stream_token'])
-                    continue
-                else:
-                    generated_text = data['result']['items'][0]['value']['completion']
-                    response_dict = data['result']['items'][0]['value']
-                break
-        # support to fetch generated text and metrics for api v1
-        else:
-            for chunk_orig in response.iter_lines(chunk_size=None):
-                chunk = chunk_orig.strip()
-                data = json.loads(chunk)
-
-                completion = data['result']['responses'][0]['is_last_response']
-                chunks_timings.append(time.monotonic() - chunk_start_time)
-                chunk_start_time = time.monotonic()
-                if completion is False:
-                    chunks_received.append(data['result']['responses'][0]['stream_token'])
-                    continue
-                else:
-                    generated_text = data['result']['responses'][0]['completion']
-                    response_dict = data['result']['responses'][0]
-                    break
+        response_dict: Dict[str, Any] = {}
+
+        # api v2 nests the streamed values in items, api v1 in responses
+        is_api_v2 = '/api/v2' in url.lower().strip()
+
+        for chunk_time, chunk_orig in raw_lines:
+            chunk = chunk_orig.strip()
+            if not chunk:
+                continue
+            data = json.loads(chunk)
+            value = data['result']['items'][0]['value'] if is_api_v2 else data['result']['responses'][0]
+
+            chunks_timings.append(chunk_time - chunk_start_time)
+            chunk_start_time = chunk_time
+            if value['is_last_response'] is False:
+                chunks_received.append(value['stream_token'])
+                continue
+            generated_text = value['completion']
+            response_dict = value
+            break
         return chunks_received, chunks_timings, response_dict, generated_text
 
 
@@ -517,11 +799,12 @@ class SambaNovaCloudAPI(BaseAPIEndpoint):
 
         return data
 
-    def compute_metrics(self, metrics: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    def compute_metrics(self, metrics: Dict[str, Any], client: httpx.Client) -> Tuple[Dict[str, Any], str]:
         """Computes metrics for SambaNovaCloud endpoint
 
         Args:
             metrics (dict): basic metrics dictionary
+            client (httpx.Client): HTTP client used to send the request, reused across the requests of a thread
 
         Returns:
             tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
@@ -529,77 +812,190 @@ class SambaNovaCloudAPI(BaseAPIEndpoint):
         """
 
         # Get API request components
+        prepare_start_time = time.monotonic()
         url = self._get_url()
         headers = self._get_headers()
         json_data = self._get_json_data()
 
-        # Set variables
-        generated_text = ''
-        events_received = []
-        events_timings = []
-
         # Start measuring time
         metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
-        start_time = event_start_time = time.monotonic()
-
-        with requests.post(url, headers=headers, json=json_data, stream=self.request_config.is_stream_mode) as response:
-            if response.status_code != 200:
-                response.raise_for_status()
-            client = sseclient.SSEClient(response)
-            generated_text = ''
-
-            for event in client.events():
-                try:
-                    # check streaming events before last stream returns DONE
-                    if event.data != '[DONE]':
-                        data = json.loads(event.data)
-                        # if events don't contain "usage" key, which only shows up in stream returning
-                        # performance metrics
-                        if data.get('usage') is None:
-                            # if streams still don't hit a finish reason
-                            if data['choices'][0]['finish_reason'] is None:
-                                # log s timings
-                                events_timings.append(time.monotonic() - event_start_time)
-                                event_start_time = time.monotonic()
-                                # concatenate streaming text pieces
-                                stream_content = data['choices'][0]['delta']['content']
-                                events_received.append(stream_content)
-                                generated_text += stream_content
-                        # process streaming chunk when performance usage is provided
-                        else:
-                            response_dict = data['usage']
-                except Exception as e:
-                    raise Exception(f'Error: {e} at streamed event: {event.data}')
+        start_time = time.monotonic()
+
+        trace = ConnectionTrace()
+        with client.stream('POST', url, headers=headers, json=json_data, extensions={'trace': trace}) as response:
+            self._raise_for_status(response)
+            raw_lines = self._receive_lines(response.iter_lines())
 
         # End measuring time
         metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
-        total_request_time = time.monotonic() - start_time
-        ttft = self._calculate_ttft_from_streams(events_received, events_timings, total_request_time)
+        processing_start_time = time.monotonic()
+        total_request_time = processing_start_time - start_time
+        metrics = trace.populate_metrics(metrics)
+
+        return self._process_raw_events(
+            metrics,
+            self._sse_data(raw_lines),
+            start_time,
+            total_request_time,
+            start_time - prepare_start_time,
+            processing_start_time,
+        )
 
-        # Populate server and client metrics
-        prompt_len = self.request_config.prompt_tuple[1]
-        number_chunks_recieved = len(events_received)
+    async def acompute_metrics(self, metrics: Dict[str, Any], client: httpx.AsyncClient) -> Tuple[Dict[str, Any], str]:
+        """Computes metrics for SambaNovaCloud endpoint without blocking the event loop
 
-        num_output_tokens = self._get_token_length(generated_text)
-        server_metrics = self._populate_server_metrics(response_dict, metrics)
-        metrics = self._populate_client_metrics(
-            prompt_len,
-            num_output_tokens,
-            ttft,
+        Args:
+            metrics (dict): basic metrics dictionary
+            client (httpx.AsyncClient): async HTTP client used to send the request
+
+        Returns:
+            tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
+            complete generated text
+        """
+
+        # Get API request components
+        prepare_start_time = time.monotonic()
+        url = self._get_url()
+        headers = self._get_headers()
+        json_data = self._get_json_data()
+
+        # Start measuring time
+        metrics[common_metrics.REQ_START_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        start_time = time.monotonic()
+
+        trace = ConnectionTrace()
+        async with client.stream(
+            'POST', url, headers=headers, json=json_data, extensions={'trace': trace.atrace}
+        ) as response:
+            await self._araise_for_status(response)
+            raw_lines = await self._areceive_lines(response.aiter_lines())
+
+        # End measuring time
+        metrics[common_metrics.REQ_END_TIME] = datetime.now().strftime('%H:%M:%S.%f')
+        processing_start_time = time.monotonic()
+        total_request_time = processing_start_time - start_time
+        metrics = trace.populate_metrics(metrics)
+
+        return self._process_raw_events(
+            metrics,
+            self._sse_data(raw_lines),
+            start_time,
             total_request_time,
-            server_metrics,
-            number_chunks_recieved,
+            start_time - prepare_start_time,
+            processing_start_time,
         )
 
+    def _process_raw_events(
+        self,
+        metrics: Dict[str, Any],
+        raw_events: List[Tuple[float, str]],
+        start_time: float,
+        total_request_time: float,
+        prepare_time: float,
+        processing_start_time: float,
+    ) -> Tuple[Dict[str, Any], str]:
+        """Decodes the events received from a SambaNovaCloud stream and builds the request metrics
+
+        Args:
+            metrics (dict): basic metrics dictionary
+            raw_events (list): arrival time and raw data for each event
+            start_time (float): time the request was sent
+            total_request_time (float): end-to-end latency
+            prepare_time (float): time spent building the request before sending it
+            processing_start_time (float): monotonic time the stream finished and its processing started
+
+        Returns:
+            tuple[dict, str]: tuple containing the metrics structure with server and client side values, and the
+            complete generated text
+        """
+        events_received, events_timings, response_dict, generated_text = self._decode_openai_compatible_events(
+            raw_events, start_time
+        )
+
+        stream_record = StreamRecord(
+            chunks_received=events_received,
+            chunks_timings=events_timings,
+            generated_text=generated_text,
+            total_request_time=total_request_time,
+        )
+        metrics = self._build_metrics(metrics, stream_record, response_dict, prepare_time, processing_start_time)
+
         return metrics, generated_text
 
 
-def llm_request(request_config: RequestConfig, tokenizer: AutoTokenizer) -> Tuple[Dict[str, Any], str, RequestConfig]:
+def llm_request(
+    request_config: RequestConfig,
+    tokenizer: PreTrainedTokenizerBase,
+    defer_token_counting: bool = False,
+    client: Optional[httpx.Client] = None,
+) -> Tuple[Dict[str, Any], str, RequestConfig]:
     """Makes a single completion request to a LLM API
 
     Args:
         request_config (RequestConfig): config options including user's prompt and LLM parameters
-        tokenizer (AutoTokenizer): tokenizer for counting tokens
+        tokenizer (PreTrainedTokenizerBase): tokenizer for counting tokens
+        defer_token_counting (bool): whether to leave token counting to a later batched pass. When True, the
+            metrics hold the raw stream data under `common_metrics.STREAM_RECORD` to be used by
+            `count_stream_tokens` and `BaseAPIEndpoint.populate_token_metrics`.
+        client (httpx.Client, optional): HTTP client whose connections are reused across requests. A new client,
+            and so a new connection, is used for this request only if not provided.
+
+    Returns:
+        tuple: Metrics about the performance charateristics of the request.
+        The text generated by the request to the LLM API.
+        The request_config used to make the request. This is mainly for logging purposes.
+    """
+
+    if client is None:
+        with create_client() as request_client:
+            return llm_request(request_config, tokenizer, defer_token_counting, request_client)
+
+    generated_text = ''
+    metrics: Dict[str, Any] = {}
+    metrics[common_metrics.ERROR_CODE] = None
+    metrics[common_metrics.ERROR_MSG] = ''
+
+    try:
+        if request_config.llm_api == 'sncloud':
+            sncloud_client = SambaNovaCloudAPI(request_config, tokenizer, defer_token_counting)
+            metrics, generated_text = sncloud_client.compute_metrics(metrics, client)
+
+        elif request_config.llm_api == 'sambastudio':
+            sambastudio_client = SambaStudioAPI(request_config, tokenizer, defer_token_counting)
+            metrics, generated_text = sambastudio_client.compute_metrics(metrics, client)
+
+        else:
+            raise ValueError(f'llm_api parameter with value {request_config.llm_api} is not valid.')
+
+        return metrics, generated_text, request_config
+
+    except Exception as e:
+        error_code = getattr(
+            e,
+            'code',
+            """Error while running LLM API requests. 
+            Check your model name, LLM API type, env variables and endpoint status.""",
+        )
+        error_message = str(e)
+        metrics[common_metrics.ERROR_MSG] = error_message
+        metrics[common_metrics.ERROR_CODE] = error_code
+
+        return metrics, '', request_config
+
+
+async def allm_request(
+    request_config: RequestConfig,
+    tokenizer: PreTrainedTokenizerBase,
+    client: httpx.AsyncClient,
+    defer_token_counting: bool = False,
+) -> Tuple[Dict[str, Any], str, RequestConfig]:
+    """Makes a single completion request to a LLM API using an async HTTP client
+
+    Args:
+        request_config (RequestConfig): config options including user's prompt and LLM parameters
+        tokenizer (PreTrainedTokenizerBase): tokenizer for counting tokens
+        client (httpx.AsyncClient): async HTTP client shared by the concurrent requests
+        defer_token_counting (bool): whether to leave token counting to a later batched pass, see `llm_request`.
 
     Returns:
         tuple: Metrics about the performance charateristics of the request.
@@ -613,17 +1009,17 @@ def llm_request(request_config: RequestConfig, tokenizer: AutoTokenizer) -> Tupl
     metrics[common_metrics.ERROR_MSG] = ''
 
     try:
+        endpoint: SambaNovaCloudAPI | SambaStudioAPI
         if request_config.llm_api == 'sncloud':
-            sncloud_client = SambaNovaCloudAPI(request_config, tokenizer)
-            metrics, generated_text = sncloud_client.compute_metrics(metrics)
+            endpoint = SambaNovaCloudAPI(request_config, tokenizer, defer_token_counting)
 
         elif request_config.llm_api == 'sambastudio':
-            sambastudio_client = SambaStudioAPI(request_config, tokenizer)
-            metrics, generated_text = sambastudio_client.compute_metrics(metrics)
+            endpoint = SambaStudioAPI(request_config, tokenizer, defer_token_counting)
 
         else:
             raise ValueError(f'llm_api parameter with value {request_config.llm_api} is not valid.')
 
+        metrics, generated_text = await endpoint.acompute_metrics(metrics, client)
         return metrics, generated_text, request_config
 
     except Exception as e:
@@ -1,14 +1,15 @@
 import abc
+import asyncio
 import json
 import os
+import queue
 import random
 import re
 import threading
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, TextIO, Tuple
 
-import joblib
 import yaml
 
 file_location = Path(__file__).parent.resolve()
@@ -26,9 +27,13 @@ from tqdm import tqdm
 
 import benchmarking.src.llmperf.llmperf_utils as llmperf_utils
 from benchmarking.src.llmperf import common_metrics
-from benchmarking.src.llmperf.llmperf_utils import LLMPerfResults, flatten, get_tokenizer
+from benchmarking.src.llmperf.http_clients import AsyncClientPool, create_client
+from benchmarking.src.llmperf.llmperf_utils import LLMPerfResults, get_tokenizer
+from benchmarking.src.llmperf.load_generator import AsyncLoadGenerator
+from benchmarking.src.llmperf.metrics_aggregator import SUMMARY_METRICS, StreamingMetricsAggregator
 from benchmarking.src.llmperf.models import LLMResponse, RequestConfig
-from benchmarking.src.llmperf.sambanova_client import llm_request
+from benchmarking.src.llmperf.prompt_cache import get_prompt_cache
+from benchmarking.src.llmperf.sambanova_client import BaseAPIEndpoint, count_stream_tokens, llm_request
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,6 +46,10 @@ load_dotenv('../.env', override=True)
 
 SYSTEM_PROMPT_PATH = os.path.join(file_location, '../prompts/system-prompt_template.yaml')
 USER_PROMPT_PATH = os.path.join(file_location, '../prompts/user-prompt_template.yaml')
+PROMPT_CACHE_DIRECTORY = f'{kit_location}/../../scratch/benchmarking/prompts'
+DISPATCHERS = ['threads', 'async']
+# Maximum number of completed responses whose tokens are counted in the same batched tokenizer pass
+TOKEN_COUNTING_BATCH_SIZE = 64
 
 
 class BasePerformanceEvaluator(abc.ABC):
@@ -54,7 +63,19 @@ class BasePerformanceEvaluator(abc.ABC):
         api_variables: Dict[str, str] = {},
         is_stream_mode: bool = True,
         timeout: int = 600,
+        dispatcher: str = 'threads',
+        request_rate: Optional[float] = None,
+        arrival_distribution: str = 'poisson',
+        keep_alive: bool = True,
+        http2: bool = False,
+        client_pool: Optional[AsyncClientPool] = None,
+        event_loop: Optional[asyncio.AbstractEventLoop] = None,
     ) -> None:
+        if dispatcher not in DISPATCHERS:
+            raise ValueError(f'dispatcher must be one of {DISPATCHERS}. Got {dispatcher}')
+        if request_rate is not None and dispatcher != 'async':
+            raise ValueError('Open loop mode (request_rate) is only available with the async dispatcher.')
+
         self.model_name = model_name
         self.results_dir = results_dir
         self.num_concurrent_requests = num_concurrent_requests
@@ -63,10 +84,35 @@ class BasePerformanceEvaluator(abc.ABC):
         self.api_variables = api_variables
         self.is_stream_mode = is_stream_mode
         self.timeout = timeout
+        self.dispatcher = dispatcher
+        self.request_rate = request_rate
+        self.arrival_distribution = arrival_distribution
+        # Connection settings of the HTTP clients. Without keep-alive every request opens a new connection, which
+        # gives the cold connection TTFT
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        # Async clients and the event loop they are bound to, when they are reused across benchmark runs
+        self.client_pool = client_pool
+        self.event_loop = event_loop
         self.tokenizer = get_tokenizer(self.model_name)
+        self.prompt_cache = get_prompt_cache(PROMPT_CACHE_DIRECTORY)
         self.stop_event = threading.Event()
         self.ui_progress_bar = None
         self.cli_progress_bar = None
+        # Statistics of the current run, fed as the metrics of each response are finalized, the file its records are
+        # spilled to and, optionally, the file its prompts and completions are written to
+        self.metrics_aggregator: Optional[StreamingMetricsAggregator] = None
+        self.records_file_path: Optional[str] = None
+        self.response_texts_file_path: Optional[str] = None
+        self.token_counting_time = 0.0
+        self.requests_end_time = 0.0
+        self._num_received_responses = 0
+        self._num_received_responses_lock = threading.Lock()
+        self._response_queue: queue.Queue[Optional[LLMResponse]] = queue.Queue()
+        self._response_texts_file: Optional[TextIO] = None
+        # Progress bar statistics, refreshed by the finalizing thread, and the error that stopped it, if any
+        self._live_stats = ''
+        self._finalizing_error: Optional[Exception] = None
 
         # To be set upon saving of results
         self.summary_file_path: Optional[str] = None
@@ -75,6 +121,21 @@ class BasePerformanceEvaluator(abc.ABC):
     def get_token_length(self, input_text: str) -> int:
         return len(self.tokenizer.encode(input_text))
 
+    def get_cached_token_length(self, input_text: str) -> int:
+        """Gets the token length of a text, looking it up in the prompt cache before tokenizing it
+
+        Args:
+            input_text (str): input text
+
+        Returns:
+            int: number of tokens
+        """
+        token_length = self.prompt_cache.get_token_count(self.tokenizer.name_or_path, input_text)
+        if token_length is None:
+            token_length = self.get_token_length(input_text)
+            self.prompt_cache.put_token_count(self.tokenizer.name_or_path, input_text, token_length)
+        return token_length
+
     @staticmethod
     def sanitize_file_prefix(prefix: str) -> str:
         """Utility for sanitizing the output file prefix.
@@ -96,19 +157,13 @@ class BasePerformanceEvaluator(abc.ABC):
     @abc.abstractmethod
     def run_benchmark(
         self, sampling_params: Dict[str, Any] = {}, *args: Any, **kwargs: Any
-    ) -> (
-        Tuple[Dict[str, Any] | Dict[str, object], List[Tuple[Dict[str, Any], str, RequestConfig]] | List[LLMResponse]]
-        | None
-    ):
+    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Dict[str, Any]]] | None:
         pass
 
     @abc.abstractmethod
     def get_token_throughput_latencies(
         self, *args: Any, **kwargs: Any
-    ) -> (
-        Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], str, RequestConfig]]]
-        | Tuple[dict[str, object], List[LLMResponse]]
-    ):
+    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Dict[str, Any]]]:
         pass
 
     @abc.abstractmethod
@@ -131,20 +186,7 @@ class BasePerformanceEvaluator(abc.ABC):
         Returns:
             str: adjusted text
         """
-        model = self.model_name.replace('Bundle/', '').replace('/', '_')
-        tokenized_text_filename = f'tokenized_text_variable_{model}.bin'
-        tokenized_text_directory = f'{kit_location}/../../scratch/benchmarking/prompts'
-        tokenized_text_filepath = f'{tokenized_text_directory}/{tokenized_text_filename}'
-
-        if not Path(tokenized_text_directory).exists():
-            Path(tokenized_text_directory).mkdir(parents=True)
-
-        if not Path(tokenized_text_filepath).exists():
-            tokens = self.tokenizer.tokenize(text)
-            joblib.dump(tokens, tokenized_text_filepath)
-        else:
-            tokens = joblib.load(tokenized_text_filepath)
-
+        tokens = self.tokenizer.tokenize(text)
         token_count = len(tokens)
 
         if token_count > target_token_count:
@@ -163,148 +205,307 @@ class BasePerformanceEvaluator(abc.ABC):
 
         return adjusted_text
 
+    def set_records_file_path(self, filename: str) -> None:
+        """Sets the file the final records of the next run are spilled to, when a results directory is set
+
+        Args:
+            filename (str): base name of the result files of the run
+        """
+        self.records_file_path = f'{self.results_dir}/{filename}_records.jsonl' if self.results_dir else None
+
+    def record_response(self, response: LLMResponse, num_requests: int) -> None:
+        """Hands a completed response over to the finalizing thread, see `finalize_responses`, and updates the
+        progress bars with the statistics of the responses finalized so far
+
+        Args:
+            response (LLMResponse): completed response
+            num_requests (int): number of total requests
+        """
+        # responses are dropped once finalizing has failed, as the run raises its error when it ends
+        if self._finalizing_error is None:
+            self._response_queue.put(response)
+        with self._num_received_responses_lock:
+            self._num_received_responses += 1
+            num_received_responses = self._num_received_responses
+        live_stats = self._live_stats
+
+        if self.cli_progress_bar:
+            self.cli_progress_bar.set_postfix_str(live_stats, refresh=False)
+            self.cli_progress_bar.update(1)
+        if self.ui_progress_bar:
+            self.ui_progress_bar(num_received_responses, num_requests, live_stats)
+
+    def finalize_responses(self, llm_responses: List[LLMResponse]) -> List[Dict[str, Any]]:
+        """Counts the output tokens of completed responses in a single batched tokenizer pass, populates the client
+        metrics depending on them, and adds the final metrics to the run statistics and to the spilled records.
+        Only these metrics are kept, so the responses, with their texts and raw chunks, can be dropped.
+
+        Args:
+            llm_responses (list): completed LLMResponse objects
+
+        Returns:
+            list: final metrics of each response, with its request index
+        """
+        pending_responses = [
+            (response, response.stream_record) for response in llm_responses if response.stream_record is not None
+        ]
+        token_counts = count_stream_tokens(
+            [stream_record for _, stream_record in pending_responses],
+            [response.metrics.get(common_metrics.NUM_OUTPUT_TOKENS_SERVER) for response, _ in pending_responses],
+            self.tokenizer,
+        )
+        for (response, stream_record), response_token_counts in zip(pending_responses, token_counts):
+            response.metrics = BaseAPIEndpoint.populate_token_metrics(
+                response.metrics, stream_record, response_token_counts, response.request_config.prompt_tuple[1]
+            )
+
+        records = []
+        for response in llm_responses:
+            record = {common_metrics.REQUEST_IDX: response.request_config.request_idx, **response.metrics}
+            if self.metrics_aggregator is not None:
+                self.metrics_aggregator.add(record)
+            if self._response_texts_file is not None:
+                output_json = {'prompt': response.request_config.prompt_tuple[0], 'completion': response.response_text}
+                self._response_texts_file.write(json.dumps(output_json) + '\n')
+            records.append(record)
+        return records
+
+    def _finalize_queued_responses(self, records: List[Dict[str, Any]]) -> None:
+        """Finalizes the responses handed over by `record_response` in batches, until it receives None. Token
+        counting and the progress bar statistics run in this thread so they stay off the receive path of the
+        concurrent streams. If finalizing fails, the error is kept for `run_requests` to raise and the remaining
+        responses are drained without being finalized.
+
+        Args:
+            records (list): list the final metrics of each response are added to
+        """
+        done = False
+        while not done:
+            batch = [self._response_queue.get()]
+            while len(batch) < TOKEN_COUNTING_BATCH_SIZE and not self._response_queue.empty():
+                batch.append(self._response_queue.get_nowait())
+            llm_responses = [response for response in batch if response is not None]
+            done = len(llm_responses) < len(batch)
+            if self._finalizing_error is not None:
+                continue
+
+            start_time = time.monotonic()
+            try:
+                records.extend(self.finalize_responses(llm_responses))
+            except Exception as e:
+                logger.error(f'Error finalizing responses, the remaining responses will be dropped: {e}')
+                self._finalizing_error = e
+                continue
+            self.token_counting_time += time.monotonic() - start_time
+            if self.metrics_aggregator is not None:
+                self._live_stats = self.metrics_aggregator.format_live_stats()
+
     def send_requests(
         self,
         request_config_batch: List[Any],
-        completed_requests: List[Any],
-        progress: int,
         start_time: float,
         num_requests: int,
     ) -> None:
-        """Sends multiple requests to LLM and collects results
+        """Sends multiple requests to LLM and hands each completed response over to `record_response`. The requests
+        of the batch share an HTTP client, so they reuse its connection when keep-alive is enabled.
 
         Args:
             request_config_batch (list): list of request configs for LLM calls
-            completed_requests (list): list of completed outputs from requests
-            progress (int): progress value
             start_time (float): start time of the process
             num_requests (int): number of total requests
         """
-        for request_config in request_config_batch:
+        with create_client(keep_alive=self.keep_alive, http2=self.http2) as client:
+            for request_config in request_config_batch:
+                if self.stop_event.is_set():
+                    logger.info('Stopping request processing in thread due to stop signal.')
+                    break
+                if time.monotonic() - start_time >= self.timeout:
+                    break
+                req_metrics, response_text, request_config = llm_request(
+                    request_config, self.tokenizer, defer_token_counting=True, client=client
+                )
+
+                # Create response object containing metrics, generated text, and corresponding request config. Tokens
+                # are counted off the receive path, see `finalize_responses`
+                response_object = LLMResponse(
+                    metrics=req_metrics,
+                    response_text=response_text,
+                    request_config=request_config,
+                    stream_record=req_metrics.pop(common_metrics.STREAM_RECORD, None),
+                )
+                self.record_response(response_object, num_requests)
+
+    def run_requests_with_threads(
+        self, request_configs: List[RequestConfig], start_time: float, num_requests: int
+    ) -> None:
+        """Sends requests in closed loop, with one thread per concurrent request. The total request count is split
+        evenly among the threads. If there is a remainder, one extra request is assigned to the first threads.
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+            start_time (float): start time of the process
+            num_requests (int): number of total requests
+        """
+        # Get the request counts in order to place them into threads to be executed in batches
+        total_request_count = len(request_configs)
+        requests_per_thread = total_request_count // self.num_concurrent_requests
+        remainder = total_request_count % self.num_concurrent_requests
+
+        # Set up empty batch array and index for a sliding window of request selection
+        request_config_batches = []
+        idx = 0
+
+        # Create batches of requests for each concurrent request
+        for concurrent_requests in range(self.num_concurrent_requests):
+            num_requests_for_thread = requests_per_thread + (1 if concurrent_requests < remainder else 0)
+            request_config_batch = request_configs[idx : idx + num_requests_for_thread].copy()
+            idx += num_requests_for_thread
+            request_config_batches.append(request_config_batch)
+
+        # Create empty `threads` array to be populated with execution threads
+        threads: List[threading.Thread] = []
+
+        # Send request threads and add to the threads array
+        for request_config_batch in request_config_batches:
             if self.stop_event.is_set():
-                logger.info('Stopping request processing in thread due to stop signal.')
-                break
-            if time.monotonic() - start_time >= self.timeout:
+                logger.info('Stopping thread creation due to stop signal.')
                 break
-            req_metrics, response_text, request_config = llm_request(request_config, self.tokenizer)
 
-            # Create response object containing metrics, generated text, and corresponding request config
-            response_object = LLMResponse(
-                metrics=req_metrics, response_text=response_text, request_config=request_config
+            thread = threading.Thread(
+                target=self.send_requests,
+                args=(request_config_batch, start_time, num_requests),
             )
-            completed_requests.extend([response_object])
-            update_unit = 1
-            progress += update_unit
+            threads.append(thread)
+            add_script_run_ctx(thread)  # Add Streamlit context to thread
+            thread.start()
+
+        # Wait for all threads to complete
+        for thread in threads:
+            add_script_run_ctx(thread)
+            thread.join()
+
+    def run_requests_with_asyncio(
+        self, request_configs: List[RequestConfig], start_time: float, num_requests: int
+    ) -> None:
+        """Sends requests from a single event loop. Runs in closed loop with `num_concurrent_requests` streams in
+        flight, or in open loop following `request_rate` when it is set.
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+            start_time (float): start time of the process
+            num_requests (int): number of total requests
+        """
+
+        def on_response(response: LLMResponse) -> None:
+            self.record_response(response, num_requests)
+
+        load_generator = AsyncLoadGenerator(
+            tokenizer=self.tokenizer,
+            num_concurrent_requests=self.num_concurrent_requests,
+            timeout=self.timeout,
+            request_rate=self.request_rate,
+            arrival_distribution=self.arrival_distribution,
+            stop_event=self.stop_event,
+            client_pool=self.client_pool,
+            keep_alive=self.keep_alive,
+            http2=self.http2,
+            seed=11111,
+        )
+        if self.event_loop is not None:
+            self.event_loop.run_until_complete(
+                load_generator.arun(
+                    request_configs, start_time=start_time, on_response=on_response, keep_responses=False
+                )
+            )
+        else:
+            load_generator.run(request_configs, start_time=start_time, on_response=on_response, keep_responses=False)
+
+    def run_requests(
+        self, request_configs: List[RequestConfig], start_time: float, num_requests: int
+    ) -> List[Dict[str, Any]]:
+        """Sends requests to the LLM with the configured dispatcher and collects the final metrics of each response.
+        Responses are finalized while the requests run, see `finalize_responses`, and their statistics are kept in
+        `metrics_aggregator`, so the run holds no response texts or raw chunks.
+
+        Args:
+            request_configs (list): list of request configs for LLM calls
+            start_time (float): start time of the process
+            num_requests (int): number of total requests
 
-            if self.cli_progress_bar:
-                self.cli_progress_bar.update(update_unit)
-            if self.ui_progress_bar:
-                self.ui_progress_bar(progress, num_requests)
+        Returns:
+            list: final metrics of each completed response, in completion order
+        """
+        self.metrics_aggregator = StreamingMetricsAggregator(spill_file_path=self.records_file_path)
+        self.token_counting_time = 0.0
+        self._num_received_responses = 0
+        self._response_queue = queue.Queue()
+        self._live_stats = ''
+        self._finalizing_error = None
+        if self.response_texts_file_path is not None:
+            Path(self.response_texts_file_path).parent.mkdir(parents=True, exist_ok=True)
+            self._response_texts_file = open(self.response_texts_file_path, 'w')
+
+        records: List[Dict[str, Any]] = []
+        finalizing_thread = threading.Thread(target=self._finalize_queued_responses, args=(records,))
+        finalizing_thread.start()
+        try:
+            if self.dispatcher == 'async':
+                self.run_requests_with_asyncio(request_configs, start_time, num_requests)
+            else:
+                self.run_requests_with_threads(request_configs, start_time, num_requests)
+        finally:
+            # the run ends with its last response, whatever the responses still waiting to be finalized
+            self.requests_end_time = time.monotonic()
+            self._response_queue.put(None)
+            finalizing_thread.join()
+            self.metrics_aggregator.close()
+            if self._response_texts_file is not None:
+                self._response_texts_file.close()
+                self._response_texts_file = None
+        if self._finalizing_error is not None:
+            raise self._finalizing_error
+
+        logger.info(f'Token counting for {len(records)} responses took {self.token_counting_time:.4f}s')
+        return records
 
     def build_metrics_summary(
         self,
-        metrics: List[Dict[str, Any]],
         start_time: float,
         end_time: float,
     ) -> Dict[str, Any]:
-        """Builds a summary of metrics from a list of dictionaries.
+        """Builds a summary of the metrics of the last run.
 
-        This function takes a list of dictionaries, each representing a metric, and a start and end time.
-        It filters out any metrics that resulted in an error, calculates descriptive statistics for a
-        number of metrics, and records various other metrics such as the number of requests started,
+        This function takes the statistics fed to `metrics_aggregator` as each response was finalized, and a start
+        and end time. Errored requests only count towards the error statistics. It reports descriptive statistics
+        for a number of metrics, and records various other metrics such as the number of requests started,
         the error rate and count, the overall throughput, and the number of completed requests.
+        Statistics are estimated with quantile sketches, see `StreamingMetricsAggregator`.
 
         Parameters:
-        metrics (List[Dict[str, Any]]): A list of dictionaries, each representing a metric.
         start_time (time): The start time of the metrics collection.
         end_time (time): The end time of the metrics collection.
 
         Returns:
         Dict[str, Any]: A dictionary containing the summary metrics.
         """
-        # Create empty metrics summary to be filled and returned
-        metrics_summary: Dict[str, Any] = {}
-
-        # Create base df from metrics returned from request responses
-        raw_df = pd.DataFrame(metrics)
-
-        # Remove errored requests
-        metrics_df = raw_df[raw_df[common_metrics.ERROR_CODE].isna()]
-
-        # Record descriptive statistics for the metrics in the following list
-        for metric in [
-            common_metrics.TTFT,
-            common_metrics.E2E_LAT,
-            common_metrics.REQ_OUTPUT_THROUGHPUT,
-            common_metrics.NUM_INPUT_TOKENS,
-            common_metrics.NUM_OUTPUT_TOKENS,
-        ]:
-            logger.info(f'Building Metrics Summary for metric: {metric}')
-            metrics_summary[metric] = {}
-
-            # Get flattened list from metric column in metrics df
-            series = pd.Series(list(flatten(metrics_df[metric]))).dropna()
-
-            # Generate statistics for specific metric
-            quantiles = series.quantile([0.25, 0.5, 0.75, 0.9, 0.95, 0.99]).round(4).to_dict()
-            quantiles_reformatted_keys = {}
-            for quantile, value in quantiles.items():
-                reformatted_key = f'p{int(quantile * 100)}'
-                logger.info(f'    {reformatted_key} = {value}')
-                quantiles_reformatted_keys[reformatted_key] = value
-            metrics_summary[metric]['quantiles'] = quantiles_reformatted_keys
-
-            series_mean = round(series.mean(), 4)
-            logger.info(f'    mean = {series_mean}')
-            metrics_summary[metric]['mean'] = series_mean
-
-            series_min = round(series.min(), 4)
-            logger.info(f'    min = {series_min}')
-            metrics_summary[metric]['min'] = series_min
-
-            series_max = round(series.max(), 4)
-            logger.info(f'    max = {series_max}')
-            metrics_summary[metric]['max'] = series_max
-
-            series_std = round(series.std(), 4)
-            logger.info(f'    stddev = {series_std}')
-            metrics_summary[metric]['stddev'] = series_std
-
-        # Record number of requests started
-        metrics_summary[common_metrics.NUM_REQ_STARTED] = len(metrics)
-
-        # Record error count and rate
-        error_codes = raw_df[common_metrics.ERROR_CODE].dropna()
-        num_errors = len(error_codes)
-        metrics_summary[common_metrics.ERROR_RATE] = num_errors / len(metrics) if len(metrics) else 0
-        metrics_summary[common_metrics.NUM_ERRORS] = num_errors
-        logger.info(f'Number Of Errored Requests: {num_errors}')
-
-        # Record specific error code frequencies
-        error_code_frequency = dict(error_codes.value_counts())
-        if num_errors:
-            error_code_frequency = dict(error_codes.value_counts())
-            logger.error('Error Code Frequency')
-            logger.error(error_code_frequency)
-        metrics_summary[common_metrics.ERROR_CODE_FREQ] = str(error_code_frequency)
+        aggregator = self.metrics_aggregator or StreamingMetricsAggregator()
+        metrics_summary = aggregator.build_summary(end_time - start_time)
 
-        # Record overall throughput
-        overall_output_throughput = round(
-            metrics_df[common_metrics.NUM_OUTPUT_TOKENS].sum() / (end_time - start_time),
-            4,
-        )
-        logger.info(f'Overall Output Throughput: {overall_output_throughput}')
-        metrics_summary[common_metrics.OUTPUT_THROUGHPUT] = overall_output_throughput
+        for metric in SUMMARY_METRICS:
+            logger.info(f'Building Metrics Summary for metric: {metric}')
+            for quantile, value in metrics_summary[metric]['quantiles'].items():
+                logger.info(f'    {quantile} = {value}')
+            for statistic in ['mean', 'min', 'max', 'stddev']:
+                logger.info(f'    {statistic} = {metrics_summary[metric][statistic]}')
 
-        # Record number of requests completed
-        num_completed_requests = len(metrics_df)
-        num_completed_requests_per_min = round(num_completed_requests / (end_time - start_time) * 60, 4)
-        logger.info(f'Number Of Completed Requests: {num_completed_requests}')
+        logger.info(f'Number Of Errored Requests: {metrics_summary[common_metrics.NUM_ERRORS]}')
+        if metrics_summary[common_metrics.NUM_ERRORS]:
+            logger.error('Error Code Frequency')
+            logger.error(metrics_summary[common_metrics.ERROR_CODE_FREQ])
+        logger.info(f'Overall Output Throughput: {metrics_summary[common_metrics.OUTPUT_THROUGHPUT]}')
+        logger.info(f'Number Of Completed Requests: {metrics_summary[common_metrics.NUM_COMPLETED_REQUESTS]}')
         logger.info(f'Number Of Concurrent Requests: {self.num_concurrent_requests}')
-        logger.info(f'Completed Requests Per Minute: {num_completed_requests_per_min}')
-
-        metrics_summary[common_metrics.NUM_COMPLETED_REQUESTS] = num_completed_requests
-        metrics_summary[common_metrics.COMPLETED_REQUESTS_PER_MIN] = num_completed_requests_per_min
+        logger.info(f'Completed Requests Per Minute: {metrics_summary[common_metrics.COMPLETED_REQUESTS_PER_MIN]}')
 
         return metrics_summary
 
@@ -312,17 +513,14 @@ class BasePerformanceEvaluator(abc.ABC):
         self,
         filename: str,
         summary: Dict[str, Any],
-        individual_responses: List[LLMResponse]
-        | List[Tuple[Dict[str, Any], str, RequestConfig]]
-        | Tuple[Dict[str, object], List[LLMResponse]],
+        individual_responses: List[Dict[str, Any]],
     ) -> None:
         """Save the performance evaluation results to a file.
 
         Args:
             filename (str): The base name of the file to save the results to.
             summary (dict): A dictionary containing the summary of the performance evaluation.
-            individual_responses (list): A list of individual responses from the performance evaluation.
-            save_response_texts (bool): Whether to save the llm output text to an output file.
+            individual_responses (list): The final metrics of each individual response.
 
         Returns:
             None
@@ -356,11 +554,8 @@ class BasePerformanceEvaluator(abc.ABC):
         try:
             self.individual_responses_file_path = f'{results_dir}/{individual_responses_filename}.json'
 
-            response_metrics = [
-                response.metrics for response in individual_responses if isinstance(response, LLMResponse)
-            ]
             with open(self.individual_responses_file_path, 'w') as f:
-                json.dump(response_metrics, f, indent=4)
+                json.dump(individual_responses, f, indent=4)
         except Exception as e:
             logger.error(individual_responses)
             raise e
@@ -400,52 +595,22 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
             generation_mode = 'stream'
 
         output_file_name = f'{self.model_name}_{self.file_name}_{self.num_concurrent_requests}_{generation_mode}'
+        if self.request_rate is not None:
+            output_file_name += f'_{self.request_rate}qps'
         return self.sanitize_file_prefix(output_file_name)
 
-    def save_results(
-        self,
-        filename: str,
-        summary: Dict[str, Any],
-        individual_responses: List[LLMResponse]
-        | List[Tuple[Dict[str, Any], str, RequestConfig]]
-        | Tuple[Dict[str, object], List[LLMResponse]],
-    ) -> None:
-        """Save the performance evaluation results to a file, and completion texts if save_response_text condition is
-        setup as True
+    def set_records_file_path(self, filename: str) -> None:
+        """Sets the files the final records of the next run are spilled to, and, if save_response_texts is setup as
+        True, the file its prompts and completions are written to as the responses complete
 
         Args:
-            filename (str): The base name of the file to save the results to.
-            summary (Dict[str, Any]): A dictionary containing the summary of the performance evaluation.
-            individual_responses (List[LLMResponse]): A list of individual responses from the performance evaluation.
-
-        Raises:
-            e: if an error happens when creating the output file related to prompts and completions, an error will be
-            raised
+            filename (str): base name of the result files of the run
         """
-
-        super().save_results(filename, summary, individual_responses)
-
-        # If specified, save the llm responses to output file
-        if self.save_response_texts:
-            # Create response texts file name
-            response_texts_file_name = f'{filename}_response_texts'
-            results_dir = Path(self.results_dir)
-
-            # Save response texts
-            try:
-                self.response_texts_file_path = f'{results_dir}/{response_texts_file_name}.jsonl'
-                with open(self.response_texts_file_path, 'w') as f:
-                    for response in individual_responses:
-                        if isinstance(response, LLMResponse):
-                            output_json = {
-                                'prompt': response.request_config.prompt_tuple[0],
-                                'completion': str(response.response_text),
-                            }
-                            f.write(json.dumps(output_json))
-                            f.write('\n')
-            except Exception as e:
-                logger.error('ERROR SAVING LLM OUTPUTS')
-                raise e
+        super().set_records_file_path(filename)
+        if self.save_response_texts and self.results_dir:
+            self.response_texts_file_path = f'{Path(self.results_dir)}/{filename}_response_texts.jsonl'
+        else:
+            self.response_texts_file_path = None
 
     def stop_benchmark(self) -> None:
         """Stops the benchmarking process by setting the stop event."""
@@ -454,10 +619,7 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
 
     def run_benchmark(
         self, sampling_params: Dict[str, Any] = {}, *args: Any, **kwargs: Any
-    ) -> (
-        Tuple[Dict[str, Any] | Dict[str, object], List[Tuple[Dict[str, Any], str, RequestConfig]] | List[LLMResponse]]
-        | None
-    ):
+    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Dict[str, Any]]] | None:
         """Run a benchmark test for the specified LLM using a custom dataset provided by the user.
 
         Args:
@@ -468,6 +630,8 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
         """
         self.cli_progress_bar = tqdm(total=len(self.dataset), desc='Running Requests')
         self.ui_progress_bar = kwargs.get('progress_bar', None)
+        filename = self.create_output_filename()
+        self.set_records_file_path(filename)
 
         # Calculate performance metrics individually and summary
         summary, individual_responses = self.get_token_throughput_latencies(
@@ -476,7 +640,6 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
 
         # Save benchmarking results to the specified results directory, it it exists
         if self.results_dir:
-            filename = self.create_output_filename()
             self.save_results(
                 filename,
                 summary,
@@ -486,24 +649,21 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
 
     def get_token_throughput_latencies(
         self, sampling_params: Dict[str, Any]
-    ) -> (
-        Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], str, RequestConfig]]]
-        | Tuple[dict[str, object], List[LLMResponse]]
-    ):
+    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Dict[str, Any]]]:
         """This function is used to measure the token throughput and latencies.
 
         Args:
             sampling_params (Dict[str, Any]): A dictionary containing the parameters for sampling.
 
         Returns:
-            Tuple[Dict[str, Any], List[Dict[str, Any]]]: A tuple containing metadata and completed requests.
+            Tuple[Dict[str, Any], List[Dict[str, Any]]]: A tuple containing metadata and the metrics of the completed
+            requests.
 
         Raises:
             Exception: If an unexpected error happens when executing requests.
 
         Note:
-            This function uses threading to send requests concurrently. It splits the total request count evenly among
-            the threads. If there is a remainder, it assigns one extra request to the first threads.
+            Requests are sent concurrently with the dispatcher set at construction, see `run_requests`.
         """
         random.seed(11111)
         start_time = time.monotonic()
@@ -512,58 +672,25 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
             sampling_params,
         )
 
-        # Get batch size details
-        total_request_count = len(request_configs)
-        requests_per_thread = total_request_count // self.num_concurrent_requests
-        remainder = total_request_count % self.num_concurrent_requests
-
-        request_config_batches = []
-        idx = 0
-        for concurrent_requests in range(self.num_concurrent_requests):
-            num_requests_for_thread = requests_per_thread + (1 if concurrent_requests < remainder else 0)
-            request_config_batch = request_configs[idx : idx + num_requests_for_thread].copy()
-            idx = idx + num_requests_for_thread
-            request_config_batches.append(request_config_batch)
-
-        threads = []
-        llm_responses: List[LLMResponse] = []
-        progress = 0
-
-        for request_config_batch in request_config_batches:
-            if self.stop_event.is_set():
-                logger.info('Stopping thread creation due to stop signal.')
-                break
-
-            thread = threading.Thread(
-                target=self.send_requests,
-                args=(request_config_batch, llm_responses, progress, start_time, total_request_count),
-            )
-            threads.append(thread)
-            add_script_run_ctx(thread)  # Give Streamlit context to thread
-            thread.start()
-
-        for thread in threads:
-            add_script_run_ctx(thread)
-            thread.join()
+        request_metrics = self.run_requests(request_configs, start_time, len(request_configs))
 
         if self.stop_event.is_set():
             logger.info('Benchmarking process terminated early due to stop signal.')
             return {}, []
 
-        if llm_responses[0].metrics[common_metrics.ERROR_CODE]:
+        if request_metrics[0][common_metrics.ERROR_CODE]:
             raise Exception(
-                f"""Unexpected error happened when executing requests: {llm_responses[0].metrics['error_code']}.
-                  Additional message: {llm_responses[0].metrics['error_msg']}"""
+                f"""Unexpected error happened when executing requests: {request_metrics[0]['error_code']}.
+                  Additional message: {request_metrics[0]['error_msg']}"""
             )
 
-        end_time = time.monotonic()
         logger.info('Tasks Executed!')
         logger.info(f'Results for token benchmark for {self.model_name} queried with the {self.llm_api} api.')
         results = self.build_metrics_summary(
-            metrics=[response.metrics for response in llm_responses],
             start_time=start_time,
-            end_time=end_time,
+            end_time=self.requests_end_time,
         )
+        results[common_metrics.TOKEN_COUNTING_TIME] = round(self.token_counting_time, 4)
 
         metadata = {
             'model': self.model_name,
@@ -571,9 +698,13 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
             'results': results,
             'request_count': len(self.dataset),
             'sampling_params': sampling_params,
+            'dispatcher': self.dispatcher,
+            'request_rate': self.request_rate,
+            'keep_alive': self.keep_alive,
+            'http2': self.http2,
         }
 
-        return metadata, llm_responses
+        return metadata, request_metrics
 
     def build_request_configs(self, sampling_params: Dict[str, Any]) -> List[RequestConfig]:
         """Builds a list of request configs for the LLM API. This method iterates through the provided dataset and
@@ -658,7 +789,7 @@ class CustomPerformanceEvaluator(BasePerformanceEvaluator):
             system_prompt = f'{sys_prompt_template}'
             prompt = system_prompt + raw_prompt
 
-        return (prompt, self.get_token_length(prompt))
+        return (prompt, self.get_cached_token_length(prompt))
 
 
 class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
@@ -679,6 +810,8 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
             f'{self.user_metadata["model_idx"]}_{self.model_name}_{num_input_tokens}'
             f'_{num_output_tokens}_{self.num_concurrent_requests}_{generation_mode}'
         )
+        if self.request_rate is not None:
+            output_file_name += f'_{self.request_rate}qps'
         return self.sanitize_file_prefix(output_file_name)
 
     def stop_benchmark(self) -> None:
@@ -688,7 +821,7 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
 
     def run_benchmark(
         self, sampling_params: Dict[str, Any] = {}, *args: Any, **kwargs: Any
-    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Tuple[Dict[str, Any], str, RequestConfig]] | List[LLMResponse]]:
+    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Dict[str, Any]]]:
         """Run a benchmark test for the specified LLM using synthetically generated data.
 
         Args:
@@ -716,6 +849,9 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
                 'The minimum number of input tokens that will be sent is 40' ' because of the prompting logic right now'
             )
 
+        filename = self.create_output_filename(num_input_tokens, num_output_tokens)
+        self.set_records_file_path(filename)
+
         # Calculate performance metrics individually and summary
         summary, individual_responses = self.get_token_throughput_latencies(
             num_input_tokens=num_input_tokens,
@@ -725,7 +861,6 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         )
 
         if self.results_dir:
-            filename = self.create_output_filename(num_input_tokens, num_output_tokens)
             self.save_results(filename, summary, individual_responses)
 
         return summary, individual_responses
@@ -758,26 +893,26 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
 
         return new_metrics_dict
 
-    def calculate_switching_time(self, llm_responses: list[LLMResponse]) -> list[LLMResponse]:
+    def calculate_switching_time(self, request_metrics: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
         """Logic to calculate switching time. Based on the first request TTFT,
         if this value is significantly larger (more than 3 standard deviations) than the average TTFT
         of the rest requests, then switching time will be the difference between first TTFT
         and average of the coming TTFTs.
 
         Args:
-            llm_responses (list[LLMResponse]): list of LLMResponse objects
+            request_metrics (list[dict]): list of the metrics of each request, with its request index
 
         Returns:
-            list[LLMResponse]: list of LLMResponse objects including switching time
+            list[dict]: list of the metrics of each request including switching time
         """
         # collect necessary information for switching time calculation
         responses_ttfts = []
 
-        for llm_response in llm_responses:
-            if pd.isnull(llm_response.metrics['error_code']):
-                request_idx = llm_response.request_config.request_idx
-                start_time = llm_response.metrics['start_time']
-                server_ttft_s = llm_response.metrics['server_ttft_s']
+        for metrics in request_metrics:
+            if pd.isnull(metrics['error_code']):
+                request_idx = metrics[common_metrics.REQUEST_IDX]
+                start_time = metrics['start_time']
+                server_ttft_s = metrics['server_ttft_s']
                 responses_ttfts.append(
                     {'request_idx': request_idx, 'start_time': start_time, 'server_ttft_s': server_ttft_s}
                 )
@@ -806,23 +941,24 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
                 outlier_switching_time = switching_time
                 df_valid_responses['server_switching_time'].iloc[0] = outlier_switching_time
 
-        # assign switching time back to request object
-        for llm_response in llm_responses:
-            metrics = llm_response.metrics
-
-            if llm_response.request_config.request_idx == df_valid_responses.head(1)['request_idx'].values[0]:
+        # assign switching time back to the request metrics
+        switching_time_metrics = []
+        for metrics in request_metrics:
+            if metrics[common_metrics.REQUEST_IDX] == df_valid_responses.head(1)['request_idx'].values[0]:
                 server_switching_time = df_valid_responses.head(1)['server_switching_time'].values[0]
             else:
                 server_switching_time = None
 
-            llm_response.metrics = self.add_metric_after_key(
-                metrics,
-                new_key='server_switching_time',
-                new_value=server_switching_time,
-                after_key=common_metrics.TTFT_SERVER,
+            switching_time_metrics.append(
+                self.add_metric_after_key(
+                    metrics,
+                    new_key='server_switching_time',
+                    new_value=server_switching_time,
+                    after_key=common_metrics.TTFT_SERVER,
+                )
             )
 
-        return llm_responses
+        return switching_time_metrics
 
     def get_token_throughput_latencies(
         self,
@@ -830,10 +966,7 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         num_output_tokens: int,
         num_requests: int,
         sampling_params: Dict[str, Any],
-    ) -> (
-        Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], str, RequestConfig]]]
-        | Tuple[Dict[str, object], list[LLMResponse]]
-    ):
+    ) -> Tuple[Dict[str, Any] | Dict[str, object], List[Dict[str, Any]]]:
         """This function runs a token benchmark for the given model and API,
         measuring the throughput and latencies for the specified number of input and output tokens,
         and the specified number of requests.
@@ -849,7 +982,7 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
                             including the model name, number of concurrent requests,
                             results, number of input tokens, number of output tokens,
                             and additional sampling parameters.
-            completed_requests (list): A list of completed requests.
+            request_metrics (list): A list of the metrics of the completed requests.
 
         Raises:
             Exception: If an unexpected error occurs during the execution of requests.
@@ -860,72 +993,22 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
         # Build the request config objects that are to be sent to the LLM API endpoint
         request_configs = self.build_request_configs(num_requests, num_input_tokens, num_output_tokens, sampling_params)
 
-        # Get the request counts in order to place them into threads to be executed in batches
-        total_request_count = len(request_configs)
-        requests_per_thread = (total_request_count) // self.num_concurrent_requests
-        remainder = (total_request_count) % self.num_concurrent_requests
-
-        # Set up empty batch array and index for a sliding window of request selection
-        request_config_batches = []
-        idx = 0
-
-        # Create batches of requests for each concurrent request
-        for concurrent_requests in range(self.num_concurrent_requests):
-            num_requests_for_thread = requests_per_thread + (1 if concurrent_requests < remainder else 0)
-            request_config_batch = request_configs[idx : idx + num_requests_for_thread].copy()
-            idx += num_requests_for_thread
-            request_config_batches.append(request_config_batch)
-
-        # Create empty `threads` and `completed_requests` arrays to be populated with execution threads and
-        # completed requests respectively
-        threads: List[threading.Thread] = []
-        llm_responses: List[LLMResponse] = []
-        progress = 0
-
-        # Send request threads and add to the threads array
-        for request_config_batch in request_config_batches:
-            if self.stop_event.is_set():
-                logger.info('Stopping thread creation due to stop signal.')
-                break
-
-            thread = threading.Thread(
-                target=self.send_requests,
-                args=(request_config_batch, llm_responses, progress, start_time, num_requests),
-            )
-            threads.append(thread)
-            add_script_run_ctx(thread)  # Add Streamlit context to thread
-            thread.start()
-
-        # Wait for all threads to complete
-        for thread in threads:
-            add_script_run_ctx(thread)
-            thread.join()
+        # Send the requests with the configured dispatcher
+        request_metrics = self.run_requests(request_configs, start_time, num_requests)
 
         if self.stop_event.is_set():
             logger.info('Benchmarking process terminated early due to stop signal.')
             return {}, []
 
         # Error handling
-        error_codes = [llm_response.metrics['error_code'] for llm_response in llm_responses]
+        error_codes = [metrics['error_code'] for metrics in request_metrics]
 
         if not any([pd.isnull(error_code) for error_code in error_codes]):
             unique_error_codes = list(
-                set(
-                    [
-                        llm_response.metrics['error_code']
-                        for llm_response in llm_responses
-                        if not pd.isnull(llm_response.metrics['error_code'])
-                    ]
-                )
+                set([metrics['error_code'] for metrics in request_metrics if not pd.isnull(metrics['error_code'])])
             )
             unique_error_msgs = list(
-                set(
-                    [
-                        llm_response.metrics['error_msg']
-                        for llm_response in llm_responses
-                        if not pd.isnull(llm_response.metrics['error_code'])
-                    ]
-                )
+                set([metrics['error_msg'] for metrics in request_metrics if not pd.isnull(metrics['error_code'])])
             )
             nl = '\n'
             raise Exception(
@@ -933,20 +1016,19 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
                 + f"""Additional messages: {f'{nl}-'.join(unique_error_msgs)}"""
             )
 
-        # Capture end time and notify user
-        end_time = time.monotonic()
+        # Notify user, output tokens were counted in batches as the responses completed
         logger.info('Tasks Executed!')
         logger.info(f'Results for token benchmark for {self.model_name} queried with the {self.llm_api} api.')
 
         # Calculate switching time
-        llm_responses = self.calculate_switching_time(llm_responses)
+        request_metrics = self.calculate_switching_time(request_metrics)
 
         # Build a metrics summary for the results of the benchmarking run
         results = self.build_metrics_summary(
-            metrics=[response.metrics for response in llm_responses],
             start_time=start_time,
-            end_time=end_time,
+            end_time=self.requests_end_time,
         )
+        results[common_metrics.TOKEN_COUNTING_TIME] = round(self.token_counting_time, 4)
 
         # Construct metadata payload to be returned
         metadata = {
@@ -956,9 +1038,13 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
             'num_input_tokens': num_input_tokens,
             'num_output_tokens': num_output_tokens,
             'additional_sampling_params': sampling_params,
+            'dispatcher': self.dispatcher,
+            'request_rate': self.request_rate,
+            'keep_alive': self.keep_alive,
+            'http2': self.http2,
         }
 
-        return metadata, llm_responses
+        return metadata, request_metrics
 
     def build_request_configs(
         self,
@@ -1025,9 +1111,20 @@ class SyntheticPerformanceEvaluator(BasePerformanceEvaluator):
 
         # Load from prompt files
         prompt_template = yaml.safe_load(PromptTemplate.from_file(USER_PROMPT_PATH).template)['template']
-        prompt_template = prompt_template * 100_000
+
+        # Look up prompts already built for this tokenizer, template and input tokens
+        template_hash = self.prompt_cache.hash_text(prompt_template)
+        cached_prompt = self.prompt_cache.get_prompt(self.tokenizer.name_or_path, template_hash, num_input_tokens)
+        if cached_prompt is not None:
+            return cached_prompt
+
+        # Repeat the template just enough times to go over the desired input tokens
+        template_token_count = max(len(self.tokenizer.tokenize(prompt_template)), 1)
+        prompt_template = prompt_template * (num_input_tokens // template_token_count + 2)
 
         #  Adjust prompt according to desired input tokens
         full_input_prompt = self.adjust_to_exact_tokens(prompt_template, num_input_tokens)
+        prompt_tuple = (full_input_prompt, self.get_token_length(full_input_prompt))
 
-        return (full_input_prompt, self.get_token_length(full_input_prompt))
+        self.prompt_cache.put_prompt(self.tokenizer.name_or_path, template_hash, num_input_tokens, *prompt_tuple)
+        return prompt_tuple
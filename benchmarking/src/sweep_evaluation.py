@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Tuple, Type, cast
+
+import pandas as pd
+
+from benchmarking.src.llmperf import common_metrics
+from benchmarking.src.llmperf.http_clients import CONNECTIONS_PER_CLIENT, AsyncClientPool
+from benchmarking.src.performance_evaluation import BasePerformanceEvaluator, SyntheticPerformanceEvaluator
+
+logger = logging.getLogger(__name__)
+
+SLO_METRICS = {
+    'ttft': common_metrics.TTFT,
+    'e2e_latency': common_metrics.E2E_LAT,
+}
+SLO_QUANTILES = ['p50', 'p75', 'p90', 'p95', 'p99']
+
+
+class SweepPerformanceEvaluator:
+    """Runs synthetic benchmarks over a grid of concurrency x input tokens x output tokens, or searches the highest
+    concurrency meeting a latency objective, in a single process.
+
+    The tokenizer and prompt cache are shared by all the points of the sweep, and with the async dispatcher the same
+    HTTP clients and event loop are reused, so consecutive points start with warm connections. Every point is added
+    to a consolidated results table that is written after each run, so partial sweeps are kept.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        results_dir: str,
+        llm_api: str = 'sncloud',
+        user_metadata: Dict[str, Any] = {},
+        timeout: int = 600,
+        dispatcher: str = 'async',
+        sampling_params: Dict[str, Any] = {},
+        num_requests: Optional[int] = None,
+        requests_per_concurrency: int = 4,
+        keep_alive: bool = True,
+        http2: bool = False,
+    ) -> None:
+        """
+        Args:
+            model_name (str): name of the model to benchmark
+            results_dir (str): directory where the results of each point and the consolidated table are saved
+            llm_api (str): 'sncloud' or 'sambastudio'
+            user_metadata (dict): metadata added to the results of each point
+            timeout (int): time in seconds after which no new requests are sent, per point
+            dispatcher (str): 'async' or 'threads'. Connections are only reused across points with 'async'.
+            sampling_params (dict): sampling parameters sent with each request
+            num_requests (int, optional): number of requests per point. When not set, each point sends
+                `requests_per_concurrency` requests per concurrent stream.
+            requests_per_concurrency (int): requests per concurrent stream when `num_requests` is not set
+            keep_alive (bool): whether connections are kept open and reused between requests
+            http2 (bool): whether to negotiate HTTP/2 with the server. Requires the `h2` package.
+        """
+        self.model_name = model_name
+        self.results_dir = results_dir
+        self.llm_api = llm_api
+        self.user_metadata = user_metadata
+        self.timeout = timeout
+        self.dispatcher = dispatcher
+        self.sampling_params = sampling_params
+        self.num_requests = num_requests
+        self.requests_per_concurrency = requests_per_concurrency
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        # quantiles of the latency and throughput metrics reported in the consolidated table
+        self.quantiles = ['p50', 'p90', 'p99']
+
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client_pool: Optional[AsyncClientPool] = None
+        self.rows: List[Dict[str, Any]] = []
+        table_prefix = BasePerformanceEvaluator.sanitize_file_prefix(f'sweep_{model_name}')
+        self.table_file_path = str(Path(results_dir) / f'{table_prefix}_{time.strftime("%Y%m%d-%H%M%S")}.csv')
+
+    def __enter__(self) -> 'SweepPerformanceEvaluator':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the shared HTTP clients and their event loop"""
+        if self.event_loop is None:
+            return
+        if self.client_pool is not None:
+            self.event_loop.run_until_complete(self.client_pool.aclose())
+        self.event_loop.close()
+        self.event_loop = None
+        self.client_pool = None
+
+    def reserve_streams(self, num_streams: int) -> None:
+        """Creates the shared HTTP clients for the largest concurrency of the sweep, so they are not recreated when
+        the concurrency grows from one point to the next
+
+        Args:
+            num_streams (int): largest number of concurrent streams of the sweep
+        """
+        if self.dispatcher != 'async':
+            return
+        if self.event_loop is None:
+            self.event_loop = asyncio.new_event_loop()
+        if self.client_pool is not None:
+            if len(self.client_pool.clients) * CONNECTIONS_PER_CLIENT >= num_streams:
+                return
+            self.event_loop.run_until_complete(self.client_pool.aclose())
+        self.client_pool = AsyncClientPool(num_streams, keep_alive=self.keep_alive, http2=self.http2)
+
+    def run_point(self, num_concurrent_requests: int, num_input_tokens: int, num_output_tokens: int) -> Dict[str, Any]:
+        """Runs the benchmark of a single point and adds it to the consolidated table
+
+        Args:
+            num_concurrent_requests (int): number of concurrent requests
+            num_input_tokens (int): number of input tokens of each request
+            num_output_tokens (int): number of output tokens of each request
+
+        Returns:
+            dict: row of the consolidated table for this point
+        """
+        self.reserve_streams(num_concurrent_requests)
+        num_requests = self.num_requests or num_concurrent_requests * self.requests_per_concurrency
+        row: Dict[str, Any] = {
+            'model': self.model_name,
+            'num_concurrent_requests': num_concurrent_requests,
+            'num_input_tokens': num_input_tokens,
+            'num_output_tokens': num_output_tokens,
+            'num_requests': num_requests,
+        }
+        logger.info(f'Sweep point: {row}')
+
+        # Evaluators are cheap to create since the tokenizer and the prompt cache are shared by the process
+        evaluator = SyntheticPerformanceEvaluator(
+            model_name=self.model_name,
+            results_dir=self.results_dir,
+            num_concurrent_requests=num_concurrent_requests,
+            user_metadata={**self.user_metadata, 'model_idx': self.user_metadata.get('model_idx', 0)},
+            llm_api=self.llm_api,
+            timeout=self.timeout,
+            dispatcher=self.dispatcher,
+            keep_alive=self.keep_alive,
+            http2=self.http2,
+            client_pool=self.client_pool,
+            event_loop=self.event_loop,
+        )
+        try:
+            summary, _ = evaluator.run_benchmark(
+                num_input_tokens=num_input_tokens,
+                num_output_tokens=num_output_tokens,
+                num_requests=num_requests,
+                sampling_params=self.sampling_params,
+            )
+            row.update(self.summarize(cast(Dict[str, Any], summary['results']), self.quantiles))
+            row['summary_file_path'] = evaluator.summary_file_path
+        except Exception as e:
+            logger.error(f'Sweep point failed: {e}')
+            row[common_metrics.ERROR_RATE] = 1.0
+            row[common_metrics.ERROR_MSG] = str(e)
+
+        self.rows.append(row)
+        self.save_table()
+        return row
+
+    @staticmethod
+    def summarize(results: Dict[str, Any], quantiles: List[str]) -> Dict[str, Any]:
+        """Flattens the main statistics of a benchmark summary into a table row
+
+        Args:
+            results (dict): `results` field of a benchmark summary
+            quantiles (list): quantiles of the latency and throughput metrics to keep, e.g. ['p50', 'p99']
+
+        Returns:
+            dict: flat statistics
+        """
+        row: Dict[str, Any] = {}
+        for metric in [common_metrics.TTFT, common_metrics.E2E_LAT, common_metrics.REQ_OUTPUT_THROUGHPUT]:
+            for quantile in quantiles:
+                row[f'{metric}_{quantile}'] = results[metric]['quantiles'].get(quantile)
+        for metric in [
+            common_metrics.OUTPUT_THROUGHPUT,
+            common_metrics.COMPLETED_REQUESTS_PER_MIN,
+            common_metrics.NUM_COMPLETED_REQUESTS,
+            common_metrics.ERROR_RATE,
+        ]:
+            row[metric] = results[metric]
+        return row
+
+    def run_grid(self, concurrencies: List[int], input_tokens: List[int], output_tokens: List[int]) -> pd.DataFrame:
+        """Runs every combination of concurrency, input tokens and output tokens
+
+        Args:
+            concurrencies (list): numbers of concurrent requests
+            input_tokens (list): numbers of input tokens
+            output_tokens (list): numbers of output tokens
+
+        Returns:
+            pd.DataFrame: consolidated results table
+        """
+        self.reserve_streams(max(concurrencies))
+        for num_input_tokens in input_tokens:
+            for num_output_tokens in output_tokens:
+                for num_concurrent_requests in concurrencies:
+                    self.run_point(num_concurrent_requests, num_input_tokens, num_output_tokens)
+        return self.get_table()
+
+    def find_max_concurrency(
+        self,
+        num_input_tokens: int,
+        num_output_tokens: int,
+        slo_threshold: float,
+        slo_metric: str = 'ttft',
+        slo_quantile: str = 'p99',
+        min_concurrency: int = 1,
+        max_concurrency: int = 256,
+        max_error_rate: float = 0.0,
+    ) -> Tuple[Optional[int], pd.DataFrame]:
+        """Searches the highest concurrency whose latency quantile stays under a threshold. The concurrency is
+        doubled until the objective is missed, then the last interval is bisected.
+
+        Args:
+            num_input_tokens (int): number of input tokens of each request
+            num_output_tokens (int): number of output tokens of each request
+            slo_threshold (float): latency threshold in seconds
+            slo_metric (str): 'ttft' or 'e2e_latency'
+            slo_quantile (str): quantile compared to the threshold, e.g. 'p99'
+            min_concurrency (int): first concurrency tried
+            max_concurrency (int): highest concurrency tried
+            max_error_rate (float): highest error rate for a point to meet the objective
+
+        Returns:
+            int: highest concurrency meeting the objective, or None if `min_concurrency` already misses it
+            pd.DataFrame: consolidated results table
+        """
+        if slo_metric not in SLO_METRICS:
+            raise ValueError(f'slo_metric must be one of {list(SLO_METRICS)}. Got {slo_metric}')
+        if slo_quantile not in SLO_QUANTILES:
+            raise ValueError(f'slo_quantile must be one of {SLO_QUANTILES}. Got {slo_quantile}')
+        self.reserve_streams(max_concurrency)
+        if slo_quantile not in self.quantiles:
+            self.quantiles.append(slo_quantile)
+        metric_column = f'{SLO_METRICS[slo_metric]}_{slo_quantile}'
+
+        def meets_slo(num_concurrent_requests: int) -> bool:
+            row = self.run_point(num_concurrent_requests, num_input_tokens, num_output_tokens)
+            value = row.get(metric_column)
+            row['meets_slo'] = (
+                value is not None
+                and not pd.isnull(value)
+                and value <= slo_threshold
+                and row[common_metrics.ERROR_RATE] <= max_error_rate
+            )
+            self.save_table()
+            return bool(row['meets_slo'])
+
+        best: Optional[int] = None
+        failed: Optional[int] = None
+        num_concurrent_requests = min_concurrency
+        while True:
+            if not meets_slo(num_concurrent_requests):
+                failed = num_concurrent_requests
+                break
+            best = num_concurrent_requests
+            if num_concurrent_requests >= max_concurrency:
+                break
+            num_concurrent_requests = min(num_concurrent_requests * 2, max_concurrency)
+
+        if best is not None and failed is not None:
+            low, high = best, failed
+            while high - low > 1:
+                middle = (low + high) // 2
+                if meets_slo(middle):
+                    low = middle
+                else:
+                    high = middle
+            best = low
+
+        logger.info(
+            f'Max concurrency with {slo_quantile} {slo_metric} <= {slo_threshold}s for {num_input_tokens} input and '
+            f'{num_output_tokens} output tokens: {best}'
+        )
+        return best, self.get_table()
+
+    def get_table(self) -> pd.DataFrame:
+        """Gets the consolidated results table of all the points run so far"""
+        return pd.DataFrame(self.rows)
+
+    def save_table(self) -> None:
+        """Writes the consolidated results table, when a results directory is set"""
+        if not self.results_dir:
+            return
+        Path(self.results_dir).mkdir(parents=True, exist_ok=True)
+        self.get_table().to_csv(self.table_file_path, index=False)
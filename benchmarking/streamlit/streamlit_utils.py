@@ -34,9 +34,12 @@ def find_pages_to_hide() -> List[str]:
     return pages_to_hide
 
 
-def update_progress_bar(step: int, total_steps: int) -> None:
-    """Update the progress bar."""
-    st.session_state.progress_bar.progress(value=step / total_steps, text=f'Running requests: {step}/{total_steps}')
+def update_progress_bar(step: int, total_steps: int, live_stats: str = '') -> None:
+    """Update the progress bar, with the rolling latency and throughput statistics of the run if available."""
+    text = f'Running requests: {step}/{total_steps}'
+    if live_stats:
+        text += f' | {live_stats}'
+    st.session_state.progress_bar.progress(value=step / total_steps, text=text)
 
 
 def set_api_variables() -> Dict[str, Any]:
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Load Generator Test Script
+
+This script tests the async load generator of the Benchmarking kit against the local mock SSE server,
+so no endpoint or API key is needed.
+
+Usage:
+    python tests/load_generator_test.py
+
+Returns:
+    0 if all tests pass, or a positive integer representing the number of failed tests.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Setup paths and global variables
+file_dir = os.path.dirname(os.path.abspath(__file__))
+kit_dir = os.path.abspath(os.path.join(file_dir, '..'))  # absolute path to kit directory
+repo_dir = os.path.abspath(os.path.join(kit_dir, '..'))  # absolute path to ai-starter-kit directory
+
+sys.path.append(kit_dir)
+sys.path.append(repo_dir)
+
+from typing import Any, Dict, List, Optional, Type
+
+from benchmarking.src.llmperf import common_metrics
+from benchmarking.src.llmperf.load_generator import AsyncLoadGenerator
+from benchmarking.src.llmperf.mock_sse_server import MockSSEServer
+from benchmarking.src.llmperf.models import LLMResponse, RequestConfig
+
+MOCK_TTFT = 0.05
+MOCK_INTER_TOKEN_LATENCY = 0.002
+MAX_TOKENS = 10
+
+
+class WhitespaceTokenizer:
+    """Tokenizer counting words, for the prompts and the chunks whose tokens are not reported by the server"""
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = False) -> Dict[str, List[List[str]]]:
+        return {'input_ids': [text.split() for text in texts]}
+
+    def encode(self, text: str) -> List[str]:
+        return text.split()
+
+
+class AsyncLoadGeneratorTestCase(unittest.TestCase):
+    server: MockSSEServer
+    loop: asyncio.AbstractEventLoop
+    environ: Dict[str, Optional[str]]
+
+    @classmethod
+    def setUpClass(cls: Type['AsyncLoadGeneratorTestCase']) -> None:
+        # the mock server runs on its own event loop, so the load generator can run its own with asyncio.run
+        cls.loop = asyncio.new_event_loop()
+        threading.Thread(target=cls.loop.run_forever, daemon=True).start()
+        cls.server = MockSSEServer(port=0, ttft=MOCK_TTFT, inter_token_latency=MOCK_INTER_TOKEN_LATENCY)
+        asyncio.run_coroutine_threadsafe(cls.server.start(), cls.loop).result()
+        mock_environ = {'SAMBANOVA_URL': cls.server.url, 'SAMBANOVA_API_KEY': 'mock-key'}
+        cls.environ = {key: os.environ.get(key) for key in mock_environ}
+        os.environ.update(mock_environ)
+
+    def setUp(self) -> None:
+        self.server.num_connections = 0
+
+    def get_request_configs(self, num_requests: int) -> List[RequestConfig]:
+        return [
+            RequestConfig(
+                request_idx=idx,
+                model='mock-model',
+                prompt_tuple=('Tell me a story', 4),
+                sampling_params={'max_tokens_to_generate': MAX_TOKENS},
+                llm_api='sncloud',
+                is_stream_mode=True,
+                num_concurrent_requests=1,
+            )
+            for idx in range(num_requests)
+        ]
+
+    def create_generator(self, **kwargs: Any) -> AsyncLoadGenerator:
+        tokenizer: Any = WhitespaceTokenizer()
+        return AsyncLoadGenerator(tokenizer, **kwargs)
+
+    def check_responses(self, responses: List[LLMResponse], num_requests: int) -> None:
+        self.assertEqual(len(responses), num_requests)
+        self.assertEqual(sorted(r.request_config.request_idx for r in responses), list(range(num_requests)))
+        for response in responses:
+            self.assertIsNone(response.metrics[common_metrics.ERROR_CODE], response.metrics[common_metrics.ERROR_MSG])
+            self.assertEqual(response.response_text, ' token' * MAX_TOKENS)
+            self.assertEqual(response.metrics[common_metrics.NUM_OUTPUT_TOKENS_SERVER], MAX_TOKENS)
+            self.assertIsNotNone(response.stream_record, 'Token counting should be deferred to after the run')
+
+    def test_closed_loop(self) -> None:
+        completed: List[int] = []
+        responses = self.create_generator(num_concurrent_requests=4).run(
+            self.get_request_configs(12), on_response=lambda r: completed.append(r.request_config.request_idx)
+        )
+        self.check_responses(responses, 12)
+        self.assertEqual(len(completed), 12, 'The callback should be called for each response')
+        self.assertLessEqual(self.server.num_connections, 4, 'Connections should be reused between requests')
+        for response in responses:
+            self.assertEqual(response.metrics[common_metrics.DISPATCH_DELAY], 0.0)
+
+    def test_open_loop(self) -> None:
+        request_rate = 40.0
+        start_time = time.monotonic()
+        responses = self.create_generator(
+            num_concurrent_requests=1, request_rate=request_rate, arrival_distribution='constant'
+        ).run(self.get_request_configs(10))
+        elapsed_time = time.monotonic() - start_time
+
+        self.check_responses(responses, 10)
+        self.assertEqual([r.request_config.request_idx for r in responses], list(range(10)), 'Arrival order expected')
+        # the last request is launched 9 inter-arrival times after the first, whatever the server speed
+        self.assertGreaterEqual(elapsed_time, 9 / request_rate)
+        self.assertLess(elapsed_time, 9 / request_rate + 1.0)
+        self.assertGreater(self.server.num_connections, 1, 'Requests should overlap in open loop')
+
+    def test_open_loop_max_in_flight(self) -> None:
+        responses = self.create_generator(
+            num_concurrent_requests=1, request_rate=1000.0, arrival_distribution='constant', max_in_flight=1
+        ).run(self.get_request_configs(4))
+
+        self.check_responses(responses, 4)
+        dispatch_delays = [r.metrics[common_metrics.DISPATCH_DELAY] for r in responses]
+        self.assertGreater(dispatch_delays[-1], 2 * MOCK_TTFT, 'Requests over the cap should wait and record it')
+
+    def test_open_loop_without_keeping_responses(self) -> None:
+        completed: List[LLMResponse] = []
+        responses = self.create_generator(
+            num_concurrent_requests=1, request_rate=100.0, arrival_distribution='constant'
+        ).run(self.get_request_configs(6), on_response=completed.append, keep_responses=False)
+
+        self.assertEqual(responses, [], 'Responses should only be handed to the callback')
+        self.check_responses(completed, 6)
+
+    def test_timeout(self) -> None:
+        responses = self.create_generator(num_concurrent_requests=1, timeout=0).run(self.get_request_configs(4))
+        self.assertEqual(responses, [], 'No request should be sent after the timeout')
+
+    @classmethod
+    def tearDownClass(cls: Type['AsyncLoadGeneratorTestCase']) -> None:
+        asyncio.run_coroutine_threadsafe(cls.server.stop(), cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        for key, value in cls.environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def main() -> int:
+    suite = unittest.TestLoader().loadTestsFromTestCase(AsyncLoadGeneratorTestCase)
+    test_result = unittest.TextTestRunner().run(suite)
+    return len(test_result.failures) + len(test_result.errors)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
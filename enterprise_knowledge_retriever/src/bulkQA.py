@@ -142,6 +142,8 @@ def process_bulk_QA(vectordb_path: str, questions_file_path: str) -> str:
             llm=documentRetrieval.llm,
             qa_prompt=load_prompt(os.path.join(kit_dir, documentRetrieval.prompts['qa_prompt'])),
             rerank=documentRetrieval.retrieval_info['rerank'],
+            reranker=documentRetrieval.retrieval_info['reranker'],
+            reranker_backend=documentRetrieval.retrieval_info.get('reranker_backend', 'torch'),
             final_k_retrieved_documents=documentRetrieval.retrieval_info['final_k_retrieved_documents'],
             conversational=False,
         )
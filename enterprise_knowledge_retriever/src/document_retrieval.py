@@ -5,7 +5,6 @@ import threading
 from typing import Any, Dict, List, Optional, Tuple
 
 import nltk
-import torch
 import yaml
 from dotenv import load_dotenv
 from langchain.chains.base import Chain
@@ -18,7 +17,6 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.vectorstores.base import VectorStoreRetriever
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 kit_dir = os.path.abspath(os.path.join(current_dir, '..'))
@@ -35,6 +33,7 @@ PERSIST_DIRECTORY = os.path.join(kit_dir, 'data/my-vector-db')
 
 load_dotenv(os.path.join(repo_dir, '.env'))
 
+from enterprise_knowledge_retriever.src.reranker import get_reranker
 from utils.parsing.sambaparse import parse_doc_universal
 
 # Configure the logger
@@ -103,6 +102,9 @@ class RetrievalQAChain(Chain):
 
     retriever: BaseRetriever
     rerank: bool = True
+    reranker: str = 'BAAI/bge-reranker-large'
+    # 'torch', 'quantized' or 'onnx', see CrossEncoderReranker
+    reranker_backend: str = 'torch'
     llm: BaseChatModel
     qa_prompt: ChatPromptTemplate
     final_k_retrieved_documents: int = 3
@@ -131,35 +133,15 @@ class RetrievalQAChain(Chain):
         super().__init__(**kwargs)
         if self.conversational:
             self.init_memory()
+        if self.rerank:
+            # load the shared reranker now instead of on the first query
+            get_reranker(self.reranker, self.reranker_backend)
 
     def _format_docs(self, docs: List[Document]) -> str:
         return '\n\n'.join(doc.page_content for doc in docs)
 
     def rerank_docs(self, query: str, docs: List[Document], final_k: int) -> List[Document]:
-        # Lazy hardcoding for now
-        tokenizer = AutoTokenizer.from_pretrained('BAAI/bge-reranker-large')
-        reranker = AutoModelForSequenceClassification.from_pretrained('BAAI/bge-reranker-large')
-        pairs = []
-        for d in docs:
-            pairs.append([query, d.page_content])
-
-        with torch.no_grad():
-            inputs = tokenizer(
-                pairs,
-                padding=True,
-                truncation=True,
-                return_tensors='pt',
-                max_length=512,
-            )
-            scores = (
-                reranker(**inputs, return_dict=True)
-                .logits.view(
-                    -1,
-                )
-                .float()
-            )
-
-        scores_list = scores.tolist()
+        scores_list = get_reranker(self.reranker, self.reranker_backend).score(query, [d.page_content for d in docs])
         scores_sorted_idx = sorted(range(len(scores_list)), key=lambda k: scores_list[k], reverse=True)
 
         docs_sorted = [docs[k] for k in scores_sorted_idx]
@@ -321,9 +303,10 @@ class DocumentRetrieval:
         collection_name: Optional[str] = None,
     ) -> Any:
         logger.info(f'Created collection, name is {collection_name}')
+        cache_dir = self.embedding_model_info.get('cache_dir')
         vectorstore = self.vectordb.create_vector_store(
             text_chunks, embeddings, output_db=output_db, collection_name=collection_name,
-            db_type=self.retrieval_info['db_type']
+            db_type=self.retrieval_info['db_type'], cache_dir=os.path.join(kit_dir, cache_dir) if cache_dir else None
         )
         return vectorstore
 
@@ -373,6 +356,8 @@ class DocumentRetrieval:
             llm=self.llm,
             qa_prompt=load_chat_prompt(os.path.join(repo_dir, self.prompts['qa_prompt'])),
             rerank=self.retrieval_info['rerank'],
+            reranker=self.retrieval_info['reranker'],
+            reranker_backend=self.retrieval_info.get('reranker_backend', 'torch'),
             final_k_retrieved_documents=self.retrieval_info['final_k_retrieved_documents'],
             conversational=conversational,
             summary_prompt=load_chat_prompt(os.path.join(repo_dir, self.prompts['summary_prompt'])),
@@ -0,0 +1,143 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+RERANKER_BACKENDS = ['torch', 'quantized', 'onnx']
+
+
+class CrossEncoderReranker:
+    """Cross-encoder reranker shared by all the queries of the process.
+
+    The model is loaded once. Queries are tokenized in the calling threads and their pairs are scored by a single
+    worker thread. The worker batches together the pairs of all the queries waiting when it becomes free, so
+    concurrent queries share forward passes. Pairs are sorted by length before being split into batches, so each
+    batch is padded to similar lengths only.
+    """
+
+    def __init__(
+        self,
+        model_name: str = 'BAAI/bge-reranker-large',
+        backend: str = 'torch',
+        batch_size: int = 16,
+        max_length: int = 512,
+        max_batch_pairs: int = 256,
+    ) -> None:
+        """
+        Args:
+            model_name (str): name or path of the cross-encoder model
+            backend (str): 'torch', 'quantized' for int8 dynamic quantization of the linear layers on CPU, or 'onnx'
+                for ONNX Runtime on CPU, which requires the `optimum[onnxruntime]` package
+            batch_size (int): maximum number of pairs per forward pass
+            max_length (int): maximum number of tokens per pair, longer pairs are truncated
+            max_batch_pairs (int): maximum number of pairs gathered from waiting queries before scoring them
+        """
+        if backend not in RERANKER_BACKENDS:
+            raise ValueError(f'backend must be one of {RERANKER_BACKENDS}. Got {backend}')
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.max_batch_pairs = max_batch_pairs
+
+        logger.info(f'Loading reranker {model_name} with {backend} backend')
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = self._load_model()
+
+        self._queue: queue.Queue[Tuple[List[Dict[str, Any]], Future[List[float]]]] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='reranker', daemon=True)
+        self._worker.start()
+
+    def _load_model(self) -> Any:
+        if self.backend == 'onnx':
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification  # type: ignore
+            except ImportError:
+                raise ImportError(
+                    'The onnx reranker backend requires optimum with onnxruntime. '
+                    'Install it with `pip install optimum[onnxruntime]`.'
+                )
+            return ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+        if self.backend == 'quantized':
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _run(self) -> None:
+        while True:
+            requests = [self._queue.get()]
+            num_pairs = len(requests[0][0])
+            # batch together the queries that arrived while the previous batch was scored
+            while num_pairs < self.max_batch_pairs:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                requests.append(request)
+                num_pairs += len(request[0])
+            self._score_requests(requests)
+
+    def _score_requests(self, requests: List[Tuple[List[Dict[str, Any]], Future[List[float]]]]) -> None:
+        """Scores the pairs of several queries in length sorted batches and sets the result of each query"""
+        pairs = [
+            (request_idx, pair_idx, features)
+            for request_idx, (request_features, _) in enumerate(requests)
+            for pair_idx, features in enumerate(request_features)
+        ]
+        pairs.sort(key=lambda pair: len(pair[2]['input_ids']))
+        scores: List[List[float]] = [[0.0] * len(request_features) for request_features, _ in requests]
+        try:
+            with torch.inference_mode():
+                for i in range(0, len(pairs), self.batch_size):
+                    batch = pairs[i : i + self.batch_size]
+                    inputs = self.tokenizer.pad([features for _, _, features in batch], return_tensors='pt')
+                    logits = self.model(**inputs, return_dict=True).logits.view(-1).float().tolist()
+                    for (request_idx, pair_idx, _), score in zip(batch, logits):
+                        scores[request_idx][pair_idx] = score
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+        for (_, future), request_scores in zip(requests, scores):
+            future.set_result(request_scores)
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """Gets the relevance scores of texts for a query
+
+        Args:
+            query (str): query
+            texts (list): texts to score
+
+        Returns:
+            list: relevance score of each text, higher is more relevant
+        """
+        if not texts:
+            return []
+        encodings = self.tokenizer([query] * len(texts), texts, truncation=True, max_length=self.max_length)
+        features = [{key: encodings[key][i] for key in encodings.keys()} for i in range(len(texts))]
+        future: Future[List[float]] = Future()
+        self._queue.put((features, future))
+        return future.result()
+
+
+@lru_cache(maxsize=None)
+def get_reranker(model_name: str = 'BAAI/bge-reranker-large', backend: str = 'torch') -> CrossEncoderReranker:
+    """Gets the reranker of a model and backend, loaded once and shared by the whole process
+
+    Args:
+        model_name (str): name or path of the cross-encoder model
+        backend (str): 'torch', 'quantized' or 'onnx'
+
+    Returns:
+        CrossEncoderReranker: shared reranker
+    """
+    return CrossEncoderReranker(model_name, backend)
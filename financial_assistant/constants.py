@@ -44,6 +44,16 @@ SAMBANOVA_ORANGE = (238, 118, 36)
 
 # STOCK INFO
 YFINANCE_COLUMNS_JSON = os.path.join(kit_dir, 'streamlit/yfinance_columns.json')
+# Persistent cache of the Yahoo Finance datasets of each company
+YFINANCE_CACHE_DIR = os.path.join(kit_dir, 'data/yfinance_cache')
+# Seconds after which the datasets that do not depend on dates (e.g. `info`, `income_stmt`) are fetched again
+YFINANCE_CACHE_MAX_AGE = 24 * 60 * 60
+# Number of datasets of a company fetched concurrently
+YFINANCE_MAX_WORKERS = 8
+# Number of companies whose datasets are fetched concurrently
+YFINANCE_MAX_COMPANIES = 4
+# Persistent index of company names to ticker symbols
+SYMBOL_INDEX_DIR = os.path.join(kit_dir, 'data/symbol_index')
 
 # Define default values for text inputs
 DEFAULT_COMPANY_NAME = 'Meta'
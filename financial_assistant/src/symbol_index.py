@@ -0,0 +1,153 @@
+"""
+Local index of the ticker symbols of company names.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from financial_assistant.src.utilities import get_logger
+
+logger = get_logger()
+
+# Names and ticker symbols of the companies filing with the SEC
+SEC_COMPANY_TICKERS_URL = 'https://www.sec.gov/files/company_tickers.json'
+
+# Legal suffixes ignored when matching company names
+COMPANY_NAME_SUFFIXES = {'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'plc'}
+
+
+def normalize_company_name(company_name: str) -> str:
+    """
+    Normalize a company name, so that its spelling variants map to the same ticker symbol.
+
+    Case, punctuation, state of incorporation tags (e.g. `/DE/`), a leading `the` and legal suffixes are ignored.
+
+    Args:
+        company_name: The name of the company.
+
+    Returns:
+        The normalized company name.
+    """
+    name = re.sub(r'/[a-z]{2}/', ' ', company_name.casefold())
+    words = re.sub(r'[^\w&]+', ' ', name).split()
+    if len(words) > 1 and words[0] == 'the':
+        words = words[1:]
+    while len(words) > 1 and words[-1] in COMPANY_NAME_SUFFIXES:
+        words = words[:-1]
+    return ' '.join(words)
+
+
+class SymbolIndex:
+    """
+    Local index of the ticker symbols of company names.
+
+    Company names are resolved, in order, with:
+        - The symbols resolved previously, e.g. by the LLM, which are persisted in `learned_symbols.json`.
+        - The names of the companies filing with the SEC,
+            which are downloaded once and stored in `sec_company_tickers.json`.
+        - The ticker symbols themselves, for company names given as upper case ticker symbols.
+    """
+
+    def __init__(self, index_dir: str) -> None:
+        """
+        Initializes the index, which is loaded when it is first used.
+
+        Args:
+            index_dir: The directory where the index files are stored.
+        """
+        self.index_dir = index_dir
+        self.learned_symbols_path = os.path.join(index_dir, 'learned_symbols.json')
+        self.sec_company_tickers_path = os.path.join(index_dir, 'sec_company_tickers.json')
+        self._learned_symbols: Optional[Dict[str, str]] = None
+        self._sec_symbols: Dict[str, str] = dict()
+        self._tickers: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _load_sec_company_tickers(self) -> List[Dict[str, str]]:
+        """Load the SEC company tickers, downloading them if they are not stored yet."""
+
+        if not os.path.exists(self.sec_company_tickers_path):
+            headers = {'User-Agent': f'{os.getenv("SEC_API_ORGANIZATION")} {os.getenv("SEC_API_EMAIL")}'}
+            response = requests.get(SEC_COMPANY_TICKERS_URL, headers=headers, timeout=30)
+            response.raise_for_status()
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self.sec_company_tickers_path, 'w') as sec_file:
+                sec_file.write(response.text)
+
+        with open(self.sec_company_tickers_path, 'r') as sec_file:
+            return list(json.load(sec_file).values())
+
+    def _load(self) -> Dict[str, str]:
+        """Load the index, if not loaded yet, and return the learned symbols."""
+
+        if self._learned_symbols is not None:
+            return self._learned_symbols
+
+        try:
+            with open(self.learned_symbols_path, 'r') as learned_file:
+                self._learned_symbols = dict(json.load(learned_file))
+        except (OSError, ValueError):
+            self._learned_symbols = dict()
+
+        try:
+            company_tickers = self._load_sec_company_tickers()
+        except Exception as e:
+            logger.warning(f'Could not load the SEC company tickers: {e}')
+            company_tickers = list()
+
+        # The SEC companies are sorted by size, so the largest company wins when several share a name
+        for company in company_tickers:
+            self._sec_symbols.setdefault(normalize_company_name(company['title']), company['ticker'])
+            self._tickers.add(company['ticker'])
+
+        return self._learned_symbols
+
+    def resolve(self, company_name: str) -> Optional[str]:
+        """
+        Resolve the ticker symbol of a company name.
+
+        Args:
+            company_name: The name of the company.
+
+        Returns:
+            The ticker symbol of the company, or None if it is not in the index.
+        """
+        with self._lock:
+            learned_symbols = self._load()
+            normalized_name = normalize_company_name(company_name)
+            if normalized_name in learned_symbols:
+                return learned_symbols[normalized_name]
+            if normalized_name in self._sec_symbols:
+                return self._sec_symbols[normalized_name]
+            if company_name.strip() in self._tickers:
+                return company_name.strip()
+            return None
+
+    def add(self, company_symbols: Dict[str, str]) -> None:
+        """
+        Add resolved ticker symbols to the index, and persist them.
+
+        Args:
+            company_symbols: A dictionary with the company names as keys and their ticker symbols as values.
+        """
+        if len(company_symbols) == 0:
+            return
+
+        with self._lock:
+            learned_symbols = self._load()
+            for company_name, symbol in company_symbols.items():
+                learned_symbols[normalize_company_name(company_name)] = symbol
+
+            try:
+                os.makedirs(self.index_dir, exist_ok=True)
+                tmp_path = f'{self.learned_symbols_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as learned_file:
+                    json.dump(learned_symbols, learned_file, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.learned_symbols_path)
+            except OSError as e:
+                logger.warning(f'Could not store the learned ticker symbols: {e}')
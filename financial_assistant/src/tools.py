@@ -1,7 +1,10 @@
 import ast
 import datetime
 import json
-from typing import Any, Dict, List, Optional, Protocol
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
 
 import pandas
 import yfinance
@@ -10,8 +13,21 @@ from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 
+from financial_assistant.constants import (
+    YFINANCE_CACHE_DIR,
+    YFINANCE_CACHE_MAX_AGE,
+    YFINANCE_MAX_COMPANIES,
+    YFINANCE_MAX_WORKERS,
+)
 from financial_assistant.prompts.conversational_prompts import CONVERSATIONAL_RESPONSE_PROMPT_TEMPLATE
 from financial_assistant.src.utilities import get_logger
+from financial_assistant.src.yfinance_cache import (
+    DateRange,
+    YFinanceCache,
+    get_missing_date_ranges,
+    merge_date_range_data,
+    slice_date_range,
+)
 from financial_assistant.streamlit.llm_model import sambanova_llm
 
 
@@ -79,16 +95,98 @@ def get_conversational_response(user_query: str, response_object: Any) -> Any:
     return response
 
 
+# Functions fetching the datasets of a company that do not depend on dates
+YFINANCE_DATASETS: Dict[str, Callable[[yfinance.Ticker], Any]] = {
+    # All the stock information
+    'info': lambda company: company.info,
+    'actions': lambda company: company.actions,
+    'dividends': lambda company: company.dividends,
+    'splits': lambda company: company.splits,
+    # Only for mutual funds & etfs
+    'capital_gains': lambda company: company.capital_gains,
+    # Financials, see `Ticker.get_income_stmt()` for more options
+    'income_stmt': lambda company: convert_index_to_column(company.income_stmt.T, 'Date'),
+    'quarterly_income_stmt': lambda company: convert_index_to_column(company.quarterly_income_stmt.T, 'Date'),
+    'balance_sheet': lambda company: convert_index_to_column(company.balance_sheet.T, 'Date'),
+    'quarterly_balance_sheet': lambda company: convert_index_to_column(company.quarterly_balance_sheet.T, 'Date'),
+    'cashflow': lambda company: convert_index_to_column(company.cashflow.T, 'Date'),
+    'quarterly_cashflow': lambda company: convert_index_to_column(company.quarterly_cashflow.T, 'Date'),
+    'major_holders': lambda company: company.major_holders,
+    'institutional_holders': lambda company: company.institutional_holders,
+    'mutualfund_holders': lambda company: company.mutualfund_holders,
+    'insider_transactions': lambda company: company.insider_transactions,
+    'insider_purchases': lambda company: company.insider_purchases,
+    'insider_roster_holders': lambda company: company.insider_roster_holders,
+    'sustainability': lambda company: company.sustainability,
+    'recommendations': lambda company: company.recommendations,
+    'recommendations_summary': lambda company: company.recommendations_summary,
+    'upgrades_downgrades': lambda company: company.upgrades_downgrades,
+    # Future and historic earnings dates, returns at most next 4 quarters and last 8 quarters by default.
+    # Note: If more are needed use company.get_earnings_dates(limit=XX) with increased limit argument.
+    'earnings_dates': lambda company: company.earnings_dates,
+    # ISIN = International Securities Identification Number - *experimental*
+    'isin': lambda company: company.isin,
+    'options': lambda company: company.options,
+    'news': lambda company: company.news,
+    # The `Options` named tuple of the option chain cannot be pickled, so it is converted to a tuple
+    'option_chain': lambda company: tuple(company.option_chain()),
+}
+
+# Datasets of a company indexed by date, which are fetched for a date range
+YFINANCE_DATE_RANGE_DATASETS = ['history', 'shares']
+
+# The file cache of the Yahoo Finance datasets
+yfinance_cache = YFinanceCache(YFINANCE_CACHE_DIR, YFINANCE_CACHE_MAX_AGE)
+
+
+def fetch_yfinance_dataset(symbol: str, dataset_name: str, date_range: Optional[DateRange] = None) -> Any:
+    """
+    Fetches a dataset of a given company from Yahoo Finance.
+
+    Args:
+        symbol: The ticker symbol of the company.
+        dataset_name: The name of the dataset, in `YFINANCE_DATASETS` or `YFINANCE_DATE_RANGE_DATASETS`.
+        date_range: The start date (inclusive) and end date (exclusive) of the datasets indexed by date.
+
+    Returns:
+        The dataset. For `history`, a tuple with the historical market data and its meta information.
+    """
+    # Each dataset is fetched with its own `yfinance.Ticker`, which is not safe to share between threads
+    company = yfinance.Ticker(ticker=symbol)
+
+    if dataset_name == 'history':
+        assert date_range is not None
+        history = company.history(start=date_range[0], end=date_range[1])
+        # Get meta information about the history (requires history() to be called first)
+        return history, company.history_metadata
+
+    if dataset_name == 'shares':
+        assert date_range is not None
+        return company.get_shares_full(start=date_range[0], end=date_range[1])
+
+    return YFINANCE_DATASETS[dataset_name](company)
+
+
 def extract_yfinance_data(
-    symbol: str, start_date: datetime.date, end_date: datetime.date
+    symbol: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    use_cache: bool = True,
+    max_workers: int = YFINANCE_MAX_WORKERS,
 ) -> Dict[str, pandas.DataFrame | Dict[Any, Any]]:
     """
     Extracts all the data of a given company using Yahoo Finance for specified dates.
 
+    The datasets are fetched concurrently and stored in the Yahoo Finance cache.
+    Cached datasets that do not depend on dates are used until they are older than `YFINANCE_CACHE_MAX_AGE`,
+    and only the dates missing from the cache are fetched for the datasets indexed by date.
+
     Args:
         symbol: The ticker symbol of the company to extract data from.
         start_date: The start date of the historical price data to retrieve.
         end_date: The end date of the historical price data to retrieve.
+        use_cache: Whether to use and update the Yahoo Finance cache.
+        max_workers: The maximum number of datasets fetched concurrently.
 
     Returns:
         A dictionary containing the data of the company extracted from Yahoo Finance.
@@ -104,190 +202,108 @@ def extract_yfinance_data(
     if not isinstance(end_date, datetime.date):
         raise TypeError('End date must be of type datetime.date.')
 
-    # Extract the data from Yahoo Finance for the given ticker symbol
-
-    company = yfinance.Ticker(ticker=symbol)
+    with yfinance_cache.get_lock(symbol) if use_cache else nullcontext():
+        if use_cache:
+            cache_entry = yfinance_cache.load(symbol)
+        else:
+            cache_entry = {'datasets': dict(), 'date_range_datasets': dict()}
+        datasets = cache_entry['datasets']
+        date_range_datasets = cache_entry['date_range_datasets']
+
+        # Extract the missing or expired data from Yahoo Finance for the given ticker symbol
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures: Dict[Future[Any], Tuple[str, Optional[DateRange]]] = dict()
+            for dataset_name in YFINANCE_DATASETS:
+                if dataset_name not in datasets or not yfinance_cache.is_fresh(datasets[dataset_name]):
+                    futures[executor.submit(fetch_yfinance_dataset, symbol, dataset_name)] = (dataset_name, None)
+            for dataset_name in YFINANCE_DATE_RANGE_DATASETS:
+                cached_dataset = date_range_datasets.get(dataset_name)
+                cached_range = (
+                    (cached_dataset['start_date'], cached_dataset['end_date']) if cached_dataset is not None else None
+                )
+                for date_range in get_missing_date_ranges(cached_range, start_date, end_date):
+                    future = executor.submit(fetch_yfinance_dataset, symbol, dataset_name, date_range)
+                    futures[future] = (dataset_name, date_range)
+
+            fetched_ranges: Dict[str, List[Tuple[DateRange, Any]]] = {
+                name: list() for name in YFINANCE_DATE_RANGE_DATASETS
+            }
+            failed_datasets = set()
+            for future in as_completed(futures):
+                dataset_name, fetched_range = futures[future]
+                try:
+                    data = future.result()
+                except:
+                    logger.warning(f'Could not retrieve the `{dataset_name}` dataframe.')
+                    failed_datasets.add(dataset_name)
+                    continue
+                if fetched_range is None:
+                    datasets[dataset_name] = {'data': data, 'fetched_at': time.time()}
+                    continue
+                if dataset_name == 'history':
+                    data, history_metadata = data
+                    datasets['history_metadata'] = {'data': history_metadata, 'fetched_at': time.time()}
+                fetched_ranges[dataset_name].append((fetched_range, data))
+
+        # Merge the fetched date ranges with the cached ones
+        # The data of today may still change, so the cached date range ends today at the latest
+        today = datetime.date.today()
+        for dataset_name, dataset_ranges in fetched_ranges.items():
+            if dataset_name in failed_datasets or len(dataset_ranges) == 0:
+                continue
+            cached_dataset = date_range_datasets.get(dataset_name)
+            cached_data = [cached_dataset['data']] if cached_dataset is not None else list()
+            fetched_data = [data for _, data in sorted(dataset_ranges, key=lambda item: item[0][0])]
+            cached_start_date = cached_dataset['start_date'] if cached_dataset is not None else start_date
+            cached_end_date = cached_dataset['end_date'] if cached_dataset is not None else start_date
+            date_range_datasets[dataset_name] = {
+                'data': merge_date_range_data(cached_data + fetched_data),
+                'start_date': min(cached_start_date, start_date),
+                'end_date': max(cached_end_date, min(end_date, today)),
+            }
+
+        if use_cache and len(futures) > 0:
+            try:
+                yfinance_cache.save(symbol, cache_entry)
+            except Exception as e:
+                logger.warning(f'Could not store the Yahoo Finance data of {symbol} to the cache: {e}')
 
     # Initialize the return dictionary
-    company_dict = dict()
-
-    # Get all the stock information
-    try:
-        company_dict['info'] = company.info
-    except:
-        logger.warning('Could not retrieve the `info` dataframe.')
-
-    # Get historical market data
-    try:
-        company_dict['history'] = company.history(start=start_date, end=end_date)
-    except:
-        logger.warning('Could not retrieve the `history` dataframe.')
-
-    # Get meta information about the history (requires history() to be called first)
-    company_dict['history_metadata'] = company.history_metadata
-
-    # Get actions
-    try:
-        company_dict['actions'] = company.actions
-    except:
-        logger.warning('Could not retrieve the `actions` dataframe.')
-
-    # Get dividends
-    try:
-        company_dict['dividends'] = company.dividends
-    except:
-        logger.warning('Could not retrieve the `dividends` dataframe.')
-
-    # Get splits
-    try:
-        company_dict['splits'] = company.splits
-    except:
-        logger.warning('Could not retrieve the `splits` dataframe.')
-
-    # Get capital gains
-    try:
-        company_dict['capital_gains'] = company.capital_gains  # only for mutual funds & etfs
-    except:
-        logger.warning('Could not retrieve the `capital gains` dataframe.')
-
-    # Get share count
-    try:
-        company_dict['shares'] = company.get_shares_full(start=start_date, end=end_date)
-    except:
-        logger.warning('Could not retrieve the `shares` dataframe.')
-
-    # Get financials
-    # Get income statement
-    try:
-        company_dict['income_stmt'] = convert_index_to_column(company.income_stmt.T, 'Date')
-    except:
-        logger.warning('Could not retrieve the `income_stmt` dataframe.')
-
-    # Get quarterly income statement
-    try:
-        company_dict['quarterly_income_stmt'] = convert_index_to_column(company.quarterly_income_stmt.T, 'Date')
-    except:
-        logger.warning('Could not retrieve the `quarterly_income_stmt` dataframe.')
-
-    # Get balance sheet
-    try:
-        company_dict['balance_sheet'] = convert_index_to_column(company.balance_sheet.T, 'Date')
-    except:
-        logger.warning('Could not retrieve the `balance_sheet` dataframe.')
-
-    # Get quarterly balance sheet
-    try:
-        company_dict['quarterly_balance_sheet'] = convert_index_to_column(company.quarterly_balance_sheet.T, 'Date')
-    except:
-        logger.warning('Could not retrieve the `quarterly_balance_sheet` dataframe.')
+    company_dict: Dict[str, pandas.DataFrame | Dict[Any, Any]] = dict()
 
-    # Get cash flow statement
-    try:
-        company_dict['cashflow'] = convert_index_to_column(company.cashflow.T, 'Date')
-    except:
-        logger.warning('Could not retrieve the `cashflow` dataframe.')
-
-    # Get quarterly cash flow
-    try:
-        company_dict['quarterly_cashflow'] = convert_index_to_column(company.quarterly_cashflow.T, 'Date')
-    except:
-        logger.warning('Could not retrieve the `quarterly_cashflow` dataframe.')
-    # see `Ticker.get_income_stmt()` for more options
-
-    # Get major holders
-    try:
-        company_dict['major_holders'] = company.major_holders
-    except:
-        logger.warning('Could not retrieve the `major_holders` dataframe.')
-
-    # Get institutional holders
-    try:
-        company_dict['institutional_holders'] = company.institutional_holders
-    except:
-        logger.warning('Could not retrieve the `institutional_holders` dataframe.')
-
-    # Get mutual fund holders
-    try:
-        company_dict['mutualfund_holders'] = company.mutualfund_holders
-    except:
-        logger.warning('Could not retrieve the `mutualfund_holders` dataframe.')
-
-    # Get insider transactions
-    try:
-        company_dict['insider_transactions'] = company.insider_transactions
-    except:
-        logger.warning('Could not retrieve the `insider_transactions` dataframe.')
-
-    # Get insider purchases
-    try:
-        company_dict['insider_purchases'] = company.insider_purchases
-    except:
-        logger.warning('Could not retrieve the `insider_purchases` dataframe.')
-
-    # Get insider sales
-    try:
-        company_dict['insider_roster_holders'] = company.insider_roster_holders
-    except:
-        logger.warning('Could not retrieve the `insider_roster_holders` dataframe.')
-
-    # Get sustainability
-    try:
-        company_dict['sustainability'] = company.sustainability
-    except:
-        logger.warning('Could not retrieve the `sustainability` dataframe.')
-
-    # Get recommendations
-    try:
-        company_dict['recommendations'] = company.recommendations
-    except:
-        logger.warning('Could not retrieve the `recommendations` dataframe.')
+    for dataset_name, dataset in datasets.items():
+        company_dict[dataset_name] = dataset['data']
 
-    # Get recommendations summary
-    try:
-        company_dict['recommendations_summary'] = company.recommendations_summary
-    except:
-        logger.warning('Could not retrieve the `recommendations` dataframe.')
-
-    # Get upgrades downgrades
-    try:
-        company_dict['upgrades_downgrades'] = company.upgrades_downgrades
-    except:
-        logger.warning('Could not retrieve the `upgrades_downgrades` dataframe.')
+    for dataset_name, dataset in date_range_datasets.items():
+        company_dict[dataset_name] = slice_date_range(dataset['data'], start_date, end_date)
 
-    # Get future and historic earnings dates, returns at most next 4 quarters and last 8 quarters by default.
-    # Note: If more are needed use company.get_earnings_dates(limit=XX) with increased limit argument.
-    try:
-        company_dict['earnings_dates'] = company.earnings_dates
-    except:
-        logger.warning('Could not retrieve the `earnings_dates` dataframe.')
+    return company_dict
 
-    # Get ISIN code - *experimental*
-    # ISIN = International Securities Identification Number
-    try:
-        company_dict['isin'] = company.isin
-    except:
-        logger.warning('Could not retrieve the `isin` dataframe.')
 
-    # Get options expirations
-    try:
-        company_dict['options'] = company.options
-    except:
-        logger.warning('Could not retrieve the `options` dataframe.')
-
-    # Get news
-    try:
-        company_dict['news'] = company.news
-    except:
-        logger.warning('Could not retrieve the `news` dataframe.')
+def extract_yfinance_data_list(
+    symbol_list: List[str],
+    start_date: datetime.date,
+    end_date: datetime.date,
+    max_workers: int = YFINANCE_MAX_COMPANIES,
+) -> Dict[str, Dict[str, pandas.DataFrame | Dict[Any, Any]]]:
+    """
+    Extracts all the data of a list of companies using Yahoo Finance for specified dates, concurrently.
 
-    # # Get option chain for specific expiration
-    try:
-        company_dict['option_chain'] = company.option_chain()
-    except:
-        logger.warning('Could not retrieve the `option chain` dataframe.')
-    # data available via: opt.calls, opt.puts
+    Args:
+        symbol_list: The ticker symbols of the companies to extract data from.
+        start_date: The start date of the historical price data to retrieve.
+        end_date: The end date of the historical price data to retrieve.
+        max_workers: The maximum number of companies whose data is extracted concurrently.
 
-    return company_dict
+    Returns:
+        A dictionary with the company symbols as keys
+        and the data of the company extracted from Yahoo Finance as values.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            symbol: executor.submit(extract_yfinance_data, symbol, start_date, end_date) for symbol in symbol_list
+        }
+        return {symbol: future.result() for symbol, future in futures.items()}
 
 
 def convert_data_to_frame(data: Any, df_name: str) -> pandas.DataFrame:
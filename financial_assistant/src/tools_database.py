@@ -2,8 +2,11 @@ import datetime
 import json
 import re
 import shutil
-from typing import Any, Dict, List
+import sqlite3
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 
+import numpy
 import pandas
 import streamlit
 from langchain.prompts import PromptTemplate
@@ -15,7 +18,8 @@ from langchain_core.tools import tool
 from pandasai import SmartDataframe
 from pandasai.connectors import SqliteConnector
 from pydantic import BaseModel, Field
-from sqlalchemy import Inspector, create_engine
+from sqlalchemy import Engine, Inspector, create_engine
+from sqlalchemy.pool import NullPool
 
 from financial_assistant.constants import *
 from financial_assistant.prompts.pandasai_prompts import PLOT_INSTRUCTIONS, TITLE_INSTRUCTIONS_TEMPLATE
@@ -24,7 +28,7 @@ from financial_assistant.src.exceptions import TableNotFoundException
 from financial_assistant.src.tools import (
     coerce_str_to_list,
     convert_data_to_frame,
-    extract_yfinance_data,
+    extract_yfinance_data_list,
     get_conversational_response,
 )
 from financial_assistant.src.tools_stocks import retrieve_symbol_list
@@ -79,10 +83,8 @@ def create_stock_database(
     if start_date >= end_date:
         raise ValueError('Start date must be before the end date.')
 
-    # Extract yfinance data
-    company_data_dict = dict()
-    for symbol in symbol_list:
-        company_data_dict[symbol] = extract_yfinance_data(symbol, start_date, end_date)
+    # Extract yfinance data, for several companies concurrently
+    company_data_dict = extract_yfinance_data_list(symbol_list, start_date, end_date)
 
     # Create SQL database
     company_tables_dict = store_company_dataframes_to_sqlite(
@@ -92,12 +94,130 @@ def create_stock_database(
     return company_tables_dict
 
 
+# Number of rows inserted per `executemany` call
+SQLITE_INSERT_CHUNK_SIZE = 10000
+
+# Columns indexed automatically, besides the datetime columns, to speed up the queries filtering on them
+SQLITE_INDEXED_COLUMN_PATTERN = re.compile(r'date|symbol|ticker', re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def get_sqlite_engine(db_path: str) -> Engine:
+    """
+    Get the SQLAlchemy engine of a SQLite database, created once per database and shared by all the queries.
+
+    Args:
+        db_path: The path to the SQLite database file.
+
+    Returns:
+        The SQLAlchemy engine.
+    """
+    # Connections are not pooled, so that a deleted and recreated database file is never read from a stale connection
+    return create_engine(f'sqlite:///{db_path}', poolclass=NullPool)
+
+
+def quote_sqlite_identifier(identifier: str) -> str:
+    """Quote a SQLite table, column, or index name."""
+
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def convert_value_to_sqlite(value: Any) -> Any:
+    """Convert a value of an object column to a value that SQLite can store."""
+
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+
+def convert_series_to_sqlite(series: pandas.Series) -> Tuple[str, List[Any]]:
+    """
+    Convert a column to a SQLite column type and a list of values that SQLite can store.
+
+    Numbers are stored as such, datetimes as `YYYY-MM-DD HH:MM:SS` strings in their local time,
+    lists and dictionaries as JSON strings, and any other object as its string representation.
+
+    Args:
+        series: The column to convert.
+
+    Returns:
+        A tuple with the SQLite column type and the column values, with missing values as `None`.
+    """
+    if pandas.api.types.is_bool_dtype(series) or pandas.api.types.is_integer_dtype(series):
+        column_type = 'INTEGER'
+    elif pandas.api.types.is_float_dtype(series):
+        column_type = 'REAL'
+    elif pandas.api.types.is_datetime64_any_dtype(series):
+        if isinstance(series.dtype, pandas.DatetimeTZDtype):
+            series = series.dt.tz_localize(None)
+        series = series.dt.strftime('%Y-%m-%d %H:%M:%S')
+        column_type = 'TIMESTAMP'
+    else:
+        # Only object columns need to be converted value by value, and are typed after their values like `to_sql`
+        series = series.map(convert_value_to_sqlite, na_action='ignore')
+        inferred_type = pandas.api.types.infer_dtype(series, skipna=True)
+        if inferred_type in ('integer', 'boolean'):
+            column_type = 'INTEGER'
+        elif inferred_type in ('floating', 'mixed-integer-float'):
+            column_type = 'REAL'
+        else:
+            column_type = 'TEXT'
+
+    values = series.astype(object).where(series.notna(), None).tolist()
+    return column_type, values
+
+
+def write_dataframe_to_sqlite(connection: sqlite3.Connection, table_name: str, df: pandas.DataFrame) -> None:
+    """
+    Write a dataframe to a SQLite table, replacing it if it exists, with bulk inserts.
+
+    The datetime columns and the columns whose name matches `SQLITE_INDEXED_COLUMN_PATTERN` are indexed.
+
+    Args:
+        connection: The SQLite connection, whose transaction is managed by the caller.
+        table_name: The name of the SQL table.
+        df: The dataframe to write.
+    """
+    column_names = list(df.columns)
+    column_types = list()
+    column_values = list()
+    for idx in range(len(column_names)):
+        column_type, values = convert_series_to_sqlite(df.iloc[:, idx])
+        column_types.append(column_type)
+        column_values.append(values)
+
+    table = quote_sqlite_identifier(table_name)
+    columns_definition = ', '.join(
+        f'{quote_sqlite_identifier(name)} {column_type}' for name, column_type in zip(column_names, column_types)
+    )
+    connection.execute(f'DROP TABLE IF EXISTS {table}')
+    connection.execute(f'CREATE TABLE {table} ({columns_definition})')
+
+    # Insert the rows in chunks, to bound the memory used by the parameters
+    insert_query = f'INSERT INTO {table} VALUES ({", ".join("?" * len(column_names))})'
+    rows = list(zip(*column_values))
+    for idx in range(0, len(rows), SQLITE_INSERT_CHUNK_SIZE):
+        connection.executemany(insert_query, rows[idx : idx + SQLITE_INSERT_CHUNK_SIZE])
+
+    # Index the columns used to filter the rows
+    for name, column_type in zip(column_names, column_types):
+        if column_type == 'TIMESTAMP' or SQLITE_INDEXED_COLUMN_PATTERN.search(name) is not None:
+            index = quote_sqlite_identifier(f'idx_{table_name}_{name}')
+            connection.execute(f'CREATE INDEX {index} ON {table} ({quote_sqlite_identifier(name)})')
+
+
 def store_company_dataframes_to_sqlite(
-    db_name: str, company_data_dict: Dict[str, pandas.DataFrame | Dict[Any, Any]]
+    db_name: str, company_data_dict: Dict[str, Dict[str, pandas.DataFrame | Dict[Any, Any]]]
 ) -> Dict[str, List[str]]:
     """
     Store multiple dataframes for each company into an SQLite database.
 
+    All the tables are written in a single transaction, with bulk inserts.
+
     Args:
         db_name: The name of the SQLite database file.
         company_data_dict: Dictionary where the key is the company name,
@@ -107,50 +227,60 @@ def store_company_dataframes_to_sqlite(
     Returns:
         A dictionary with company symbols as keys and a list of SQL table names as values.
     """
-    # Connect to the SQLite database
-    engine = create_engine(f'sqlite:///{streamlit.session_state.db_path}')
+    # Connect to the SQLite database, managing the transaction explicitly
+    connection = sqlite3.connect(db_name, isolation_level=None, timeout=60)
+    # Write-ahead logging lets the queries read the database while it is written
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
 
     # Create a dictionary with company names as keys and SQL tables as values
     company_tables: Dict[str, List[str]] = dict()
 
-    # Process each company
-    for company, company_data in company_data_dict.items():
-        # Ensure that the company name is SQLite-friendly
-        company_base_name = company.replace(' ', '_').lower()
-
-        # Initialize a list of SQL table names
-        company_tables[company] = list()
-
-        for df_name, data in company_data.items():
-            # Build a table name using the company symbol and the dataframe purpose/type
-            table_name = f'{company_base_name}_{df_name}'
-            try:
-                # Convert the data to dataframe format
-                df = convert_data_to_frame(data, df_name)
-            except:
-                logger.warning(f'Could not convert {df_name} to `pandas.DataFrame`.')
-                continue
-
-            # Make sure the column names are SQLite-friendly
-            for column in df.columns:
-                df = df.rename({column: f'{column}'.replace(' ', '_')}, axis='columns')
-
-            # Convert list-type and dict-type entries to JSON strings
-            try:
-                df = df.applymap(lambda x: json.dumps(x) if isinstance(x, (list, dict)) else x)
-            except:
-                logger.warning(f'Could not convert {df_name} to JSON.')
-                continue
-
-            # Store the dataframe in an SQLite database table
-            try:
-                df.to_sql(table_name, engine, if_exists='replace', index=False)
+    try:
+        connection.execute('BEGIN')
+
+        # Process each company
+        for company, company_data in company_data_dict.items():
+            # Ensure that the company name is SQLite-friendly
+            company_base_name = company.replace(' ', '_').lower()
+
+            # Initialize a list of SQL table names
+            company_tables[company] = list()
+
+            for df_name, data in company_data.items():
+                # Build a table name using the company symbol and the dataframe purpose/type
+                table_name = f'{company_base_name}_{df_name}'
+                try:
+                    # Convert the data to dataframe format
+                    df = convert_data_to_frame(data, df_name)
+                except:
+                    logger.warning(f'Could not convert {df_name} to `pandas.DataFrame`.')
+                    continue
+
+                # Make sure the column names are SQLite-friendly
+                df.columns = df.columns.astype(str).str.replace(' ', '_')
+
+                # Store the dataframe in an SQLite database table, rolling back only this table on failure
+                connection.execute('SAVEPOINT store_table')
+                try:
+                    write_dataframe_to_sqlite(connection, table_name, df)
+                except:
+                    connection.execute('ROLLBACK TO store_table')
+                    connection.execute('RELEASE store_table')
+                    logger.warning(f'Could not store {df_name} to SQLite database.')
+                    continue
+                connection.execute('RELEASE store_table')
                 logger.info(f"DataFrame '{df_name}' for {company} stored in table '{table_name}'.")
-            except:
-                logger.warning(f'Could not store {df_name} to SQLite database.')
 
-            # Populated company tables list with table name
-            company_tables[company].append(table_name)
+                # Populated company tables list with table name
+                company_tables[company].append(table_name)
+
+        connection.execute('COMMIT')
+    except:
+        connection.execute('ROLLBACK')
+        raise
+    finally:
+        connection.close()
 
     return company_tables
 
@@ -245,7 +375,7 @@ def query_stock_database_sql(user_query: str, symbol_list: List[str]) -> Any:
     queries_list = get_sql_queries(selected_schemas, user_query)
 
     # Create a SQL database engine and connect to it using the selected tables
-    engine = create_engine(f'sqlite:///{streamlit.session_state.db_path}')
+    engine = get_sqlite_engine(streamlit.session_state.db_path)
     db = SQLDatabase(engine=engine, include_tables=selected_tables)
 
     # TODO: With larger context windows
@@ -488,7 +618,7 @@ def get_table_summaries_from_symbols(symbol_list: List[str]) -> str:
         Exception: If there is no SQL table in the database.
     """
     # Instantiate the inspector for the database
-    inspector = Inspector.from_engine(create_engine('sqlite:///' + streamlit.session_state.db_path))
+    inspector = Inspector.from_engine(get_sqlite_engine(streamlit.session_state.db_path))
 
     # Get the list of SQL tables in the database
     tables_names = inspector.get_table_names()
@@ -531,7 +661,7 @@ def get_table_summaries_from_names(table_names: List[str]) -> str:
     Returns:
         A text summary of SQL tables by their names.
     """
-    inspector = Inspector.from_engine(create_engine('sqlite:///' + streamlit.session_state.db_path))
+    inspector = Inspector.from_engine(get_sqlite_engine(streamlit.session_state.db_path))
     inspected_tables_names = inspector.get_table_names()
     inspected_tables_names_symbols = [
         inspected_table.split('_')[0].lower() for inspected_table in inspected_tables_names
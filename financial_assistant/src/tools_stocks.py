@@ -17,14 +17,20 @@ from pydantic import BaseModel, Field
 
 from financial_assistant.constants import *
 from financial_assistant.prompts.pandasai_prompts import PLOT_INSTRUCTIONS
+from financial_assistant.src.symbol_index import SymbolIndex
 from financial_assistant.src.tools import (
     coerce_str_to_list,
     convert_data_to_frame,
     extract_yfinance_data,
 )
-from financial_assistant.src.utilities import time_llm
+from financial_assistant.src.utilities import get_logger, time_llm
 from financial_assistant.streamlit.llm_model import sambanova_llm
 
+logger = get_logger()
+
+# The local index of the ticker symbols of company names
+symbol_index = SymbolIndex(SYMBOL_INDEX_DIR)
+
 
 class StockInfoSchema(BaseModel):
     """Tool for retrieving accurate stock information for a list of companies using the specified dataframe name."""
@@ -40,6 +46,19 @@ class TickerSymbol(BaseModel):
     symbol: str = Field(..., description='The ticker symbol of the company.')
 
 
+class CompanyTickerSymbol(BaseModel):
+    """Model for the stock ticker symbol of a named company."""
+
+    company: str = Field(..., description='The name of the company.')
+    symbol: str = Field(..., description='The ticker symbol of the company.')
+
+
+class TickerSymbolList(BaseModel):
+    """Model for the stock ticker symbols of a list of companies."""
+
+    symbols: List[CompanyTickerSymbol] = Field(..., description='The ticker symbol of each company.')
+
+
 @tool(args_schema=StockInfoSchema)
 def get_stock_info(
     user_query: str, company_list: List[str] | str, dataframe_name: Optional[str] = None
@@ -240,33 +259,74 @@ def retrieve_symbol_list(company_names_list: List[str] | str = list()) -> List[s
     if not all([isinstance(name, str) for name in company_names_list]):
         raise TypeError('`company_names_list` must be a list of strings.')
 
-    symbol_list = list()
-
-    # Iterate over the JSON data to extract ticker symbols
+    # Resolve the company names with the local symbol index first
+    company_symbols: Dict[str, str] = dict()
+    unresolved_companies = list()
     for company in company_names_list:
-        # The prompt template
-        prompt_template_symbol = (
-            'What is the ticker symbol for {company}?\n' 'Format instructions: {format_instructions}'
-        )
+        symbol = symbol_index.resolve(company)
+        if symbol is not None:
+            company_symbols[company] = symbol
+        else:
+            unresolved_companies.append(company)
+
+    # Resolve the remaining company names with a single LLM call
+    if len(unresolved_companies) > 0:
+        llm_symbols = retrieve_symbols_with_llm(unresolved_companies)
+        symbol_index.add(llm_symbols)
+        company_symbols.update(llm_symbols)
 
-        # The parser
-        parser_symbol = PydanticOutputParser(pydantic_object=TickerSymbol)
+    symbol_list = [company_symbols[company] for company in company_names_list if company in company_symbols]
 
-        # The prompt
-        prompt_symbol = PromptTemplate(
-            template=prompt_template_symbol,
-            input_variables=['company'],
-            partial_variables={'format_instructions': parser_symbol.get_format_instructions()},
-        )
+    return list(dict.fromkeys(symbol_list))
 
-        # The chain
-        chain_symbol = prompt_symbol | sambanova_llm.llm | parser_symbol
 
-        # Invoke the chain to derive the ticker symbol of the company
-        symbol = chain_symbol.invoke(company).symbol  # type: ignore
-        symbol_list.append(symbol)
+def retrieve_symbols_with_llm(company_names_list: List[str]) -> Dict[str, str]:
+    """
+    Retrieve the ticker symbols of a list of company names with a single LLM call.
+
+    Args:
+        company_names_list: List of company names.
+
+    Returns:
+        A dictionary with the company names as keys and their ticker symbols as values.
+    """
+    # The prompt template
+    prompt_template_symbols = (
+        'What are the ticker symbols of the following companies?\n'
+        '{companies}\n'
+        'Give the company names exactly as written above.\n'
+        'Format instructions: {format_instructions}'
+    )
+
+    # The parser
+    parser_symbols = PydanticOutputParser(pydantic_object=TickerSymbolList)
+
+    # The prompt
+    prompt_symbols = PromptTemplate(
+        template=prompt_template_symbols,
+        input_variables=['companies'],
+        partial_variables={'format_instructions': parser_symbols.get_format_instructions()},
+    )
+
+    # The chain
+    chain_symbols = prompt_symbols | sambanova_llm.llm | parser_symbols
+
+    # Invoke the chain to derive the ticker symbols of the companies
+    companies = '\n'.join(f'- {company}' for company in company_names_list)
+    ticker_symbols = chain_symbols.invoke({'companies': companies}).symbols
+
+    # Match the symbols to the company names, by name or else by position
+    llm_symbols = {ticker_symbol.company: ticker_symbol.symbol for ticker_symbol in ticker_symbols}
+    company_symbols = dict()
+    for idx, company in enumerate(company_names_list):
+        if company in llm_symbols:
+            company_symbols[company] = llm_symbols[company]
+        elif len(ticker_symbols) == len(company_names_list):
+            company_symbols[company] = ticker_symbols[idx].symbol
+        else:
+            logger.warning(f'Could not retrieve the ticker symbol of {company}.')
 
-    return list(set(symbol_list))
+    return company_symbols
 
 
 class HistoricalPriceSchema(BaseModel):
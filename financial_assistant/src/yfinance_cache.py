@@ -0,0 +1,158 @@
+"""
+On-disk cache of the Yahoo Finance datasets of each company.
+"""
+
+import datetime
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas
+
+# Date range of the `history` and `shares` datasets
+DateRange = Tuple[datetime.date, datetime.date]
+
+
+def get_missing_date_ranges(
+    cached_range: Optional[DateRange], start_date: datetime.date, end_date: datetime.date
+) -> List[DateRange]:
+    """
+    Get the date ranges to fetch so that a cached date range covers the requested one.
+
+    The cached range is only ever extended, so that it stays contiguous
+    even if the requested range does not overlap it.
+
+    Args:
+        cached_range: The cached start date (inclusive) and end date (exclusive), if any.
+        start_date: The requested start date (inclusive).
+        end_date: The requested end date (exclusive).
+
+    Returns:
+        The list of date ranges to fetch, empty if the cached range covers the requested one.
+    """
+    if cached_range is None:
+        return [(start_date, end_date)]
+
+    cached_start, cached_end = cached_range
+    missing_ranges = list()
+    if start_date < cached_start:
+        missing_ranges.append((start_date, cached_start))
+    if end_date > cached_end:
+        missing_ranges.append((cached_end, end_date))
+    return missing_ranges
+
+
+def merge_date_range_data(data_list: List[pandas.DataFrame | pandas.Series]) -> pandas.DataFrame | pandas.Series:
+    """
+    Merge the data of several date ranges, indexed by date, keeping the most recent value of each date.
+
+    Args:
+        data_list: The data of each date range, from the oldest fetch to the most recent one.
+
+    Returns:
+        The merged data, sorted by date.
+    """
+    data_list = [data for data in data_list if data is not None and len(data) > 0]
+    if len(data_list) == 0:
+        return pandas.DataFrame()
+    if len(data_list) == 1:
+        return data_list[0]
+    merged_data = pandas.concat(data_list)
+    merged_data = merged_data[~merged_data.index.duplicated(keep='last')]
+    return merged_data.sort_index()
+
+
+def slice_date_range(
+    data: pandas.DataFrame | pandas.Series, start_date: datetime.date, end_date: datetime.date
+) -> pandas.DataFrame | pandas.Series:
+    """
+    Select the rows of data indexed by date within a date range.
+
+    Args:
+        data: The data indexed by date.
+        start_date: The start date (inclusive).
+        end_date: The end date (exclusive).
+
+    Returns:
+        The rows of `data` from `start_date` to `end_date`.
+    """
+    if len(data) == 0 or not isinstance(data.index, pandas.DatetimeIndex):
+        return data
+    dates = data.index.date
+    return data[(dates >= start_date) & (dates < end_date)]
+
+
+class YFinanceCache:
+    """
+    On-disk cache of the Yahoo Finance datasets of each company.
+
+    Each company is stored in a pickle file named after its ticker symbol, with two kinds of datasets:
+        - Datasets that do not depend on dates (e.g. `info` or `income_stmt`),
+            which are fetched again when older than `max_age`.
+        - Datasets indexed by date (e.g. `history`), stored with the date range they cover,
+            so that only the dates missing from the cache are fetched.
+    """
+
+    def __init__(self, cache_dir: str, max_age: float) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            cache_dir: The directory where the datasets are stored.
+            max_age: The age in seconds under which the datasets that do not depend on dates are used.
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self._locks: Dict[str, threading.Lock] = dict()
+        self._locks_lock = threading.Lock()
+
+    def _get_path(self, symbol: str) -> str:
+        return os.path.join(self.cache_dir, f'{symbol.upper()}.pkl')
+
+    def get_lock(self, symbol: str) -> threading.Lock:
+        """Get the lock serializing the updates of the cache of a company within the process."""
+
+        with self._locks_lock:
+            return self._locks.setdefault(symbol.upper(), threading.Lock())
+
+    def load(self, symbol: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the cached datasets of a company.
+
+        Args:
+            symbol: The ticker symbol of the company.
+
+        Returns:
+            A dictionary with the `datasets` and `date_range_datasets` of the company.
+                - `datasets` maps the dataset names to their `data` and `fetched_at` time.
+                - `date_range_datasets` maps the dataset names to their `data`,
+                    `start_date` (inclusive) and `end_date` (exclusive).
+        """
+        try:
+            with open(self._get_path(symbol), 'rb') as cache_file:
+                entry: Dict[str, Dict[str, Any]] = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            entry = {'datasets': dict(), 'date_range_datasets': dict()}
+        return entry
+
+    def save(self, symbol: str, entry: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Store the datasets of a company, replacing the cache file atomically.
+
+        Args:
+            symbol: The ticker symbol of the company.
+            entry: The datasets of the company, in the format returned by `load`.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._get_path(symbol)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump(entry, cache_file)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, dataset: Dict[str, Any]) -> bool:
+        """Check whether a cached dataset that does not depend on dates is younger than the cache max age."""
+
+        return bool(time.time() - dataset['fetched_at'] < self.max_age)
@@ -13,7 +13,9 @@ import glob
 import ssl
 import time
 import uuid
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union, cast
 
 import nltk
 import streamlit as st
@@ -27,9 +29,10 @@ from langchain.schema import Document
 from langchain.storage import InMemoryByteStore
 from langchain_chroma import Chroma
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import load_prompt
+from langchain_core.prompts import PromptTemplate, load_prompt
 from unstructured.partition.pdf import partition_pdf
 
+from multimodal_knowledge_retriever.src.summary_cache import SummaryCache
 from utils.model_wrappers.api_gateway import APIGateway
 from utils.model_wrappers.multimodal_models import SambastudioMultimodal
 
@@ -80,8 +83,12 @@ class MultimodalRetrieval:
         self.retriever: Optional[MultiVectorRetriever] = None
         self.conversational = conversational
         self.memory: Optional[ConversationSummaryMemory] = None
-        self.qa_chain: Optional[Callable[[Any], Dict[str, Any]]] = None
-        # set variables for image padding 
+        self.qa_chain: Optional[Callable[..., Dict[str, Any]]] = None
+        self.image_retrieval_type: Optional[str] = None
+        self.summary_cache: Optional[SummaryCache] = None
+        if self.retrieval_info.get('summary_cache_dir'):
+            self.summary_cache = SummaryCache(os.path.join(kit_dir, self.retrieval_info['summary_cache_dir']))
+        # set variables for image padding
         os.environ['EXTRACT_IMAGE_BLOCK_CROP_HORIZONTAL_PAD'] = '150'
         os.environ['EXTRACT_IMAGE_BLOCK_CROP_VERTICAL_PAD'] = '150'
 
@@ -218,12 +225,69 @@ class MultimodalRetrieval:
         )
         return reformulated_query
 
-    def summarize_images(self, image_paths: List[str]) -> List[str]:
+    def _summarize_with_cache(
+        self,
+        namespace: str,
+        contents: List[bytes],
+        summarize: Callable[[int], str],
+        max_concurrency: int,
+        stage: str,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    ) -> List[str]:
+        """
+        Summarizes elements concurrently, only calling the model for the ones missing from the summary cache.
+        Summaries are cached as soon as they are generated, so an interrupted ingestion keeps its progress.
+
+        Parameters:
+        namespace (str): model and prompt of the summaries, part of the cache keys.
+        contents (list): content of each element, hashed into the cache keys.
+        summarize (callable): function generating the summary of the element at an index.
+        max_concurrency (int): maximum number of concurrent calls to the model.
+        stage (str): name of the summarized elements, used to report progress.
+        progress_callback (callable): optional function called with the stage, the number of summaries done and
+            the total number of summaries each time a summary is done.
+
+        Returns:
+        summaries (list[str]): A list of summaries of the elements.
+        """
+        keys = [SummaryCache.make_key(namespace, content) for content in contents]
+        summaries = self.summary_cache.get_many(keys) if self.summary_cache is not None else {}
+        # identical elements are summarized once
+        missing = {key: i for i, key in reversed(list(enumerate(keys))) if key not in summaries}
+        num_done = len(keys) - len(missing)
+        logger.info(f'{stage}: {num_done}/{len(keys)} summaries found in cache, {len(missing)} to generate')
+        if progress_callback is not None:
+            progress_callback(stage, num_done, len(keys))
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                futures = {executor.submit(summarize, i): key for key, i in missing.items()}
+                try:
+                    for future in as_completed(futures):
+                        key = futures[future]
+                        summaries[key] = future.result()
+                        if self.summary_cache is not None:
+                            self.summary_cache.put_many([(key, summaries[key])])
+                        num_done += 1
+                        logger.info(f'{stage}: {num_done}/{len(keys)} summaries done')
+                        if progress_callback is not None:
+                            progress_callback(stage, num_done, len(keys))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        return [summaries[key] for key in keys]
+
+    def summarize_images(
+        self, image_paths: List[str], progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> List[str]:
         """
         Summarizes images by calling the LLM API with a specific prompt.
 
         Parameters:
         image_paths (list): A list of paths of images to be summarized.
+        progress_callback (callable): optional function called with the stage, the number of summaries done and
+            the total number of summaries each time a summary is done.
 
         Returns:
         image_summaries (list[str]): A list of summaries of the input images
@@ -231,45 +295,103 @@ class MultimodalRetrieval:
         instruction = 'Describe this image in detail. Be specific about graphs include name of axis,\
             labels, legends and important numerical information'
 
-        image_summaries = []
+        contents = []
         for image_path in image_paths:
-            summary = self.lvlm.invoke(instruction, image_path)
-            image_summaries.append(summary)
-        return image_summaries
+            with open(image_path, 'rb') as image_file:
+                contents.append(image_file.read())
+        namespace = '|'.join(
+            str(value)
+            for value in [
+                self.lvlm.model,
+                self.lvlm.temperature,
+                self.lvlm.max_tokens_to_generate,
+                self.lvlm.do_sample,
+                instruction,
+            ]
+        )
+        return self._summarize_with_cache(
+            namespace,
+            contents,
+            lambda i: self.lvlm.invoke(instruction, image_paths[i]),
+            self.lvlm_info['max_concurrency'],
+            'images',
+            progress_callback,
+        )
 
-    def summarize_texts(self, text_docs: List[Document]) -> Any:
+    def _summarize_elements(
+        self,
+        elements: List[str],
+        prompt_file: str,
+        stage: str,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    ) -> List[str]:
+        """
+        Summarizes text elements by calling the LLM with a summary prompt.
+
+        Parameters:
+        elements (list): A list of strings to summarize.
+        prompt_file (str): name of the summary prompt file in the prompts folder.
+        stage (str): name of the summarized elements, used to report progress.
+        progress_callback (callable): optional function called with the stage, the number of summaries done and
+            the total number of summaries each time a summary is done.
+
+        Returns:
+        summaries (list[str]): A list of summaries of the elements.
+        """
+        prompt_template = cast(PromptTemplate, load_prompt(os.path.join(kit_dir, 'prompts', prompt_file)))
+        summarize_chain: Any = {'element': lambda x: x} | prompt_template | self.llm | StrOutputParser()
+        namespace = '|'.join(
+            str(value)
+            for value in [
+                getattr(self.llm, 'model', None) or self.llm_info['select_expert'],
+                self.llm_info['temperature'],
+                self.llm_info['max_tokens_to_generate'],
+                prompt_template.template,
+            ]
+        )
+        return self._summarize_with_cache(
+            namespace,
+            [element.encode('utf-8') for element in elements],
+            lambda i: summarize_chain.invoke(elements[i]),
+            self.llm_info['max_concurrency'],
+            stage,
+            progress_callback,
+        )
+
+    def summarize_texts(
+        self, text_docs: List[Document], progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> List[str]:
         """
         Summarizes text documents by calling the LLM wit summarize text prompt.
 
         Parameters:
         text_docs (list): A list of Document objects representing text documents.
+        progress_callback (callable): optional function called with the stage, the number of summaries done and
+            the total number of summaries each time a summary is done.
 
         Returns:
-        text_summaries (list[str]): A list of summaries of the input text documents.
+        text_summaries (list[str]): A list of summaries of the input text documents, empty for empty documents.
         """
-        text_prompt_template = load_prompt(os.path.join(kit_dir, 'prompts', 'llama3-text_summary.yaml'))
-        text_summarize_chain: Any = {'element': lambda x: x} | text_prompt_template | self.llm | StrOutputParser()
         texts = [i.page_content for i in text_docs if i.page_content != '']
-        if texts:
-            text_summaries = text_summarize_chain.batch(texts, {'max_concurrency': 1})
-        return text_summaries
+        summaries = iter(self._summarize_elements(texts, 'llama3-text_summary.yaml', 'texts', progress_callback))
+        return [next(summaries) if i.page_content != '' else '' for i in text_docs]
 
-    def summarize_tables(self, table_docs: List[Document]) -> Any:
+    def summarize_tables(
+        self, table_docs: List[Document], progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> List[str]:
         """
         Summarizes table documents by calling the LLM wit summarize text prompt.
 
         Parameters:
         table_docs (list): A list of Document objects representing table documents.
+        progress_callback (callable): optional function called with the stage, the number of summaries done and
+            the total number of summaries each time a summary is done.
 
         Returns:
         table_summaries (list[str]): A list of summaries of the input table documents.
         """
-        table_prompt_template = load_prompt(os.path.join(kit_dir, 'prompts', 'llama3-table_summary.yaml'))
-        table_summarize_chain: Any = {'element': lambda x: x} | table_prompt_template | self.llm | StrOutputParser()
         tables = [i.page_content for i in table_docs]
-        if tables:
-            table_summaries = table_summarize_chain.batch(tables, {'max_concurrency': 1})
-        return table_summaries
+        return self._summarize_elements(tables, 'llama3-table_summary.yaml', 'tables', progress_callback)
 
     def process_raw_elements(
         self, raw_elements: List[str], images_paths: Union[List[str], str]
@@ -357,9 +479,12 @@ class MultimodalRetrieval:
         image_paths: List[str],
         summarize_texts: bool = False,
         summarize_tables: bool = False,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
     ) -> MultiVectorRetriever:
         """
         Ingests documents into the vectorstore and docstore.
+        Summaries are generated concurrently, up to the max_concurrency of each model set in the config, and are
+        read from the summary cache when the same element was already summarized.
 
         Parameters:
         retriever (MultiVectorRetriever): The retriever object with the vectorstore and docstore.
@@ -368,6 +493,8 @@ class MultimodalRetrieval:
         image_paths (list): A list of paths of images to ingest.
         summarize_texts (bool): A flag indicating whether to summarize text documents.
         summarize_tables (bool): A flag indicating whether to summarize table documents.
+        progress_callback (callable): optional function called with the stage, the number of summaries done and
+            the total number of summaries each time a summary is done.
 
         Returns:
         retriever (MultiVectorRetriever): The updated retriever object with the ingested documents.
@@ -376,7 +503,7 @@ class MultimodalRetrieval:
         if text_docs:
             doc_ids = [str(uuid.uuid4()) for _ in text_docs]
             if summarize_texts:
-                text_summaries = self.summarize_texts(text_docs)
+                text_summaries = self.summarize_texts(text_docs, progress_callback)
                 summary_texts = [
                     Document(page_content=s, metadata={id_key: doc_ids[i]}) for i, s in enumerate(text_summaries)
                 ]
@@ -390,20 +517,20 @@ class MultimodalRetrieval:
         if table_docs:
             table_ids = [str(uuid.uuid4()) for _ in table_docs]
             if summarize_tables:
-                table_summaries = self.summarize_tables(table_docs)
+                table_summaries = self.summarize_tables(table_docs, progress_callback)
                 summary_tables = [
                     Document(page_content=s, metadata={id_key: table_ids[i]}) for i, s in enumerate(table_summaries)
                 ]
                 retriever.vectorstore.add_documents(summary_tables)
             else:
                 tables = [i.page_content for i in table_docs]
-                docs = [Document(page_content=s, metadata={id_key: doc_ids[i]}) for i, s in enumerate(tables)]
+                docs = [Document(page_content=s, metadata={id_key: table_ids[i]}) for i, s in enumerate(tables)]
                 retriever.vectorstore.add_documents(docs)
             retriever.docstore.mset(list(zip(table_ids, table_docs)))
 
         if image_paths:
             img_ids = [str(uuid.uuid4()) for _ in image_paths]
-            image_summaries = self.summarize_images(image_paths)
+            image_summaries = self.summarize_images(image_paths, progress_callback)
             image_docs = [
                 Document(
                     page_content=summary,
@@ -441,26 +568,61 @@ class MultimodalRetrieval:
         doc_results = [result for result in results if result.metadata['type'] != 'image']
         return image_results, doc_results
 
-    def get_image_answers(self, retrieved_image_docs: List[Any], query: str) -> List[Any]:
+    def get_image_answers(
+        self,
+        retrieved_image_docs: List[Any],
+        query: str,
+        timeout: Optional[float] = None,
+        min_answers: Optional[int] = None,
+    ) -> List[Any]:
         """
         This function uses LVLM to answer questions based in retrieved images.
+        The LVLM is called for all the images at once, so answering takes about as long as the slowest call.
+        Answers still pending when the timeout expires or once `min_answers` answers are received are left out,
+        as well as the ones that failed.
 
         Parameters:
         retrieved_image_docs (list): A list of Document objects representing image documents retrieved from the
         vectorstore.
         query (str): The question string to ask about the images.
+        timeout (float): Maximum time in seconds to wait for the answers. If None, waits for all of them.
+        min_answers (int): Number of answers after which the remaining ones are not waited for. If None, waits
+        for all of them.
 
         Returns:
-        answers (list): A list of answers to the input query for each image.
+        answers (list): A list of answers to the input query, in the order of the retrieved images.
         """
+        if not retrieved_image_docs:
+            return []
         image_answer_prompt_template = load_prompt(os.path.join(kit_dir, 'prompts', 'multimodal-qa.yaml'))
         image_answer_prompt = image_answer_prompt_template.format(question=query)
-        answers = []
-        for doc in retrieved_image_docs:
-            image_path = os.path.join(doc.metadata['file_directory'], doc.metadata['filename'])
-            answers.append(self.lvlm.invoke(image_answer_prompt, image_path))
-        logger.info(f'PARTIAL ANSWERS FROM IMAGES: {answers}')
-        return answers
+        num_expected = len(retrieved_image_docs) if min_answers is None else min(min_answers, len(retrieved_image_docs))
+
+        # the executor is not used as a context manager, since exiting it would wait for the calls left out
+        executor = ThreadPoolExecutor(max_workers=len(retrieved_image_docs))
+        futures = {
+            executor.submit(
+                self.lvlm.invoke,
+                image_answer_prompt,
+                os.path.join(doc.metadata['file_directory'], doc.metadata['filename']),
+            ): i
+            for i, doc in enumerate(retrieved_image_docs)
+        }
+        answers: Dict[int, str] = {}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    answers[futures[future]] = future.result()
+                except Exception as e:
+                    logger.warning(f'Image answer failed: {e}')
+                if len(answers) >= num_expected:
+                    break
+        except FuturesTimeoutError:
+            logger.warning(f'Image answers not received within {timeout}s were left out')
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f'PARTIAL ANSWERS FROM IMAGES ({len(answers)}/{len(retrieved_image_docs)}): {answers}')
+        return [answers[i] for i in sorted(answers)]
 
     def set_retrieval_chain(
         self, retriever: Optional[MultiVectorRetriever] = None, image_retrieval_type: str = 'raw'
@@ -472,6 +634,8 @@ class MultimodalRetrieval:
         Parameters:
         retriever (MultiVectorRetriever): The retriever object with the vectorstore and docstore.
         image_retrieval_type (str): The type of image retrieval. It can be either "raw" or "summary".
+        The raw chain waits for the image answers at most `answer_timeout` seconds, and only for `min_image_answers`
+        answers when set in the lvlm config.
 
         """
 
@@ -492,14 +656,19 @@ class MultimodalRetrieval:
 
         elif image_retrieval_type == 'raw':
 
-            def retrieval_qa_raw_chain(query: str) -> Dict[str, Any]:
+            def retrieval_qa_raw_chain(query: str, stream: bool = False) -> Dict[str, Any]:
                 assert retriever is not None
                 image_docs, context_docs = self.get_retrieved_images_and_docs(retriever, query)
-                image_answers = self.get_image_answers(image_docs, query)
+                image_answers = self.get_image_answers(
+                    image_docs,
+                    query,
+                    timeout=self.lvlm_info['answer_timeout'],
+                    min_answers=self.lvlm_info['min_image_answers'],
+                )
                 text_contexts = [doc.page_content for doc in context_docs]
                 full_context = '\n\n'.join(image_answers) + '\n\n' + '\n\n'.join(text_contexts)
                 formatted_prompt = prompt.format(context=full_context, question=query)
-                answer = self.llm.invoke(formatted_prompt)
+                answer = self.llm.stream(formatted_prompt) if stream else self.llm.invoke(formatted_prompt)
                 result = {'question': query, 'answer': answer, 'source_documents': image_docs + context_docs}
                 return result
 
@@ -507,6 +676,7 @@ class MultimodalRetrieval:
 
         else:
             raise ValueError('Invalid value for image_retrieval_type: {}'.format(image_retrieval_type))
+        self.image_retrieval_type = image_retrieval_type
 
     def call(self, query: str) -> Dict[str, Any]:
         """
@@ -525,6 +695,39 @@ class MultimodalRetrieval:
             generation = self.qa_chain(query)
         return generation
 
+    def stream(self, query: str) -> Dict[str, Any]:
+        """
+        Calls the retrieval chain with the provided query, streaming the final answer.
+        With the raw retrieval chain, the answer starts as soon as the image answers are ready. The summary retrieval
+        chain does not support streaming, so its whole answer is returned as a single chunk.
+
+        Returns:
+        generation (dict): The retrieval chain result, where the answer is an iterator of text chunks.
+        """
+        assert self.qa_chain is not None
+        if self.image_retrieval_type != 'raw':
+            generation = self.call(query)
+            return {**generation, 'answer': iter([generation['answer']])}
+
+        logger.info(f'USER QUERY: {query}')
+        if not self.conversational:
+            return self.qa_chain(query, stream=True)
+
+        reformulated_query = self.reformulate_query_with_history(query)
+        logger.info(f'REFORMULATED QUERY: {reformulated_query}')
+        generation = self.qa_chain(reformulated_query, stream=True)
+
+        def stream_answer(chunks: Iterator[str]) -> Iterator[str]:
+            answer = ''
+            for chunk in chunks:
+                answer += chunk
+                yield chunk
+            assert self.memory is not None
+            self.memory.save_context(inputs={'input': query}, outputs={'answer': answer})
+            logger.info(f'FINAL ANSWER: {answer}')
+
+        return {**generation, 'answer': stream_answer(generation['answer'])}
+
     def st_ingest(
         self,
         files: List[Any],
@@ -571,6 +774,12 @@ class MultimodalRetrieval:
             image_paths.append(single_images_folder)
         text_docs, table_docs, image_paths = self.process_raw_elements(raw_elements, image_paths)
         self.retriever = self.create_vectorstore()
+        progress_bar = st.progress(0.0)
+
+        def update_progress(stage: str, num_done: int, total: int) -> None:
+            # stages without elements to summarize report a total of 0
+            progress_bar.progress(num_done / total if total else 1.0, text=f'Summarizing {stage}: {num_done}/{total}')
+
         self.retriever = self.vectorstore_ingest(
             self.retriever,
             text_docs,
@@ -578,7 +787,9 @@ class MultimodalRetrieval:
             image_paths,
             summarize_texts=summarize_texts,
             summarize_tables=summarize_tables,
+            progress_callback=update_progress,
         )
+        progress_bar.empty()
         if raw_image_retrieval:
             self.set_retrieval_chain(retriever=self.retriever, image_retrieval_type='raw')
         else:
@@ -0,0 +1,27 @@
+import hashlib
+import os
+
+from utils.sqlite_cache import SQLiteCache
+
+
+class SummaryCache(SQLiteCache[str]):
+    """Disk backed cache of the summaries generated during ingestion, keyed by a hash of the summarized content and of
+    the model and prompt that summarized it.
+
+    Summaries are stored in a `SQLiteCache`, which is safe to share between threads and processes, so re-ingesting a
+    document only calls the models for the elements that changed.
+    """
+
+    DB_FILENAME = 'summary_cache.sqlite'
+
+    def __init__(self, cache_dir: str) -> None:
+        """
+        Args:
+            cache_dir (str): directory where the cache database is stored
+        """
+        super().__init__(os.path.join(cache_dir, self.DB_FILENAME), 'summaries', encode=str, decode=str)
+
+    @staticmethod
+    def make_key(namespace: str, content: bytes) -> str:
+        """Gets the cache key of some content summarized in a namespace, e.g. a model and prompt"""
+        return hashlib.sha256(namespace.encode('utf-8') + b'\0' + content).hexdigest()
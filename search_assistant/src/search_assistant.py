@@ -1,10 +1,15 @@
+import asyncio
 import json
 import logging
 import os
 import re
 import sys
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from urllib.parse import urlparse
 
+import html2text
+import httpx
 import requests
 import weave
 import yaml
@@ -15,8 +20,8 @@ from langchain.memory import ConversationSummaryMemory
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
 from langchain.prompts import load_prompt
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import AsyncHtmlLoader, UnstructuredURLLoader
-from langchain_community.document_transformers import Html2TextTransformer
+from langchain_community.document_loaders import UnstructuredURLLoader
+from langchain_core.embeddings import Embeddings
 from langchain_core.language_models.llms import LLM
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,16 +30,27 @@ repo_dir = os.path.abspath(os.path.join(kit_dir, '..'))
 sys.path.append(kit_dir)
 sys.path.append(repo_dir)
 
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, cast
 
 from serpapi import GoogleSearch
 
+from search_assistant.src.search_cache import get_cache, normalize_query
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.embedding_cache import get_embeddings_model_id
 from utils.vectordb.vector_db import VectorDb
 from utils.visual.env_utils import get_wandb_key
 
 CONFIG_PATH = os.path.join(kit_dir, 'config.yaml')
 PERSIST_DIRECTORY = os.path.join(kit_dir, 'data/my-vector-db')
+FETCH_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/120.0.0.0 Safari/537.36'
+    ),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+# Prefix citing the rank of the site of a chunk in the search results, see `get_text_chunks_with_references`
+REFERENCE_PREFIX_PATTERN = re.compile(r'^\[reference:\d+\] ')
 
 load_dotenv(os.path.join(repo_dir, '.env'))
 
@@ -51,6 +67,37 @@ else:
     print('WANDB_API_KEY is not set. Weave initialization skipped.')
 
 
+def html_to_text(html: str) -> str:
+    """Converts HTML to plain text the way langchain Html2TextTransformer does, ignoring links and images"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = True
+    converter.ignore_images = True
+    return converter.handle(html)
+
+
+@lru_cache(maxsize=None)
+def get_html_to_text_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Gets the process pool converting HTML to text, created once and shared by all the searches of the process"""
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Embeddings client returning vectors computed ahead of time, and calling the wrapped client for other texts"""
+
+    def __init__(self, embeddings: Embeddings, vectors: Dict[str, List[float]]) -> None:
+        self.embeddings = embeddings
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing_texts = [text for text in dict.fromkeys(texts) if text not in self.vectors]
+        if missing_texts:
+            self.vectors.update(zip(missing_texts, self.embeddings.embed_documents(missing_texts)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
 class SearchAssistant:
     """
     Class used to do generation over search query results and scraped sites
@@ -86,6 +133,7 @@ class SearchAssistant:
         self.web_crawling_params = config_info[3]
         self.extra_loaders: List[str] = config_info[4]
         self.prod_mode = config_info[5]
+        self.cache_info = config_info[6]
         self.documents: Sequence[Document]
         self.urls: List[Any] = []
         self.llm = self.init_llm_model()
@@ -95,7 +143,7 @@ class SearchAssistant:
 
     def _get_config_info(
         self, config_path: str
-    ) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], Dict[str, Any], List[str], bool]:
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], Dict[str, Any], List[str], bool, Dict[str, Any]]:
         """
         Loads json config file
 
@@ -110,6 +158,7 @@ class SearchAssistant:
         extra_loaders (list): list containing extra loader to use when doing web crawling (only pdf available
         in base kit)
         prod_mode (bool): Boolean indicating whether the app is in production mode
+        cache_info (dict): Dictionary containing the search results, pages and embeddings cache parameters
         """
         with open(config_path, 'r') as yaml_file:
             config = yaml.safe_load(yaml_file)
@@ -119,8 +168,9 @@ class SearchAssistant:
         web_crawling_params = config['web_crawling']
         extra_loaders = config['extra_loaders']
         prod_mode = config['prod_mode']
+        cache_info = config['cache']
 
-        return embedding_model_info, llm_info, retrieval_info, web_crawling_params, extra_loaders, prod_mode
+        return embedding_model_info, llm_info, retrieval_info, web_crawling_params, extra_loaders, prod_mode, cache_info
 
     def init_memory(self) -> None:
         """
@@ -211,6 +261,30 @@ class SearchAssistant:
             answer = answer.replace(f'[Reference: {i+1}]', f'[<sup>{i+1}</sup>]({link})')
         return answer
 
+    def _cached_search(
+        self, key: Tuple[Any, ...], search: Callable[[], Tuple[str, List[Any]]]
+    ) -> Tuple[str, List[Any]]:
+        """
+        Gets the search results of a query from the search results cache, or searches and caches them if they are
+        missing or expired. Failed searches are not cached.
+
+        Parameters:
+        key (tuple): The cache key, made of the search provider, normalized query, engine and limit.
+        search (callable): Function doing the search and returning the context and the links.
+
+        Returns:
+        tuple: A tuple containing the search results context and the corresponding links.
+        """
+        cache = get_cache('search_results', self.cache_info['search_results_ttl'], self.cache_info['max_entries'])
+        cached_results = cache.get(key)
+        if cached_results is not None:
+            self.logger.info(f'Search results found in cache for {key}')
+            return cast(Tuple[str, List[Any]], cached_results)
+        context, links = search()
+        if links:
+            cache.put(key, (context, links))
+        return context, links
+
     def querySerper(
         self,
         query: str,
@@ -237,36 +311,44 @@ class SearchAssistant:
         payload = json.dumps({'q': query, 'num': limit})
         headers = {'X-API-KEY': os.environ.get('SERPER_API_KEY'), 'Content-Type': 'application/json'}
 
-        try:
-            response = requests.post(url, headers=headers, data=payload)
-            if response.status_code == 200:
-                results = response.json().get('organic', [])
-                if len(results) > 0:
-                    links = [r['link'] for r in results]
-                    context_list = []
-                    for i, result in enumerate(results):
-                        context_list.append(f'[reference:{i+1}] {result.get("title", "")}: {result.get("snippet", "")}')
-                    context = '\n\n'.join(context_list)
-                    self.logger.info(f'Context found: {context}')
-                    if include_site_links:
-                        sitelinks = []
-                        for r in [r.get('sitelinks', []) for r in results]:
-                            sitelinks.extend([site.get('link', None) for site in r])
-                        links.extend(sitelinks)
-                    links = list(filter(lambda x: x is not None, links))
+        def search() -> Tuple[str, List[Any]]:
+            try:
+                response = requests.post(url, headers=headers, data=payload)
+                if response.status_code == 200:
+                    results = response.json().get('organic', [])
+                    if len(results) > 0:
+                        links = [r['link'] for r in results]
+                        context_list = []
+                        for i, result in enumerate(results):
+                            context_list.append(
+                                f'[reference:{i+1}] {result.get("title", "")}: {result.get("snippet", "")}'
+                            )
+                        context = '\n\n'.join(context_list)
+                        self.logger.info(f'Context found: {context}')
+                        if include_site_links:
+                            sitelinks = []
+                            for r in [r.get('sitelinks', []) for r in results]:
+                                sitelinks.extend([site.get('link', None) for site in r])
+                            links.extend(sitelinks)
+                        links = list(filter(lambda x: x is not None, links))
+                    else:
+                        context = 'Answer not found'
+                        links = []
+                        self.logger.info(f'No answer found for query: {query}')
                 else:
                     context = 'Answer not found'
                     links = []
-                    self.logger.info(f'No answer found for query: {query}')
-            else:
+                    self.logger.error(f'Request failed with status code: {response.status_code}')
+                    self.logger.error(f'Error message: {response.text}')
+            except Exception as e:
                 context = 'Answer not found'
                 links = []
-                self.logger.error(f'Request failed with status code: {response.status_code}')
-                self.logger.error(f'Error message: {response.text}')
-        except Exception as e:
-            context = 'Answer not found'
-            links = []
-            self.logger.error(f'Error message: {e}')
+                self.logger.error(f'Error message: {e}')
+            return context, links
+
+        context, links = self._cached_search(
+            ('serper', normalize_query(query), None, limit, include_site_links), search
+        )
 
         if do_analysis:
             prompt = load_prompt(os.path.join(kit_dir, 'prompts/llama3-serp_analysis.yaml'))
@@ -304,32 +386,36 @@ class SearchAssistant:
         url = f'http://127.0.0.1:7000/{engine}/search'
         params = {'lang': 'EN', 'limit': limit, 'text': query}
 
-        try:
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                results = response.json()
-                if len(results) > 0:
-                    links = [r['url'] for r in results]
-                    context_list = []
-                    for i, result in enumerate(results):
-                        context_list.append(
-                            f'[reference:{i+1}] {result.get("title", "")}: {result.get("description", "")}'
-                        )
-                    context = '\n\n'.join(context_list)
-                    self.logger.info(f'Context found: {context}')
+        def search() -> Tuple[str, List[Any]]:
+            try:
+                response = requests.get(url, params=params)
+                if response.status_code == 200:
+                    results = response.json()
+                    if len(results) > 0:
+                        links = [r['url'] for r in results]
+                        context_list = []
+                        for i, result in enumerate(results):
+                            context_list.append(
+                                f'[reference:{i+1}] {result.get("title", "")}: {result.get("description", "")}'
+                            )
+                        context = '\n\n'.join(context_list)
+                        self.logger.info(f'Context found: {context}')
+                    else:
+                        context = 'Answer not found'
+                        links = []
+                        self.logger.info(f'No answer found for query: {query}')
                 else:
                     context = 'Answer not found'
                     links = []
-                    self.logger.info(f'No answer found for query: {query}')
-            else:
+                    self.logger.error(f'Request failed with status code: {response.status_code}')
+                    self.logger.error(f'Error message: {response.text}')
+            except Exception as e:
                 context = 'Answer not found'
                 links = []
-                self.logger.error(f'Request failed with status code: {response.status_code}')
-                self.logger.error(f'Error message: {response.text}')
-        except Exception as e:
-            context = 'Answer not found'
-            links = []
-            self.logger.error(f'Error message: {e}')
+                self.logger.error(f'Error message: {e}')
+            return context, links
+
+        context, links = self._cached_search(('openserp', normalize_query(query), engine, limit), search)
 
         if do_analysis:
             prompt = load_prompt(os.path.join(kit_dir, 'prompts/llama3-serp_analysis.yaml'))
@@ -364,29 +450,33 @@ class SearchAssistant:
             raise ValueError('engine must be either google or bing')
         params = {'q': query, 'num': limit, 'engine': engine, 'api_key': self.serpapi_api_key}
 
-        try:
-            search = GoogleSearch(params)
-            response = search.get_dict()
-
-            knowledge_graph = response.get('knowledge_graph', None)
-            results = response.get('organic_results', [])
-
-            links = []
-            if len(results) > 0:
-                links = [r['link'] for r in results]
-                context_list = []
-                for i, result in enumerate(results):
-                    context_list.append(f'[reference:{i+1}] {result.get("title", "")}: {result.get("snippet", "")}')
-                context = '\n\n'.join(context_list)
-                self.logger.info(f'Context found: {context}')
-            else:
+        def search() -> Tuple[str, List[Any]]:
+            try:
+                search = GoogleSearch(params)
+                response = search.get_dict()
+
+                knowledge_graph = response.get('knowledge_graph', None)
+                results = response.get('organic_results', [])
+
+                links = []
+                if len(results) > 0:
+                    links = [r['link'] for r in results]
+                    context_list = []
+                    for i, result in enumerate(results):
+                        context_list.append(f'[reference:{i+1}] {result.get("title", "")}: {result.get("snippet", "")}')
+                    context = '\n\n'.join(context_list)
+                    self.logger.info(f'Context found: {context}')
+                else:
+                    context = 'Answer not found'
+                    links = []
+                    self.logger.info(f'No answer found for query: {query}. Raw response: {response}')
+            except Exception as e:
                 context = 'Answer not found'
                 links = []
-                self.logger.info(f'No answer found for query: {query}. Raw response: {response}')
-        except Exception as e:
-            context = 'Answer not found'
-            links = []
-            self.logger.error(f'Error message: {e}')
+                self.logger.error(f'Error message: {e}')
+            return context, links
+
+        context, links = self._cached_search(('serpapi', normalize_query(query), engine, limit), search)
 
         if do_analysis:
             prompt = load_prompt(os.path.join(kit_dir, 'prompts/llama3-serp_analysis.yaml'))
@@ -408,27 +498,104 @@ class SearchAssistant:
         docs = loader.load()
         return docs
 
-    def load_htmls(self, urls: List[str], extra_loaders: Optional[List[str]] = None) -> List[Document]:
+    async def aload_htmls(
+        self,
+        urls: List[str],
+        extra_loaders: Optional[List[str]] = None,
+        time_budget: Optional[float] = None,
+        on_document: Optional[Callable[[Document], None]] = None,
+    ) -> List[Document]:
         """
-        Load HTML documents from the given URLs.
+        Load the given URLs concurrently and convert their HTML to plain text in a process pool.
         Args:
             urls (list): A list of URLs to load HTML documents from.
+            extra_loaders (list, optional): list of extra loaders to use, only 'pdf' is available.
+            time_budget (float, optional): time in seconds after which the pages still loading are dropped.
+            on_document (callable, optional): function called with each document as soon as it is loaded.
         Returns:
-            list: A list of loaded HTML documents.
+            list: A list of loaded plain text documents, in the order of the URLs.
         """
         if extra_loaders is None:
             extra_loaders = []
-        docs = []
-        for url in urls:
+        loop = asyncio.get_running_loop()
+        process_pool = get_html_to_text_pool(self.web_crawling_params['html_to_text_workers'])
+        page_cache = get_cache('pages', self.cache_info['page_ttl'], self.cache_info['max_entries'])
+
+        async def load(client: httpx.AsyncClient, url: str) -> List[Document]:
+            # cached pages are used while fresh, then revalidated with a conditional GET when they have validators
+            cache_entry = page_cache.get_entry(url)
+            if cache_entry is not None and cache_entry[1]:
+                return [Document(page_content=text, metadata={'source': url}) for text in cache_entry[0]['texts']]
             if url.endswith('.pdf'):
-                if 'pdf' in extra_loaders:
-                    docs.extend(self.load_remote_pdf(url))
-                else:
-                    continue
+                if 'pdf' not in extra_loaders:
+                    return []
+                docs = await loop.run_in_executor(None, self.load_remote_pdf, url)
+                page_cache.put(url, {'texts': [doc.page_content for doc in docs], 'etag': None, 'last_modified': None})
+                return docs
+
+            headers = {}
+            if cache_entry is not None:
+                if cache_entry[0]['etag']:
+                    headers['If-None-Match'] = cache_entry[0]['etag']
+                if cache_entry[0]['last_modified']:
+                    headers['If-Modified-Since'] = cache_entry[0]['last_modified']
+            response = await client.get(url, headers=headers)
+            if response.status_code == 304 and cache_entry is not None:
+                texts = cache_entry[0]['texts']
             else:
-                loader = AsyncHtmlLoader(url, verify_ssl=False)
-                docs.extend(loader.load())
-        return docs
+                response.raise_for_status()
+                texts = [await loop.run_in_executor(process_pool, html_to_text, response.text)]
+            page_cache.put(
+                url,
+                {
+                    'texts': texts,
+                    'etag': response.headers.get('etag'),
+                    'last_modified': response.headers.get('last-modified'),
+                },
+            )
+            return [Document(page_content=text, metadata={'source': url}) for text in texts]
+
+        docs: Dict[str, List[Document]] = {}
+        async with httpx.AsyncClient(
+            headers=FETCH_HEADERS, timeout=time_budget, verify=False, follow_redirects=True
+        ) as client:
+            tasks = {asyncio.create_task(load(client, url)): url for url in urls}
+            pending = set(tasks)
+            deadline = None if time_budget is None else loop.time() + time_budget
+            while pending:
+                timeout = None if deadline is None else deadline - loop.time()
+                if timeout is not None and timeout <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        docs[tasks[task]] = task.result()
+                    except Exception as e:
+                        self.logger.warning(f'Error loading {tasks[task]}: {e!r}')
+                        continue
+                    if on_document is not None:
+                        for doc in docs[tasks[task]]:
+                            on_document(doc)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.logger.warning(
+                    f'Dropped {len(pending)} sites not loaded within {time_budget}s: '
+                    f'{[tasks[task] for task in pending]}'
+                )
+                await asyncio.gather(*pending, return_exceptions=True)
+        return [doc for url in urls for doc in docs.get(url, [])]
+
+    def load_htmls(self, urls: List[str], extra_loaders: Optional[List[str]] = None) -> List[Document]:
+        """
+        Load HTML documents from the given URLs, concurrently, as plain text.
+        Args:
+            urls (list): A list of URLs to load HTML documents from.
+            extra_loaders (list, optional): list of extra loaders to use, only 'pdf' is available.
+        Returns:
+            list: A list of loaded plain text documents.
+        """
+        return asyncio.run(self.aload_htmls(urls, extra_loaders, self.web_crawling_params['fetch_time_budget']))
 
     def link_filter(self, all_links: List[str], excluded_links: Set[str]) -> Set[str]:
         """
@@ -452,25 +619,29 @@ class SearchAssistant:
 
     def clean_docs(self, docs: Sequence[Document]) -> Sequence[Document]:
         """
-        Clean the given HTML documents by transforming them into plain text.
+        Clean the given HTML documents by transforming them into plain text, in a process pool.
         Args:
             docs (list): A list of langchain documents with html content to clean.
         Returns:
             list: A list of cleaned plain text documents.
         """
-        html2text_transformer = Html2TextTransformer()
-        docs = html2text_transformer.transform_documents(documents=docs)
-        return docs
+        process_pool = get_html_to_text_pool(self.web_crawling_params['html_to_text_workers'])
+        texts = process_pool.map(html_to_text, [doc.page_content for doc in docs])
+        return [Document(page_content=text, metadata={**doc.metadata}) for doc, text in zip(docs, texts)]
 
-    def web_crawl(self, urls: List[str], excluded_links: Optional[List[str]] = None) -> None:
+    def web_crawl(
+        self,
+        urls: List[str],
+        excluded_links: Optional[List[str]] = None,
+        on_document: Optional[Callable[[Document], None]] = None,
+    ) -> None:
         """
-        Perform web crawling, retrieve and clean HTML documents from the given URLs, with specified depth of
-        exploration.
+        Perform web crawling, retrieve and clean HTML documents from the given URLs concurrently. Sites not loaded
+        within the fetch_time_budget of the config are dropped.
         Args:
             urls (list): A list of URLs to crawl.
             excluded_links (list, optional): A list of links to exclude from crawling. Defaults to None.
-            depth (int, optional): The depth of crawling, determining how many layers of internal links to explore.
-            Defaults to 1
+            on_document (callable, optional): function called with each cleaned document as soon as it is loaded.
         Returns:
             tuple: A tuple containing the langchain documents (list) and the scrapped URLs (list).
         """
@@ -489,14 +660,14 @@ class SearchAssistant:
                 results to retrieve"""
             )
         urls = list(unique_urls)[: self.web_crawling_params['max_scraped_websites']]
-
-        scraped_docs = self.load_htmls(urls, self.extra_loaders)
+        # urls are set first since the chunk references of the streamed documents are numbered after them
         scrapped_urls.extend(urls)
-
-        docs = self.clean_docs(scraped_docs)
-        self.documents = docs
         self.urls = scrapped_urls
 
+        self.documents = asyncio.run(
+            self.aload_htmls(urls, self.extra_loaders, self.web_crawling_params['fetch_time_budget'], on_document)
+        )
+
     def get_text_chunks_with_references(
         self, docs: Sequence[Document], chunk_size: int, chunk_overlap: int
     ) -> List[Document]:
@@ -549,9 +720,6 @@ class SearchAssistant:
             chunks = self.get_text_chunks_with_references(
                 self.documents, self.retrieval_info['chunk_size'], self.retrieval_info['chunk_overlap']
             )
-            self.vector_store = self.vectordb.load_vdb(
-                persist_directory, embeddings, db_type=self.retrieval_info['db_type']
-            )
             self.vector_store = self.vectordb.update_vdb(
                 chunks, embeddings, self.retrieval_info['db_type'], persist_directory
             )
@@ -569,6 +737,7 @@ class SearchAssistant:
         input_directory: Optional[str] = None,
         persist_directory: Optional[str] = None,
         update: Optional[bool] = False,
+        embeddings: Optional[Embeddings] = None,
     ) -> None:
         """
         Create a vector store based on the given documents.
@@ -576,18 +745,20 @@ class SearchAssistant:
             input_directory: The directory containing the previously created vectorstore.
             persist_directory: The directory to save the vectorstore.
             update (bool, optional): Whether to update the vector store. Defaults to False.
+            embeddings (Embeddings, optional): The embeddings client to use. Defaults to the one set in the config.
         """
         persist_directory = persist_directory or self.config.get('persist_directory', 'NoneDirectory')
 
         chunks = self.get_text_chunks_with_references(
             self.documents, self.retrieval_info['chunk_size'], self.retrieval_info['chunk_overlap']
         )
-        embeddings = APIGateway.load_embedding_model(
-            type=self.embedding_model_info['type'],
-            batch_size=self.embedding_model_info['batch_size'],
-            bundle=self.embedding_model_info['bundle'],
-            select_expert=self.embedding_model_info['select_expert'],
-        )
+        if embeddings is None:
+            embeddings = APIGateway.load_embedding_model(
+                type=self.embedding_model_info['type'],
+                batch_size=self.embedding_model_info['batch_size'],
+                bundle=self.embedding_model_info['bundle'],
+                select_expert=self.embedding_model_info['select_expert'],
+            )
         if update and os.path.exists(persist_directory):
             self.config['update'] = True
             self.vector_store = self.vectordb.update_vdb(
@@ -691,7 +862,8 @@ class SearchAssistant:
         search_engine: Optional[str] = 'google',
     ) -> Optional[Dict[str, str]]:
         """
-        Do a call to the serp tool, scrape the url results, and save the scraped data in a a vectorstore
+        Do a call to the serp tool, scrape the url results, and save the scraped data in a a vectorstore.
+        Each site is chunked and embedded as soon as it is loaded, while the other sites are still loading.
         Args:
             query (str): The query to search.
             max_results (int): The maximum number of search results. Default is 5
@@ -705,9 +877,50 @@ class SearchAssistant:
         elif search_method == 'openserp':
             _, links = self.queryOpenSerp(query=query, limit=max_results, engine=search_engine, do_analysis=False)
         if len(links) > 0:
-            self.web_crawl(urls=links)
+            embeddings = APIGateway.load_embedding_model(
+                type=self.embedding_model_info['type'],
+                batch_size=self.embedding_model_info['batch_size'],
+                bundle=self.embedding_model_info['bundle'],
+                select_expert=self.embedding_model_info['select_expert'],
+            )
+            vectors: Dict[str, List[float]] = {}
+            # chunk vectors are shared by the searches of the process, so chunks seen before are not embedded again
+            vectors_cache = get_cache('chunk_vectors', None, self.cache_info['max_chunk_vectors'])
+            model_id = get_embeddings_model_id(embeddings)
+
+            def embed_document(doc: Document) -> None:
+                chunks = self.get_text_chunks_with_references(
+                    [doc], self.retrieval_info['chunk_size'], self.retrieval_info['chunk_overlap']
+                )
+                # the reference number depends on the rank of the site in each search, so chunks are embedded and
+                # cached without it, and their vectors are looked up with it when the vector store is created
+                missing_chunks: Dict[str, str] = {}
+                for chunk in chunks:
+                    chunk_text = REFERENCE_PREFIX_PATTERN.sub('', chunk.page_content)
+                    vector = vectors_cache.get((model_id, chunk_text))
+                    if vector is not None:
+                        vectors[chunk.page_content] = vector
+                    else:
+                        missing_chunks[chunk_text] = chunk.page_content
+                if missing_chunks:
+                    new_vectors = embeddings.embed_documents(list(missing_chunks))
+                    for (chunk_text, page_content), vector in zip(missing_chunks.items(), new_vectors):
+                        vectors[page_content] = vector
+                        vectors_cache.put((model_id, chunk_text), vector)
+
+            # a single worker embeds the loaded sites one after another while the others are loading
+            with ThreadPoolExecutor(max_workers=1) as embedding_executor:
+                embedding_futures: List[Future[None]] = []
+                self.web_crawl(
+                    urls=links,
+                    on_document=lambda doc: embedding_futures.append(embedding_executor.submit(embed_document, doc)),
+                )
+                for future in embedding_futures:
+                    future.result()
+            if not self.documents:
+                return {'message': f"No sites could be loaded for '{query}'. Try again"}
             # self.create_load_vector_store()
-            self.create_and_save_local()
+            self.create_and_save_local(embeddings=PrecomputedEmbeddings(embeddings, vectors))
             self.set_retrieval_qa_chain(conversational=True)
             return None
         else:
@@ -0,0 +1,82 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query so its spelling variants share cache entries. Unicode forms, case, whitespace and
+    trailing punctuation are normalized.
+
+    Args:
+        query (str): search query
+
+    Returns:
+        str: normalized query
+    """
+    query = unicodedata.normalize('NFKC', query).casefold()
+    query = re.sub(r'\s+', ' ', query).strip()
+    return query.rstrip('?!. ')
+
+
+class TTLCache:
+    """Thread safe in-memory cache whose entries expire a time to live after they are stored. The least recently used
+    entries are evicted above `max_entries`. Expired entries are kept until evicted, so callers can revalidate them.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = 1024) -> None:
+        """
+        Args:
+            ttl (float, optional): time to live of the entries in seconds. Defaults to entries that never expire.
+            max_entries (int): maximum number of entries
+        """
+        if max_entries <= 0:
+            raise ValueError(f'max_entries must be a positive number. Got {max_entries}')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """Gets the value of a key and whether it is still fresh, or None if the key is not cached"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            value, stored_at = self._entries[key]
+        return value, self.ttl is None or time.time() - stored_at < self.ttl
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Gets the value of a key, or None if the key is not cached or expired"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None and entry[1] else None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Stores the value of a key, resetting its time to live"""
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+@lru_cache(maxsize=None)
+def get_cache(name: str, ttl: Optional[float] = None, max_entries: int = 1024) -> TTLCache:
+    """Gets a cache by name, created once and shared by all the search assistants of the process
+
+    Args:
+        name (str): name of the cache, e.g. 'search_results'
+        ttl (float, optional): time to live of the entries in seconds. Defaults to entries that never expire.
+        max_entries (int): maximum number of entries
+
+    Returns:
+        TTLCache: shared cache
+    """
+    return TTLCache(ttl, max_entries)
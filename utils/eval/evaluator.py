@@ -8,7 +8,6 @@ sys.path.append(utils_dir)
 sys.path.append(repo_dir)
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 import weave
@@ -16,7 +15,8 @@ import yaml
 from weave import Dataset
 
 from utils.eval.dataset import WeaveDatasetManager
-from utils.eval.llm import CorrectnessLLMJudge, WeaveChatModel
+from utils.eval.judge_cache import get_judge_cache
+from utils.eval.llm import DEFAULT_MAX_CONCURRENCY, CorrectnessLLMJudge, WeaveChatModel, set_max_concurrency
 from utils.visual.env_utils import get_wandb_key
 
 wandb_api_key = get_wandb_key()
@@ -42,12 +42,15 @@ class BaseWeaveEvaluator:
         config_info (dict): Configuration information loaded from CONFIG_PATH.
         judge (object): Judge object used for evaluation.
         dataset_manager (object): Dataset manager object used for creating datasets.
+        judge_cache_stats (dict): Hit statistics of the judge cache during the last evaluation,
+            None if the judge cache is disabled.
     """
 
     def __init__(self) -> None:
         self.config_info = self._get_config_info(CONFIG_PATH)
         self.judge = self._init_judge()
         self.dataset_manager = self._init_dataset_manager()
+        self.judge_cache_stats: Optional[Dict[str, Any]] = None
 
     async def evaluate(
         self, name: Optional[str] = None, filepath: Optional[str] = None, use_concurrency: bool = False
@@ -58,13 +61,16 @@ class BaseWeaveEvaluator:
         This asynchronous method iterates over the LLM configurations specified in
         self.config_info['llms'], creating a WeaveChatModel for each configuration.
         It then sets up an evaluation using the provided data and a judge, executing
-        the evaluation for each model configuration.
+        the evaluation for each model configuration. When the judge cache is enabled,
+        its hit statistics for the run are printed and stored in self.judge_cache_stats.
 
         Args:
             name (str, optional): Name of the dataset. Defaults to the value specified
                 in self.config_info['eval_dataset']['name'].
             filepath (str, optional): Path to the dataset file. Defaults to the value
                 specified in self.config_info['eval_dataset']['path'].
+            use_concurrency (bool): Whether to evaluate all the model configurations concurrently
+                on the running event loop. Defaults to False.
 
         Returns:
             None: This method does not return any value. It performs the evaluation
@@ -83,12 +89,24 @@ class BaseWeaveEvaluator:
         data = self.dataset_manager.create_dataset(name, filepath)
 
         llm_info = self.config_info['llms']
+        set_max_concurrency(self.config_info.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+
+        judge_cache = get_judge_cache(self.judge.cache_path) if self.judge.cache_path is not None else None
+        if judge_cache is not None:
+            judge_cache.reset_stats()
 
         if use_concurrency:
-            await self._run_concurrently_with_threads(llm_info, data)
+            await self._run_concurrently(llm_info, data)
         else:
             await self._run_sequentially(llm_info, data)
 
+        if judge_cache is not None:
+            self.judge_cache_stats = judge_cache.get_stats()
+            print(
+                f'Judge cache: {self.judge_cache_stats["hits"]} hits, {self.judge_cache_stats["misses"]} misses '
+                f'({self.judge_cache_stats["hit_rate"]:.1%} hit rate)'
+            )
+
     async def _run_sequentially(self, params: List[Dict[str, Any]], data: Dataset) -> None:
         """
         Run evaluations of models sequentially for a list of parameters.
@@ -101,37 +119,26 @@ class BaseWeaveEvaluator:
         """
 
         for param in params:
-            test_model = WeaveChatModel(**param)
-            evaluation = weave.Evaluation(
-                name=' '.join(str(value) for value in param.values()), dataset=data, scorers=[self.judge]
-            )
-            with weave.attributes(param):
-                await evaluation.evaluate(test_model)
+            await self._evaluate_model(param, data)
 
-    async def _run_concurrently_with_threads(self, params: List[Dict[str, Any]], data: Dataset) -> None:
+    async def _run_concurrently(self, params: List[Dict[str, Any]], data: Dataset) -> None:
         """
-        Run evaluations of models concurrently using threads for a list of parameters.
-        This method utilizes a thread pool to run model evaluations concurrently.
-        Each set of parameters is evaluated in a separate thread to optimize performance.
+        Run evaluations of models concurrently for a list of parameters.
+        All the evaluations run on the running event loop, and their model and judge calls
+        share the concurrency limit set by `max_concurrency` in the config.
 
         Args:
             params (List[Dict[str, Any]]): A list of dictionaries containing parameters for each model to evaluate.
             data (Dataset): The dataset to be used for evaluation.
         """
 
-        with ThreadPoolExecutor() as executor:
-            evaluation_tasks = [
-                asyncio.get_event_loop().run_in_executor(executor, self._evaluate_model, param, data)
-                for param in params
-            ]
-
-            await asyncio.gather(*evaluation_tasks)
+        await asyncio.gather(*(self._evaluate_model(param, data) for param in params))
 
-    def _evaluate_model(self, params: List[Dict[str, Any]], data: Dataset) -> None:
+    async def _evaluate_model(self, params: Dict[str, Any], data: Dataset) -> None:
         """
-        Evaluate a model using the provided parameters in a separate thread.
-        This method runs in a thread pool. It creates a `WeaveChatModel` using the
-        specified parameters and evaluates it using the provided dataset and judges.
+        Evaluate a model using the provided parameters.
+        This method creates a `WeaveChatModel` using the specified parameters
+        and evaluates it using the provided dataset and judges.
 
         Args:
             params (Dict[str, Any]): A dictionary containing parameters for the model to evaluate.
@@ -143,7 +150,7 @@ class BaseWeaveEvaluator:
         )
 
         with weave.attributes(params):
-            asyncio.run(evaluation.evaluate(test_model))
+            await evaluation.evaluate(test_model)
 
     def _get_config_info(self, config_path: str) -> Any:
         """
@@ -181,7 +188,8 @@ class BaseWeaveEvaluator:
 
         This method retrieves configuration information for the evaluation LLM
         from the internal state (specifically from `self.config_info`) and
-        creates an instance of `CorrectnessLLMJudge` using the extracted parameters.
+        creates an instance of `CorrectnessLLMJudge` using the extracted parameters,
+        caching its results in `self.config_info['judge_cache']['path']` if the judge cache is enabled.
 
         Returns:
             CorrectnessLLMJudge: An initialized instance of the CorrectnessLLMJudge
@@ -195,7 +203,10 @@ class BaseWeaveEvaluator:
         Example:
             judge = self._init_judge()
         """
-        judge_info = self.config_info['eval_llm']
+        judge_info = dict(self.config_info['eval_llm'])
+        judge_cache_info = self.config_info.get('judge_cache', {})
+        if judge_cache_info.get('enabled', False):
+            judge_info['cache_path'] = judge_cache_info['path']
         return CorrectnessLLMJudge(**judge_info)
 
     def _init_dataset_manager(self) -> WeaveDatasetManager:
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from utils.sqlite_cache import SQLiteCache
+
+
+def hash_text(text: str) -> str:
+    """
+    Get the SHA-256 hex digest of a text, e.g. of the judge prompt template.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_judge_cache_key(
+    judge_params: Dict[str, Any],
+    prompt_hash: str,
+    query: str,
+    generated_answer: str,
+    expected_answer: Optional[str],
+) -> str:
+    """
+    Get the content-addressed key of a judge result.
+
+    Args:
+        judge_params (Dict[str, Any]): The judge model and generation parameters.
+        prompt_hash (str): The hash of the judge prompt template.
+        query (str): The original query that was posed to the model.
+        generated_answer (str): The answer generated by the model.
+        expected_answer (Optional[str]): The expected answer.
+
+    Returns:
+        str: The SHA-256 hex digest of all the inputs of the judge.
+    """
+    content = json.dumps(
+        {
+            'judge_params': judge_params,
+            'prompt_hash': prompt_hash,
+            'query': query,
+            'generated_answer': generated_answer,
+            'expected_answer': expected_answer,
+        },
+        sort_keys=True,
+    )
+    return hash_text(content)
+
+
+class JudgeCache(SQLiteCache[Dict[str, Any]]):
+    """
+    Persistent cache of the judge results, stored as JSON in a `SQLiteCache`.
+
+    The results are keyed by the hash of all the inputs of the judge (see `get_judge_cache_key`),
+    so a re-evaluation only calls the judge for the rows whose model output, query, expected answer,
+    judge prompt or judge parameters changed. Hits and misses are counted until `reset_stats` is called.
+    """
+
+    def __init__(self, cache_path: str) -> None:
+        """
+        Args:
+            cache_path (str): The path of the SQLite database, created if it does not exist.
+        """
+        super().__init__(cache_path, 'judge_results', encode=json.dumps, decode=lambda value: dict(json.loads(value)))
+        self.cache_path = cache_path
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached judge result, counting the hit or miss.
+
+        Args:
+            key (str): The key of the judge result.
+
+        Returns:
+            Optional[Dict[str, Any]]: The judge result, or None if it is not cached.
+        """
+        result = super().get(key)
+        with self._stats_lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def reset_stats(self) -> None:
+        """Reset the hit and miss counts, e.g. at the start of an evaluation run."""
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the hit statistics since the last reset.
+
+        Returns:
+            Dict[str, Any]: The number of hits, misses and lookups, and the hit rate.
+        """
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'lookups': lookups,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0.0,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_judge_cache(cache_path: str) -> JudgeCache:
+    """
+    Get the judge cache of a database path, opened once and shared by all the judges of the process.
+
+    Args:
+        cache_path (str): The path of the SQLite database.
+
+    Returns:
+        JudgeCache: The shared judge cache.
+    """
+    return JudgeCache(cache_path)
@@ -1,6 +1,12 @@
+import asyncio
 import os
 import sys
+import time
+import weakref
+from functools import lru_cache
 
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
 from langchain_core.output_parsers import JsonOutputParser
 
 from utils.visual.env_utils import get_wandb_key
@@ -10,7 +16,7 @@ if wandb_api_key:
     import weave
 else:
     print('WANDB_API_KEY is not set. Weave initialization skipped.')
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from weave import Model
 from weave.flow.scorer import Scorer
@@ -21,9 +27,120 @@ repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
 sys.path.append(utils_dir)
 sys.path.append(repo_dir)
 
+from utils.eval.judge_cache import get_judge_cache, get_judge_cache_key, hash_text
 from utils.eval.prompts.judge_prompt import JUDGE_PROMPT
 from utils.model_wrappers.api_gateway import APIGateway
 
+DEFAULT_MAX_CONCURRENCY = 20
+
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+_concurrency_limiters: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def set_max_concurrency(max_concurrency: int) -> None:
+    """
+    Set the maximum number of model and judge calls in flight, shared by all the model configurations.
+
+    Args:
+        max_concurrency (int): The maximum number of concurrent calls.
+    """
+    global _max_concurrency
+    if max_concurrency <= 0:
+        raise ValueError(f'max_concurrency must be a positive number. Got {max_concurrency}')
+    _max_concurrency = max_concurrency
+    _concurrency_limiters.clear()
+
+
+def get_concurrency_limiter() -> asyncio.Semaphore:
+    """
+    Get the semaphore limiting the calls in flight on the running event loop.
+
+    Returns:
+        asyncio.Semaphore: The limiter shared by the judge and all the models evaluated on the loop.
+    """
+    loop = asyncio.get_running_loop()
+    limiter = _concurrency_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(_max_concurrency)
+        _concurrency_limiters[loop] = limiter
+    return limiter
+
+
+@lru_cache(maxsize=None)
+def get_chat_client(
+    model_type: str,
+    model_name: str,
+    max_tokens: int,
+    temperature: float,
+    top_k: Optional[int] = None,
+    top_p: Optional[float] = None,
+) -> BaseChatModel:
+    """
+    Get the chat client of a model configuration, created once and reused by all the rows of the evaluations.
+
+    Args:
+        model_type (str): The type of the model (e.g., 'sncloud').
+        model_name (str): The specific name of the model to be used.
+        max_tokens (int): Maximum number of tokens to generate.
+        temperature (float): Sampling temperature for the model.
+        top_k (Optional[int]): Number of top tokens to consider.
+        top_p (Optional[float]): Nucleus sampling parameter.
+
+    Returns:
+        BaseChatModel: The shared chat client.
+    """
+    return APIGateway.load_chat(
+        type=model_type,
+        model=model_name,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_k=top_k,
+        top_p=top_p,
+        stream_options={'include_usage': True},
+    )
+
+
+async def ainvoke_with_metrics(client: BaseChatModel, messages: List[Tuple[str, str]]) -> Tuple[AIMessage, float]:
+    """
+    Call a chat client natively async, within the shared concurrency limit.
+
+    Args:
+        client (BaseChatModel): The chat client.
+        messages (List[Tuple[str, str]]): The (role, content) messages.
+
+    Returns:
+        Tuple[AIMessage, float]: The response and the latency of the call in seconds, not counting the time waiting
+        for the concurrency limiter.
+    """
+    async with get_concurrency_limiter():
+        start_time = time.perf_counter()
+        response = await client.ainvoke(messages)
+        return response, time.perf_counter() - start_time
+
+
+def get_usage(response: AIMessage) -> Dict[str, Any]:
+    """
+    Get the token usage of a chat response, with the `prompt_tokens`, `completion_tokens` and `total_tokens` keys.
+
+    Args:
+        response (AIMessage): The chat response.
+
+    Returns:
+        Dict[str, Any]: The usage reported by the API, or the LangChain usage metadata if the API reported none.
+    """
+    usage = response.response_metadata.get('usage')
+    if usage:
+        return dict(usage)
+    if response.usage_metadata:
+        return {
+            'prompt_tokens': response.usage_metadata['input_tokens'],
+            'completion_tokens': response.usage_metadata['output_tokens'],
+            'total_tokens': response.usage_metadata['total_tokens'],
+        }
+    return {}
+
 
 class CorrectnessLLMJudge(Scorer):
     """
@@ -43,6 +160,8 @@ class CorrectnessLLMJudge(Scorer):
         streaming (bool): Whether to use streaming (default is False).
         include_usage (Optional[bool]): Flag to include usage information (default is False).
         model_kwargs (Optional[Dict[str, Any]]): Additional model-specific parameters.
+        cache_path (Optional[str]): Path of the SQLite database caching the judge results (default is None,
+            for no cache).
     """
 
     model_type: str
@@ -54,6 +173,29 @@ class CorrectnessLLMJudge(Scorer):
     streaming: bool = False
     include_usage: Optional[bool] = False
     model_kwargs: Optional[Dict[str, Any]] = None
+    cache_path: Optional[str] = None
+
+    def get_cache_key(self, query: str, generated_answer: str, expected_answer: Optional[str]) -> str:
+        """
+        Get the key of a judge result, from the judge model, its parameters, its prompt and the judged row.
+
+        Args:
+            query (str): The original query that was posed to the model.
+            generated_answer (str): The answer generated by the model.
+            expected_answer (Optional[str]): The expected answer for comparison (if available).
+
+        Returns:
+            str: The key of the judge result in the judge cache.
+        """
+        judge_params = {
+            'model_type': self.model_type,
+            'model_name': self.model_name,
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+            'top_k': self.top_k,
+            'top_p': self.top_p,
+        }
+        return get_judge_cache_key(judge_params, hash_text(JUDGE_PROMPT), query, generated_answer, expected_answer)
 
     @weave.op()
     async def score(
@@ -64,6 +206,7 @@ class CorrectnessLLMJudge(Scorer):
 
         This method generates a prompt based on the query and the model's generated answer,
         then invokes the judge model to evaluate the quality of the generated answer.
+        With a `cache_path`, the judge model is only invoked for the rows it has not judged yet.
 
         Args:
             model_output (Dict[str, Any]): The output from the model containing the generated answer.
@@ -72,7 +215,8 @@ class CorrectnessLLMJudge(Scorer):
 
         Returns:
             Dict[str, Any]: A dictionary containing the score and any additional information,
-            such as the reason for the score.
+            such as the reason for the score, the latency and total tokens of the judge call,
+            and whether the result was cached.
 
         Raises:
             Exception: If there is an error during the invocation of the judge model.
@@ -85,28 +229,33 @@ class CorrectnessLLMJudge(Scorer):
             query=query, generated_answer=generated_answer, expected_answer=expected_answer
         )
 
-        llm = APIGateway.load_chat(
-            type=self.model_type,
-            model=self.model_name,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            top_k=self.top_k,
-            top_p=self.top_p,
-            stream_options={'include_usage': True},
-        )
-
-        # fix_parser = OutputFixingParser.from_llm(parser=JsonOutputParser(), llm=llm)
-
-        judge = (
-            llm | JsonOutputParser()
-            # | RunnableLambda(lambda x: fix_parser.parse(x))
-        )
-
-        try:
-            result = judge.invoke([('system', judge_prompt)])
-        except Exception as e:
-            return {'score': -1, 'reason': f'Completion not completed:\n{e}'}
-
+        judge_cache = get_judge_cache(self.cache_path) if self.cache_path is not None else None
+        cache_key = self.get_cache_key(query, generated_answer, expected_answer)
+        cached_result = judge_cache.get(cache_key) if judge_cache is not None else None
+
+        if cached_result is not None:
+            result = cached_result
+            result['judge_latency'] = 0.0
+            result['judge_total_tokens'] = 0
+        else:
+            llm = get_chat_client(
+                self.model_type, self.model_name, self.max_tokens, self.temperature, self.top_k, self.top_p
+            )
+
+            # fix_parser = OutputFixingParser.from_llm(parser=JsonOutputParser(), llm=llm)
+
+            try:
+                response, latency = await ainvoke_with_metrics(llm, [('system', judge_prompt)])
+                result = JsonOutputParser().invoke(response)
+            except Exception as e:
+                return {'score': -1, 'reason': f'Completion not completed:\n{e}'}
+
+            if judge_cache is not None and isinstance(result, dict):
+                judge_cache.put(cache_key, result)
+            result['judge_latency'] = latency
+            result['judge_total_tokens'] = get_usage(response).get('total_tokens')
+
+        result['judge_cached'] = cached_result is not None
         if 'usage' in model_output and self.include_usage:
             result.update(model_output['usage'])
         return result
@@ -147,7 +296,7 @@ class WeaveChatModel(Model):
         """
         Generate a response for a given query and system message.
 
-        This method invokes the chat model to produce a response based on the
+        This method invokes the chat model asynchronously to produce a response based on the
         provided query and system message. It handles any exceptions and
         returns the generated output along with usage metadata.
 
@@ -156,20 +305,14 @@ class WeaveChatModel(Model):
             system_message (str): The system message providing context for the model.
 
         Returns:
-            Dict[str, Any]: A dictionary containing the generated completion and
-            any usage information.
+            Dict[str, Any]: A dictionary containing the generated completion,
+            any usage information and the latency of the call in seconds.
 
         Raises:
             Exception: If there is an error during the invocation of the model.
         """
-        client = APIGateway.load_chat(
-            type=self.model_type,
-            model=self.model_name,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            top_k=self.top_k,
-            top_p=self.top_p,
-            stream_options={'include_usage': True},
+        client = get_chat_client(
+            self.model_type, self.model_name, self.max_tokens, self.temperature, self.top_k, self.top_p
         )
 
         try:
@@ -178,10 +321,11 @@ class WeaveChatModel(Model):
                 ('user', query),
             ]
 
-            response = client.invoke(messages)
+            response, latency = await ainvoke_with_metrics(client, messages)
             completion = response.content.strip()
-            usage = response.response_metadata.get('usage', None)
+            usage = get_usage(response)
         except Exception as e:
             completion = f'<Error>: {type(e).__name__} - {str(e)}'
             usage = {}
-        return {'completion': completion, 'usage': usage}
+            latency = None
+        return {'completion': completion, 'usage': usage, 'latency': latency}
@@ -14,6 +14,7 @@ repo_dir = os.path.abspath(os.path.join(utils_dir, '..'))
 sys.path.append(utils_dir)
 sys.path.append(repo_dir)
 
+from utils.model_wrappers.embedding_cache import CachedEmbeddings
 from utils.model_wrappers.langchain_chat_models import ChatSambaNovaCloud, ChatSambaStudio
 from utils.model_wrappers.langchain_embeddings import SambaStudioEmbeddings
 from utils.model_wrappers.langchain_llms import SambaNovaCloud, SambaStudio
@@ -44,6 +45,9 @@ class APIGateway:
         sambastudio_embeddings_project_id: Optional[str] = None,
         sambastudio_embeddings_endpoint_id: Optional[str] = None,
         sambastudio_embeddings_api_key: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 1_000_000,
     ) -> Embeddings:
         """Loads a langchain embedding model given a type and parameters
         Args:
@@ -57,6 +61,11 @@ class APIGateway:
             sambastudio_embeddings_project_id (str, optional): project id for sambastudio model. Defaults to None.
             sambastudio_embeddings_endpoint_id (str, optional): endpoint id for sambastudio model. Defaults to None.
             sambastudio_embeddings_api_key (str, optional): api key for sambastudio model. Defaults to None.
+            max_concurrency (int, optional): number of batches sent concurrently to the sambastudio model.
+                Defaults to None, sending one batch at a time.
+            cache_dir (str, optional): directory of a persistent cache of document embeddings, so identical chunks
+                are only embedded once. Defaults to None, no cache.
+            cache_max_entries (int): maximum number of cached embeddings, least recently used ones are evicted.
         Returns:
             langchain embedding model
         """
@@ -70,17 +79,22 @@ class APIGateway:
                 'sambastudio_embeddings_api_key': sambastudio_embeddings_api_key,
             }
             envs = {k: v for k, v in envs.items() if v is not None}
+            if max_concurrency is None:
+                max_concurrency = 1
 
             if bundle:
                 if batch_size is None:
                     batch_size = 1
                 embeddings = SambaStudioEmbeddings(
-                    **envs, batch_size=batch_size, model_kwargs={'select_expert': select_expert}
+                    **envs,
+                    batch_size=batch_size,
+                    max_concurrency=max_concurrency,
+                    model_kwargs={'select_expert': select_expert},
                 )
             else:
                 if batch_size is None:
                     batch_size = 32
-                embeddings = SambaStudioEmbeddings(**envs, batch_size=batch_size)
+                embeddings = SambaStudioEmbeddings(**envs, batch_size=batch_size, max_concurrency=max_concurrency)
         elif type == 'cpu':
             encode_kwargs = {'normalize_embeddings': NORMALIZE_EMBEDDINGS}
             embedding_model = EMBEDDING_MODEL
@@ -93,6 +107,9 @@ class APIGateway:
         else:
             raise ValueError(f'{type} is not a valid embedding model type')
 
+        if cache_dir is not None:
+            embeddings = CachedEmbeddings(embeddings, cache_dir=cache_dir, max_entries=cache_max_entries)
+
         return embeddings
 
     @staticmethod
@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import os
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from utils.sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+
+def get_embeddings_model_id(embeddings: Embeddings) -> str:
+    """Gets an id identifying the model behind an embeddings client, so caches of different models never mix
+
+    Args:
+        embeddings (Embeddings): langchain embeddings client
+
+    Returns:
+        str: model id made of the client class and its model, endpoint and expert when available
+    """
+    parts = [type(embeddings).__name__]
+    for attribute in [
+        'model_name',
+        'model',
+        'sambastudio_embeddings_base_url',
+        'sambastudio_embeddings_project_id',
+        'sambastudio_embeddings_endpoint_id',
+        'embed_instruction',
+    ]:
+        value = getattr(embeddings, attribute, None)
+        if value:
+            parts.append(str(value))
+    select_expert = (getattr(embeddings, 'model_kwargs', None) or {}).get('select_expert')
+    if select_expert:
+        parts.append(str(select_expert))
+    return '|'.join(parts)
+
+
+class EmbeddingCache(SQLiteCache[List[float]]):
+    """Disk backed cache of embedding vectors keyed by model id and normalized text hash.
+
+    Vectors are stored as float32 blobs in a `SQLiteCache`, so the cache is safe to share between threads and
+    processes, and the least recently used vectors are evicted once the cache holds more than `max_entries` of them.
+    """
+
+    DB_FILENAME = 'embedding_cache.sqlite'
+
+    def __init__(self, cache_dir: str, max_entries: int = 1_000_000) -> None:
+        """
+        Args:
+            cache_dir (str): directory where the cache database is stored
+            max_entries (int): maximum number of cached vectors
+        """
+        super().__init__(
+            os.path.join(cache_dir, self.DB_FILENAME),
+            'embeddings',
+            encode=lambda vector: array('f', vector).tobytes(),
+            decode=lambda blob: array('f', blob).tolist(),
+            value_type='BLOB',
+            max_entries=max_entries,
+        )
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        """Gets the cache key of a text, hashing it after normalizing its unicode form and surrounding whitespace"""
+        normalized_text = unicodedata.normalize('NFC', text).strip()
+        text_hash = hashlib.sha256(normalized_text.encode('utf-8')).hexdigest()
+        return f'{model_id}|{text_hash}'
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps any langchain embeddings client with a persistent `EmbeddingCache`, so identical chunks are only
+    embedded once across runs. Only the cache misses of each call are sent to the wrapped client, in a single batch.
+    Queries are not cached since some models embed them differently from documents.
+
+    Example:
+        .. code-block:: python
+
+            embeddings = CachedEmbeddings(APIGateway.load_embedding_model(type='cpu'), cache_dir='data/embeddings')
+            vectors = embeddings.embed_documents(texts)
+            print(embeddings.hit_rate)
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_dir: str,
+        max_entries: int = 1_000_000,
+        model_id: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            embeddings (Embeddings): wrapped embeddings client
+            cache_dir (str): directory where the cache database is stored
+            max_entries (int): maximum number of cached vectors
+            model_id (str, optional): id of the model in the cache keys. Defaults to one derived from the client.
+        """
+        self.embeddings = embeddings
+        self.cache = EmbeddingCache(cache_dir, max_entries)
+        self.model_id = model_id or get_embeddings_model_id(embeddings)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the embedded documents found in the cache since the client was created"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], List[str]]:
+        """Gets the keys of the texts, their cached vectors, and the unique texts missing from the cache, updating the
+        hit statistics"""
+        keys = [self.cache.make_key(self.model_id, text) for text in texts]
+        cached_vectors = self.cache.get_many(keys)
+        missing_texts = list({key: text for key, text in zip(keys, texts) if key not in cached_vectors}.values())
+
+        num_hits = sum(key in cached_vectors for key in keys)
+        self.hits += num_hits
+        self.misses += len(keys) - num_hits
+        logger.info(
+            f'Embedding cache: {num_hits}/{len(keys)} hits, {len(missing_texts)} texts to embed, '
+            f'hit rate {self.hit_rate:.1%}'
+        )
+        return keys, cached_vectors, missing_texts
+
+    def _to_cache_items(self, texts: List[str], vectors: List[List[float]]) -> List[Tuple[str, List[float]]]:
+        # vectors are rounded to float32 like the cached ones, so results don't depend on the state of the cache
+        return [(self.cache.make_key(self.model_id, text), array('f', v).tolist()) for text, v in zip(texts, vectors)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Returns the embeddings of the given texts, embedding only the ones missing from the cache.
+        Args:
+            texts (`List[str]`): List of texts to encode
+
+        Returns:
+            `List[List[float]]`: List of embeddings for the given texts
+        """
+        keys, vectors, missing_texts = self._lookup(texts)
+        if missing_texts:
+            new_vectors = self.embeddings.embed_documents(missing_texts)
+            new_items = self._to_cache_items(missing_texts, new_vectors)
+            self.cache.put_many(new_items)
+            vectors.update(new_items)
+        return [vectors[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async version of `embed_documents`"""
+        keys, vectors, missing_texts = self._lookup(texts)
+        if missing_texts:
+            new_vectors = await self.embeddings.aembed_documents(missing_texts)
+            new_items = self._to_cache_items(missing_texts, new_vectors)
+            self.cache.put_many(new_items)
+            vectors.update(new_items)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import weakref
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+import httpx
+
+# Read timeout is disabled because long generations may take minutes
+HTTP_TIMEOUT = httpx.Timeout(60.0, read=None)
+HTTP_LIMITS = httpx.Limits(max_connections=256, max_keepalive_connections=64)
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+# async clients are bound to the event loop their connections were opened in, so there is one per loop
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.Client:
+    """Gets the HTTP client shared by all the model wrappers of the process, which keeps connections open between
+    calls
+
+    Returns:
+        httpx.Client: shared HTTP client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Gets the async HTTP client shared by all the model wrappers running in the current event loop
+
+    Returns:
+        httpx.AsyncClient: shared async HTTP client
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
+
+class SSEEventParser:
+    """Incremental parser of server-sent events, fed one line at a time"""
+
+    def __init__(self) -> None:
+        self.event = 'message'
+        self.data: List[str] = []
+
+    def feed(self, line: str) -> Optional[Tuple[str, str]]:
+        """Parses a line of the stream
+
+        Args:
+            line (str): line without its line break
+
+        Returns:
+            tuple: event type and data when the line completes an event, else None
+        """
+        if not line:
+            if not self.data:
+                self.event = 'message'
+                return None
+            event = (self.event, '\n'.join(self.data))
+            self.event = 'message'
+            self.data = []
+            return event
+        if line.startswith(':'):
+            return None
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            self.event = value
+        elif field == 'data':
+            self.data.append(value)
+        return None
+
+    def flush(self) -> Optional[Tuple[str, str]]:
+        """Gets the last event of a stream that did not end with a blank line"""
+        return self.feed('')
+
+
+def iter_sse_events(lines: Iterator[str]) -> Iterator[Tuple[str, str]]:
+    """Yields the event type and data of each server-sent event as soon as its lines are received"""
+    parser = SSEEventParser()
+    for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            yield event
+    event = parser.flush()
+    if event is not None:
+        yield event
+
+
+async def aiter_sse_events(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[str, str]]:
+    """Async version of `iter_sse_events`"""
+    parser = SSEEventParser()
+    async for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            yield event
+    event = parser.flush()
+    if event is not None:
+        yield event
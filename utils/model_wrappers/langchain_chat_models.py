@@ -2,6 +2,7 @@ import json
 from operator import itemgetter
 from typing import (
     Any,
+    AsyncIterator,
     Callable,
     Dict,
     Iterator,
@@ -15,13 +16,15 @@ from typing import (
     cast,
 )
 
-import requests
+import httpx
 from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
     CallbackManagerForLLMRun,
 )
 from langchain_core.language_models import LanguageModelInput
 from langchain_core.language_models.chat_models import (
     BaseChatModel,
+    agenerate_from_stream,
     generate_from_stream,
 )
 from langchain_core.messages import (
@@ -52,7 +55,8 @@ from langchain_core.utils import convert_to_secret_str, get_from_dict_or_env
 from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_core.utils.pydantic import is_basemodel_subclass
 from pydantic import BaseModel, Field, SecretStr
-from requests import Response
+
+from utils.model_wrappers.http_clients import aiter_sse_events, get_async_http_client, get_http_client, iter_sse_events
 
 
 def _convert_message_to_dict(message: BaseMessage) -> Dict[str, Any]:
@@ -665,15 +669,15 @@ class ChatSambaNovaCloud(BaseChatModel):
         else:
             return llm | output_parser
 
-    def _handle_request(
+    def _build_request(
         self,
         messages_dicts: List[Dict[str, Any]],
         stop: Optional[List[str]] = None,
         streaming: bool = False,
         **kwargs: Any,
-    ) -> Response:
+    ) -> httpx.Request:
         """
-        Performs a post request to the LLM API.
+        Builds the post request to the LLM API.
 
         Args:
             messages_dicts: List of role / content dicts to use as input.
@@ -681,7 +685,7 @@ class ChatSambaNovaCloud(BaseChatModel):
             streaming: wether to do a streaming call
 
         Returns:
-            An iterator of response dicts.
+            An httpx Request object
         """
         if streaming:
             data = {
@@ -707,8 +711,8 @@ class ChatSambaNovaCloud(BaseChatModel):
                 'top_k': self.top_k,
                 **kwargs,
             }
-        http_session = requests.Session()
-        response = http_session.post(
+        return httpx.Request(
+            'POST',
             self.sambanova_url,
             headers={
                 'Authorization': f'Bearer {self.sambanova_api_key.get_secret_value()}',
@@ -716,21 +720,65 @@ class ChatSambaNovaCloud(BaseChatModel):
                 **self.additional_headers,
             },
             json=data,
-            stream=streaming,
         )
+
+    def _raise_for_status(self, response: httpx.Response) -> None:
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.',
                 f'{response.text}.',
             )
+
+    def _handle_request(
+        self,
+        messages_dicts: List[Dict[str, Any]],
+        stop: Optional[List[str]] = None,
+        streaming: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Performs a post request to the LLM API, over the HTTP client shared by the process.
+
+        Args:
+            messages_dicts: List of role / content dicts to use as input.
+            stop: list of stop tokens
+            streaming: wether to do a streaming call
+
+        Returns:
+            An httpx Response object, to be closed by the caller when streaming
+        """
+        request = self._build_request(messages_dicts, stop, streaming, **kwargs)
+        response = get_http_client().send(request, stream=streaming)
+        if response.status_code != 200:
+            response.read()
+            response.close()
+        self._raise_for_status(response)
         return response
 
-    def _process_response(self, response: Response) -> AIMessage:
+    async def _ahandle_request(
+        self,
+        messages_dicts: List[Dict[str, Any]],
+        stop: Optional[List[str]] = None,
+        streaming: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Async version of `_handle_request`, over the async HTTP client shared by the event loop.
+        """
+        request = self._build_request(messages_dicts, stop, streaming, **kwargs)
+        response = await get_async_http_client().send(request, stream=streaming)
+        if response.status_code != 200:
+            await response.aread()
+            await response.aclose()
+        self._raise_for_status(response)
+        return response
+
+    def _process_response(self, response: httpx.Response) -> AIMessage:
         """
         Process a non streaming response from the api
 
         Args:
-            response: A request Response object
+            response: An httpx Response object
 
         Returns
             generation: an AIMessage with model generation
@@ -778,72 +826,84 @@ class ChatSambaNovaCloud(BaseChatModel):
         )
         return message
 
-    def _process_stream_response(self, response: Response) -> Iterator[BaseMessageChunk]:
+    def _process_stream_event(
+        self, event: str, event_data: str, status_code: int, state: Dict[str, Any]
+    ) -> Optional[AIMessageChunk]:
         """
-        Process a streaming response from the api
+        Process a server-sent event of a streaming response from the api
 
         Args:
-            response: An iterable request Response object
+            event: event type
+            event_data: event data
+            status_code: status code of the response
+            state: dict kept between the events of a response
 
-        Yields:
-            generation: an AIMessageChunk with model partial generation
+        Returns:
+            generation: an AIMessageChunk with model partial generation, or None for the final event
         """
-        try:
-            import sseclient
-        except ImportError:
-            raise ImportError('could not import sseclient library' 'Please install it with `pip install sseclient-py`.')
+        if event == 'error_event':
+            raise RuntimeError(f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.')
 
-        client = sseclient.SSEClient(response)
-
-        for event in client.events():
-            if event.event == 'error_event':
+        try:
+            # check if the response is a final event
+            # in that case event data response is '[DONE]'
+            if event_data == '[DONE]':
+                return None
+            data = json.loads(event_data)
+            if data.get('error'):
                 raise RuntimeError(
-                    f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{event.data}.'
+                    f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.'
+                )
+            if len(data['choices']) > 0:
+                state['finish_reason'] = data['choices'][0].get('finish_reason')
+                content = data['choices'][0]['delta']['content']
+                id = data['id']
+                return AIMessageChunk(content=content, id=id, additional_kwargs={})
+            else:
+                content = ''
+                id = data['id']
+                metadata = {
+                    'finish_reason': state.get('finish_reason'),
+                    'usage': data.get('usage'),
+                    'model_name': data['model'],
+                    'system_fingerprint': data['system_fingerprint'],
+                    'created': data['created'],
+                }
+                return AIMessageChunk(
+                    content=content,
+                    id=id,
+                    response_metadata=metadata,
+                    additional_kwargs={},
                 )
 
-            try:
-                # check if the response is a final event
-                # in that case event data response is '[DONE]'
-                if event.data != '[DONE]':
-                    if isinstance(event.data, str):
-                        data = json.loads(event.data)
-                    else:
-                        raise RuntimeError(
-                            f'Sambanova /complete call failed with status code '
-                            f'{response.status_code}.'
-                            f'{event.data}.'
-                        )
-                    if data.get('error'):
-                        raise RuntimeError(
-                            f'Sambanova /complete call failed with status code '
-                            f'{response.status_code}.'
-                            f'{event.data}.'
-                        )
-                    if len(data['choices']) > 0:
-                        finish_reason = data['choices'][0].get('finish_reason')
-                        content = data['choices'][0]['delta']['content']
-                        id = data['id']
-                        chunk = AIMessageChunk(content=content, id=id, additional_kwargs={})
-                    else:
-                        content = ''
-                        id = data['id']
-                        metadata = {
-                            'finish_reason': finish_reason,
-                            'usage': data.get('usage'),
-                            'model_name': data['model'],
-                            'system_fingerprint': data['system_fingerprint'],
-                            'created': data['created'],
-                        }
-                        chunk = AIMessageChunk(
-                            content=content,
-                            id=id,
-                            response_metadata=metadata,
-                            additional_kwargs={},
-                        )
-                    yield chunk
+        except Exception as e:
+            raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event_data}')
+
+    def _process_stream_response(self, response: httpx.Response) -> Iterator[BaseMessageChunk]:
+        """
+        Process a streaming response from the api, parsing the events as their lines arrive
+
+        Args:
+            response: A streaming httpx Response object
 
-            except Exception as e:
-                raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event.data}')
+        Yields:
+            generation: an AIMessageChunk with model partial generation
+        """
+        state: Dict[str, Any] = {}
+        for event, event_data in iter_sse_events(response.iter_lines()):
+            chunk = self._process_stream_event(event, event_data, response.status_code, state)
+            if chunk is not None:
+                yield chunk
+
+    async def _aprocess_stream_response(self, response: httpx.Response) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Async version of `_process_stream_response`
+        """
+        state: Dict[str, Any] = {}
+        async for event, event_data in aiter_sse_events(response.aiter_lines()):
+            chunk = self._process_stream_event(event, event_data, response.status_code, state)
+            if chunk is not None:
+                yield chunk
 
     def _generate(
         self,
@@ -881,6 +941,28 @@ class ChatSambaNovaCloud(BaseChatModel):
         )
         return ChatResult(generations=[generation])
 
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """
+        Async call to SambaNovaCloud models, see `_generate`.
+        """
+        if self.streaming:
+            stream_iter = self._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return await agenerate_from_stream(stream_iter)
+        messages_dicts = _create_message_dicts(messages)
+        response = await self._ahandle_request(messages_dicts, stop, streaming=False, **kwargs)
+        message = self._process_response(response)
+        generation = ChatGeneration(
+            message=message,
+            generation_info={'finish_reason': message.response_metadata['finish_reason']},
+        )
+        return ChatResult(generations=[generation])
+
     def _stream(
         self,
         messages: List[BaseMessage],
@@ -906,11 +988,35 @@ class ChatSambaNovaCloud(BaseChatModel):
         """
         messages_dicts = _create_message_dicts(messages)
         response = self._handle_request(messages_dicts, stop, streaming=True, **kwargs)
-        for ai_message_chunk in self._process_stream_response(response):
-            chunk = ChatGenerationChunk(message=ai_message_chunk)
-            if run_manager:
-                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
-            yield chunk
+        try:
+            for ai_message_chunk in self._process_stream_response(response):
+                chunk = ChatGenerationChunk(message=ai_message_chunk)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            response.close()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """
+        Async stream of the output of the SambaNovaCloud chat model, see `_stream`.
+        """
+        messages_dicts = _create_message_dicts(messages)
+        response = await self._ahandle_request(messages_dicts, stop, streaming=True, **kwargs)
+        try:
+            async for ai_message_chunk in self._aprocess_stream_response(response):
+                chunk = ChatGenerationChunk(message=ai_message_chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            await response.aclose()
 
 
 class ChatSambaStudio(BaseChatModel):
@@ -1645,15 +1751,15 @@ class ChatSambaStudio(BaseChatModel):
                     raise ValueError('Unsupported URL')
         return base_url, stream_url
 
-    def _handle_request(
+    def _build_request(
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
         streaming: Optional[bool] = False,
         **kwargs: Any,
-    ) -> Response:
+    ) -> httpx.Request:
         """
-        Performs a post request to the LLM API.
+        Builds the post request to the LLM API.
 
         Args:
         messages_dicts: List of role / content dicts to use as input.
@@ -1661,7 +1767,7 @@ class ChatSambaStudio(BaseChatModel):
         streaming: wether to do a streaming call
 
         Returns:
-            A request Response object
+            An httpx Request object
         """
 
         # create request payload for openai compatible API
@@ -1744,23 +1850,64 @@ class ChatSambaStudio(BaseChatModel):
                 f'Unsupported URL{self.sambastudio_url}' 'only openai, generic v1 and generic v2 APIs are supported'
             )
 
-        http_session = requests.Session()
-        if streaming:
-            response = http_session.post(self.streaming_url, headers=headers, json=data, stream=True)
-        else:
-            response = http_session.post(self.base_url, headers=headers, json=data, stream=False)
+        return httpx.Request('POST', self.streaming_url if streaming else self.base_url, headers=headers, json=data)
+
+    def _raise_for_status(self, response: httpx.Response) -> None:
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{response.text}.'
             )
+
+    def _handle_request(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        streaming: Optional[bool] = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Performs a post request to the LLM API, over the HTTP client shared by the process.
+
+        Args:
+        messages_dicts: List of role / content dicts to use as input.
+        stop: list of stop tokens
+        streaming: wether to do a streaming call
+
+        Returns:
+            An httpx Response object, to be closed by the caller when streaming
+        """
+        request = self._build_request(messages, stop, streaming, **kwargs)
+        response = get_http_client().send(request, stream=bool(streaming))
+        if response.status_code != 200:
+            response.read()
+            response.close()
+        self._raise_for_status(response)
+        return response
+
+    async def _ahandle_request(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        streaming: Optional[bool] = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Async version of `_handle_request`, over the async HTTP client shared by the event loop.
+        """
+        request = self._build_request(messages, stop, streaming, **kwargs)
+        response = await get_async_http_client().send(request, stream=bool(streaming))
+        if response.status_code != 200:
+            await response.aread()
+            await response.aclose()
+        self._raise_for_status(response)
         return response
 
-    def _process_response(self, response: Response) -> AIMessage:
+    def _process_response(self, response: httpx.Response) -> AIMessage:
         """
         Process a non streaming response from the api
 
         Args:
-            response: A request Response object
+            response: An httpx Response object
 
         Returns
             generation: an AIMessage with model generation
@@ -1842,160 +1989,190 @@ class ChatSambaStudio(BaseChatModel):
             id=id,
         )
 
-    def _process_stream_response(self, response: Response) -> Iterator[BaseMessageChunk]:
+    def _process_stream_event(
+        self, event: str, event_data: str, status_code: int, state: Dict[str, Any]
+    ) -> Optional[AIMessageChunk]:
         """
-        Process a streaming response from the api
+        Process a server-sent event of a streaming response from the openai compatible api
 
         Args:
-            response: An iterable request Response object
+            event: event type
+            event_data: event data
+            status_code: status code of the response
+            state: dict kept between the events of a response
 
-        Yields:
-            generation: an AIMessageChunk with model partial generation
+        Returns:
+            generation: an AIMessageChunk with model partial generation, or None for the final event
         """
+        if event == 'error_event':
+            raise RuntimeError(f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.')
+        try:
+            # check if the response is not a final event ("[DONE]")
+            if event_data == '[DONE]':
+                return None
+            data = json.loads(event_data)
+            if data.get('error'):
+                raise RuntimeError(
+                    f'Sambanova /complete call failed with status code ' f'{status_code}.' f'{event_data}.'
+                )
+            if len(data['choices']) > 0:
+                state['finish_reason'] = data['choices'][0].get('finish_reason')
+                content = data['choices'][0]['delta']['content']
+                id = data['id']
+                metadata = {}
+            else:
+                content = ''
+                id = data['id']
+                metadata = {
+                    'finish_reason': state.get('finish_reason', ''),
+                    'usage': data.get('usage'),
+                    'model_name': data['model'],
+                    'system_fingerprint': data['system_fingerprint'],
+                    'created': data['created'],
+                }
+            if data.get('usage') is not None:
+                content = ''
+                id = data['id']
+                metadata = {
+                    'finish_reason': state.get('finish_reason', ''),
+                    'usage': data.get('usage'),
+                    'model_name': data['model'],
+                    'system_fingerprint': data['system_fingerprint'],
+                    'created': data['created'],
+                }
+            return AIMessageChunk(
+                content=content,
+                id=id,
+                response_metadata=metadata,
+                additional_kwargs={},
+            )
 
+        except Exception as e:
+            raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event_data}')
+
+    def _process_stream_line(self, line: str) -> AIMessageChunk:
+        """
+        Process a JSON line of a streaming response from the generic v1 or v2 api
+
+        Args:
+            line: JSON line of the response
+
+        Returns:
+            generation: an AIMessageChunk with model partial generation
+        """
         try:
-            import sseclient
-        except ImportError:
-            raise ImportError('could not import sseclient library' 'Please install it with `pip install sseclient-py`.')
+            data = json.loads(line)
+            # process response payload for generic v2 API
+            if 'api/v2/predict/generic' in self.sambastudio_url:
+                content = data['result']['items'][0]['value']['stream_token']
+                id = data['result']['items'][0]['id']
+                if data['result']['items'][0]['value']['is_last_response']:
+                    metadata = {
+                        'finish_reason': data['result']['items'][0]['value'].get('stop_reason'),
+                        'prompt': data['result']['items'][0]['value'].get('prompt'),
+                        'usage': {
+                            'prompt_tokens_count': data['result']['items'][0]['value'].get('prompt_tokens_count'),
+                            'completion_tokens_count': data['result']['items'][0]['value'].get(
+                                'completion_tokens_count'
+                            ),
+                            'total_tokens_count': data['result']['items'][0]['value'].get('total_tokens_count'),
+                            'start_time': data['result']['items'][0]['value'].get('start_time'),
+                            'end_time': data['result']['items'][0]['value'].get('end_time'),
+                            'model_execution_time': data['result']['items'][0]['value'].get('model_execution_time'),
+                            'time_to_first_token': data['result']['items'][0]['value'].get('time_to_first_token'),
+                            'throughput_after_first_token': data['result']['items'][0]['value'].get(
+                                'throughput_after_first_token'
+                            ),
+                            'batch_size_used': data['result']['items'][0]['value'].get('batch_size_used'),
+                        },
+                    }
+                else:
+                    metadata = {}
+                return AIMessageChunk(
+                    content=content,
+                    id=id,
+                    response_metadata=metadata,
+                    additional_kwargs={},
+                )
+
+            # process response payload for generic v1 API
+            else:
+                content = data['result']['responses'][0]['stream_token']
+                id = None
+                if data['result']['responses'][0]['is_last_response']:
+                    metadata = {
+                        'finish_reason': data['result']['responses'][0].get('stop_reason'),
+                        'prompt': data['result']['responses'][0].get('prompt'),
+                        'usage': {
+                            'prompt_tokens_count': data['result']['responses'][0].get('prompt_tokens_count'),
+                            'completion_tokens_count': data['result']['responses'][0].get('completion_tokens_count'),
+                            'total_tokens_count': data['result']['responses'][0].get('total_tokens_count'),
+                            'start_time': data['result']['responses'][0].get('start_time'),
+                            'end_time': data['result']['responses'][0].get('end_time'),
+                            'model_execution_time': data['result']['responses'][0].get('model_execution_time'),
+                            'time_to_first_token': data['result']['responses'][0].get('time_to_first_token'),
+                            'throughput_after_first_token': data['result']['responses'][0].get(
+                                'throughput_after_first_token'
+                            ),
+                            'batch_size_used': data['result']['responses'][0].get('batch_size_used'),
+                        },
+                    }
+                else:
+                    metadata = {}
+                return AIMessageChunk(
+                    content=content,
+                    id=id,
+                    response_metadata=metadata,
+                    additional_kwargs={},
+                )
+
+        except Exception as e:
+            raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+
+    def _process_stream_response(self, response: httpx.Response) -> Iterator[BaseMessageChunk]:
+        """
+        Process a streaming response from the api, parsing the events or lines as they arrive
+
+        Args:
+            response: A streaming httpx Response object
 
+        Yields:
+            generation: an AIMessageChunk with model partial generation
+        """
         # process response payload for openai compatible API
         if 'chat/completions' in self.sambastudio_url:
-            finish_reason = ''
-            client = sseclient.SSEClient(response)
-            for event in client.events():
-                if event.event == 'error_event':
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code ' f'{response.status_code}.' f'{event.data}.'
-                    )
-                try:
-                    # check if the response is not a final event ("[DONE]")
-                    if event.data != '[DONE]':
-                        if isinstance(event.data, str):
-                            data = json.loads(event.data)
-                        else:
-                            raise RuntimeError(
-                                f'Sambanova /complete call failed with status code '
-                                f'{response.status_code}.'
-                                f'{event.data}.'
-                            )
-                        if data.get('error'):
-                            raise RuntimeError(
-                                f'Sambanova /complete call failed with status code '
-                                f'{response.status_code}.'
-                                f'{event.data}.'
-                            )
-                        if len(data['choices']) > 0:
-                            finish_reason = data['choices'][0].get('finish_reason')
-                            content = data['choices'][0]['delta']['content']
-                            id = data['id']
-                            metadata = {}
-                        else:
-                            content = ''
-                            id = data['id']
-                            metadata = {
-                                'finish_reason': finish_reason,
-                                'usage': data.get('usage'),
-                                'model_name': data['model'],
-                                'system_fingerprint': data['system_fingerprint'],
-                                'created': data['created'],
-                            }
-                        if data.get('usage') is not None:
-                            content = ''
-                            id = data['id']
-                            metadata = {
-                                'finish_reason': finish_reason,
-                                'usage': data.get('usage'),
-                                'model_name': data['model'],
-                                'system_fingerprint': data['system_fingerprint'],
-                                'created': data['created'],
-                            }
-                        yield AIMessageChunk(
-                            content=content,
-                            id=id,
-                            response_metadata=metadata,
-                            additional_kwargs={},
-                        )
-
-                except Exception as e:
-                    raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'data: {event.data}')
+            state: Dict[str, Any] = {}
+            for event, event_data in iter_sse_events(response.iter_lines()):
+                chunk = self._process_stream_event(event, event_data, response.status_code, state)
+                if chunk is not None:
+                    yield chunk
 
-        # process response payload for generic v2 API
-        elif 'api/v2/predict/generic' in self.sambastudio_url:
+        # process response payload for generic v1 and v2 APIs
+        elif 'api/predict/generic' in self.sambastudio_url or 'api/v2/predict/generic' in self.sambastudio_url:
             for line in response.iter_lines():
-                try:
-                    data = json.loads(line)
-                    content = data['result']['items'][0]['value']['stream_token']
-                    id = data['result']['items'][0]['id']
-                    if data['result']['items'][0]['value']['is_last_response']:
-                        metadata = {
-                            'finish_reason': data['result']['items'][0]['value'].get('stop_reason'),
-                            'prompt': data['result']['items'][0]['value'].get('prompt'),
-                            'usage': {
-                                'prompt_tokens_count': data['result']['items'][0]['value'].get('prompt_tokens_count'),
-                                'completion_tokens_count': data['result']['items'][0]['value'].get(
-                                    'completion_tokens_count'
-                                ),
-                                'total_tokens_count': data['result']['items'][0]['value'].get('total_tokens_count'),
-                                'start_time': data['result']['items'][0]['value'].get('start_time'),
-                                'end_time': data['result']['items'][0]['value'].get('end_time'),
-                                'model_execution_time': data['result']['items'][0]['value'].get('model_execution_time'),
-                                'time_to_first_token': data['result']['items'][0]['value'].get('time_to_first_token'),
-                                'throughput_after_first_token': data['result']['items'][0]['value'].get(
-                                    'throughput_after_first_token'
-                                ),
-                                'batch_size_used': data['result']['items'][0]['value'].get('batch_size_used'),
-                            },
-                        }
-                    else:
-                        metadata = {}
-                    yield AIMessageChunk(
-                        content=content,
-                        id=id,
-                        response_metadata=metadata,
-                        additional_kwargs={},
-                    )
+                if line:
+                    yield self._process_stream_line(line)
 
-                except Exception as e:
-                    raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+        else:
+            raise ValueError(
+                f'Unsupported URL{self.sambastudio_url}' 'only openai, generic v1 and generic v2 APIs are supported'
+            )
 
-        # process response payload for generic v1 API
-        elif 'api/predict/generic' in self.sambastudio_url:
-            for line in response.iter_lines():
-                try:
-                    data = json.loads(line)
-                    content = data['result']['responses'][0]['stream_token']
-                    id = None
-                    if data['result']['responses'][0]['is_last_response']:
-                        metadata = {
-                            'finish_reason': data['result']['responses'][0].get('stop_reason'),
-                            'prompt': data['result']['responses'][0].get('prompt'),
-                            'usage': {
-                                'prompt_tokens_count': data['result']['responses'][0].get('prompt_tokens_count'),
-                                'completion_tokens_count': data['result']['responses'][0].get(
-                                    'completion_tokens_count'
-                                ),
-                                'total_tokens_count': data['result']['responses'][0].get('total_tokens_count'),
-                                'start_time': data['result']['responses'][0].get('start_time'),
-                                'end_time': data['result']['responses'][0].get('end_time'),
-                                'model_execution_time': data['result']['responses'][0].get('model_execution_time'),
-                                'time_to_first_token': data['result']['responses'][0].get('time_to_first_token'),
-                                'throughput_after_first_token': data['result']['responses'][0].get(
-                                    'throughput_after_first_token'
-                                ),
-                                'batch_size_used': data['result']['responses'][0].get('batch_size_used'),
-                            },
-                        }
-                    else:
-                        metadata = {}
-                    yield AIMessageChunk(
-                        content=content,
-                        id=id,
-                        response_metadata=metadata,
-                        additional_kwargs={},
-                    )
+    async def _aprocess_stream_response(self, response: httpx.Response) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Async version of `_process_stream_response`
+        """
+        if 'chat/completions' in self.sambastudio_url:
+            state: Dict[str, Any] = {}
+            async for event, event_data in aiter_sse_events(response.aiter_lines()):
+                chunk = self._process_stream_event(event, event_data, response.status_code, state)
+                if chunk is not None:
+                    yield chunk
 
-                except Exception as e:
-                    raise RuntimeError(f'Error getting content chunk raw streamed response: {e}' f'line: {line}')
+        elif 'api/predict/generic' in self.sambastudio_url or 'api/v2/predict/generic' in self.sambastudio_url:
+            async for line in response.aiter_lines():
+                if line:
+                    yield self._process_stream_line(line)
 
         else:
             raise ValueError(
@@ -2034,6 +2211,24 @@ class ChatSambaStudio(BaseChatModel):
         generation = ChatGeneration(message=message)
         return ChatResult(generations=[generation])
 
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """
+        Async call to SambaStudio models, see `_generate`.
+        """
+        if self.streaming:
+            stream_iter = self._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return await agenerate_from_stream(stream_iter)
+        response = await self._ahandle_request(messages, stop, streaming=False, **kwargs)
+        message = self._process_response(response)
+        generation = ChatGeneration(message=message)
+        return ChatResult(generations=[generation])
+
     def _stream(
         self,
         messages: List[BaseMessage],
@@ -2058,8 +2253,31 @@ class ChatSambaStudio(BaseChatModel):
             chunk: ChatGenerationChunk with model partial generation
         """
         response = self._handle_request(messages, stop, streaming=True, **kwargs)
-        for ai_message_chunk in self._process_stream_response(response):
-            chunk = ChatGenerationChunk(message=ai_message_chunk)
-            if run_manager:
-                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
-            yield chunk
+        try:
+            for ai_message_chunk in self._process_stream_response(response):
+                chunk = ChatGenerationChunk(message=ai_message_chunk)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            response.close()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """
+        Async stream of the output of the SambaStudio model, see `_stream`.
+        """
+        response = await self._ahandle_request(messages, stop, streaming=True, **kwargs)
+        try:
+            async for ai_message_chunk in self._aprocess_stream_response(response):
+                chunk = ChatGenerationChunk(message=ai_message_chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            await response.aclose()
@@ -1,11 +1,21 @@
+import asyncio
 import json
-from typing import Dict, Generator, List, Optional
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generator, List, Optional
 
+import httpx
 import requests
 from langchain_core.embeddings import Embeddings
 from langchain_core.utils import get_from_dict_or_env, pre_init
 from pydantic import BaseModel
 
+# Rough number of characters per token, used to estimate the size of batches without a tokenizer
+CHARS_PER_TOKEN = 4
+# Status codes of rate limited or temporarily failed requests, which are retried
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 class SambaStudioEmbeddings(BaseModel, Embeddings):
     """SambaNova embedding models.
@@ -34,6 +44,11 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
 
             (or)
 
+            # send up to 8 batches concurrently, retrying rate limited requests
+            embeddings = SambaStudioEmbeddings(batch_size=32, max_concurrency=8, max_retries=5)
+
+            (or)
+
             # bundle example
             embeddings = SambaStudioEmbeddings(
                 batch_size=1,
@@ -64,6 +79,18 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
     batch_size: int = 32
     """Batch size for the embedding models"""
 
+    max_batch_tokens: Optional[int] = None
+    """Maximum estimated number of tokens per batch, so batches of long texts are smaller"""
+
+    max_concurrency: int = 1
+    """Maximum number of batches sent concurrently"""
+
+    max_retries: int = 3
+    """Maximum number of retries of rate limited or failed requests"""
+
+    retry_backoff: float = 1.0
+    """Initial wait in seconds before retrying a request, doubled on each retry"""
+
     @pre_init
     def validate_environment(cls, values: Dict) -> Dict:
         """Validate that api key and python package exists in environment."""
@@ -124,184 +151,201 @@ class SambaStudioEmbeddings(BaseModel, Embeddings):
             batch_size (int, optional): batch size to be used for the embedding model.
             Will depend on the RDU endpoint used.
         Yields:
-            List[str]: list (batch) of strings of size batch size
+            List[str]: list (batch) of strings of at most batch size strings, and at most max_batch_tokens
+            estimated tokens when set
         """
-        for i in range(0, len(texts), batch_size):
-            yield texts[i : i + batch_size]
+        batch: List[str] = []
+        batch_tokens = 0
+        for text in texts:
+            text_tokens = len(text) // CHARS_PER_TOKEN + 1
+            if batch and (
+                len(batch) >= batch_size
+                or (self.max_batch_tokens is not None and batch_tokens + text_tokens > self.max_batch_tokens)
+            ):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += text_tokens
+        if batch:
+            yield batch
+
+    def _get_payload(self, batch: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds the request body for a batch of texts, depending on the endpoint uri"""
+        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
+            return {'inputs': batch, 'params': params}
+        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
+            return {'items': [{'id': f'item{i}', 'value': item} for i, item in enumerate(batch)], 'params': params}
+        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
+            return {'instances': batch, 'params': params}
+        else:
+            raise ValueError(
+                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
+            )
+
+    def _parse_embeddings(self, response_json: Dict[str, Any]) -> List[List[float]]:
+        """Gets the embeddings of a batch from the endpoint response, depending on the endpoint uri"""
+        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
+            key = 'data'
+        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
+            key = 'items'
+        else:
+            key = 'predictions'
+        try:
+            if key == 'items':
+                return [item['value'] for item in response_json['items']]
+            return response_json[key]
+        except KeyError:
+            raise KeyError(
+                f"'{key}' not found in endpoint response",
+                response_json,
+            )
+
+    def _get_retry_delay(self, attempt: int, headers: Any) -> float:
+        """Gets the time to wait before retrying a request, from the Retry-After header or an exponential backoff
+        with jitter"""
+        retry_after = headers.get('Retry-After') if headers is not None else None
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.retry_backoff * 2**attempt * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _raise_for_status(status_code: int, text: str) -> None:
+        if status_code != 200:
+            raise RuntimeError(f'Sambanova /complete call failed with status code {status_code}.\n Details: {text}')
+
+    def _embed_batch(self, http_session: requests.Session, batch: List[str]) -> List[List[float]]:
+        """Embeds a batch of texts, retrying rate limited and failed requests. Batches too large for the endpoint
+        are split in two.
 
-    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
-        """Returns a list of embeddings for the given sentences.
         Args:
-            texts (`List[str]`): List of texts to encode
-            batch_size (`int`): Batch size for the encoding
+            http_session (requests.Session): session to send the request with
+            batch (List[str]): texts to embed
 
         Returns:
-            `List[np.ndarray]` or `List[tensor]`: List of embeddings
-            for the given sentences
+            List[List[float]]: embeddings of the batch, in the same order
         """
-        if batch_size is None:
-            batch_size = self.batch_size
-        http_session = requests.Session()
         url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
-        params = json.loads(self._get_tuning_params())
-        embeddings = []
-
-        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                data = {'inputs': batch, 'params': params}
+        data = self._get_payload(batch, json.loads(self._get_tuning_params()))
+        for attempt in range(self.max_retries + 1):
+            try:
                 response = http_session.post(
                     url,
                     headers={'key': self.sambastudio_embeddings_api_key},
                     json=data,
                 )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    embedding = response.json()['data']
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'data' not found in endpoint response",
-                        response.json(),
-                    )
-
-        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                items = [{'id': f'item{i}', 'value': item} for i, item in enumerate(batch)]
-                data = {'items': items, 'params': params}
-                response = http_session.post(
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._get_retry_delay(attempt, None))
+                continue
+            if response.status_code == 413 and len(batch) > 1:
+                middle = len(batch) // 2
+                return self._embed_batch(http_session, batch[:middle]) + self._embed_batch(http_session, batch[middle:])
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                time.sleep(self._get_retry_delay(attempt, response.headers))
+                continue
+            self._raise_for_status(response.status_code, response.text)
+            break
+        return self._parse_embeddings(response.json())
+
+    async def _aembed_batch(self, client: httpx.AsyncClient, batch: List[str]) -> List[List[float]]:
+        """Async version of `_embed_batch`"""
+        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
+        data = self._get_payload(batch, json.loads(self._get_tuning_params()))
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(
                     url,
                     headers={'key': self.sambastudio_embeddings_api_key},
                     json=data,
                 )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    embedding = [item['value'] for item in response.json()['items']]
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'items' not found in endpoint response",
-                        response.json(),
-                    )
-
-        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
-            for batch in self._iterate_over_batches(texts, batch_size):
-                data = {'instances': batch, 'params': params}
-                response = http_session.post(
-                    url,
-                    headers={'key': self.sambastudio_embeddings_api_key},
-                    json=data,
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._get_retry_delay(attempt, None))
+                continue
+            if response.status_code == 413 and len(batch) > 1:
+                middle = len(batch) // 2
+                return await self._aembed_batch(client, batch[:middle]) + await self._aembed_batch(
+                    client, batch[middle:]
                 )
-                if response.status_code != 200:
-                    raise RuntimeError(
-                        f'Sambanova /complete call failed with status code '
-                        f'{response.status_code}.\n Details: {response.text}'
-                    )
-                try:
-                    if params.get('select_expert'):
-                        embedding = response.json()['predictions']
-                    else:
-                        embedding = response.json()['predictions']
-                    embeddings.extend(embedding)
-                except KeyError:
-                    raise KeyError(
-                        "'predictions' not found in endpoint response",
-                        response.json(),
-                    )
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                await asyncio.sleep(self._get_retry_delay(attempt, response.headers))
+                continue
+            self._raise_for_status(response.status_code, response.text)
+            break
+        return self._parse_embeddings(response.json())
 
-        else:
-            raise ValueError(
-                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
-            )
-
-        return embeddings
-
-    def embed_query(self, text: str) -> List[float]:
+    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
         """Returns a list of embeddings for the given sentences.
+        Batches are sent concurrently, up to max_concurrency at a time, and reassembled in order.
         Args:
-            sentences (`List[str]`): List of sentences to encode
+            texts (`List[str]`): List of texts to encode
+            batch_size (`int`): Batch size for the encoding
 
         Returns:
             `List[np.ndarray]` or `List[tensor]`: List of embeddings
             for the given sentences
         """
-        http_session = requests.Session()
-        url = self._get_full_url(f'{self.sambastudio_embeddings_project_id}/{self.sambastudio_embeddings_endpoint_id}')
-        params = json.loads(self._get_tuning_params())
+        if batch_size is None:
+            batch_size = self.batch_size
+        batches = list(self._iterate_over_batches(texts, batch_size))
+        num_workers = max(1, min(self.max_concurrency, len(batches)))
+
+        with requests.Session() as http_session:
+            if num_workers == 1:
+                batch_embeddings = [self._embed_batch(http_session, batch) for batch in batches]
+            else:
+                # the session connection pool is sized so every worker keeps its connection open
+                adapter = requests.adapters.HTTPAdapter(pool_connections=num_workers, pool_maxsize=num_workers)
+                http_session.mount('https://', adapter)
+                http_session.mount('http://', adapter)
+                with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                    batch_embeddings = list(executor.map(lambda batch: self._embed_batch(http_session, batch), batches))
+
+        return [embedding for embeddings in batch_embeddings for embedding in embeddings]
+
+    async def aembed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Async version of `embed_documents`, sending up to max_concurrency batches at a time.
+        Args:
+            texts (`List[str]`): List of texts to encode
+            batch_size (`int`): Batch size for the encoding
 
-        if 'api/predict/nlp' in self.sambastudio_embeddings_base_uri:
-            data = {'inputs': [text], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                embedding = response.json()['data'][0]
-            except KeyError:
-                raise KeyError(
-                    "'data' not found in endpoint response",
-                    response.json(),
-                )
+        Returns:
+            `List[np.ndarray]` or `List[tensor]`: List of embeddings
+            for the given sentences
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+        batches = list(self._iterate_over_batches(texts, batch_size))
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        limits = httpx.Limits(max_connections=max(1, self.max_concurrency))
 
-        elif 'api/v2/predict/generic' in self.sambastudio_embeddings_base_uri:
-            data = {'items': [{'id': 'item0', 'value': text}], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                embedding = response.json()['items'][0]['value']
-            except KeyError:
-                raise KeyError(
-                    "'items' not found in endpoint response",
-                    response.json(),
-                )
+        async with httpx.AsyncClient(limits=limits, timeout=None) as client:
 
-        elif 'api/predict/generic' in self.sambastudio_embeddings_base_uri:
-            data = {'instances': [text], 'params': params}
-            response = http_session.post(
-                url,
-                headers={'key': self.sambastudio_embeddings_api_key},
-                json=data,
-            )
-            if response.status_code != 200:
-                raise RuntimeError(
-                    f'Sambanova /complete call failed with status code '
-                    f'{response.status_code}.\n Details: {response.text}'
-                )
-            try:
-                if params.get('select_expert'):
-                    embedding = response.json()['predictions'][0]
-                else:
-                    embedding = response.json()['predictions'][0]
-            except KeyError:
-                raise KeyError(
-                    "'predictions' not found in endpoint response",
-                    response.json(),
-                )
+            async def embed_batch(batch: List[str]) -> List[List[float]]:
+                async with semaphore:
+                    return await self._aembed_batch(client, batch)
 
-        else:
-            raise ValueError(
-                f'handling of endpoint uri: {self.sambastudio_embeddings_base_uri} not implemented'  # noqa: E501
-            )
+            batch_embeddings = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+
+        return [embedding for embeddings in batch_embeddings for embedding in embeddings]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Returns a list of embeddings for the given sentences.
+        Args:
+            sentences (`List[str]`): List of sentences to encode
+
+        Returns:
+            `List[np.ndarray]` or `List[tensor]`: List of embeddings
+            for the given sentences
+        """
+        with requests.Session() as http_session:
+            return self._embed_batch(http_session, [text])[0]
 
-        return embedding
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async version of `embed_query`"""
+        return (await self.aembed_documents([text]))[0]
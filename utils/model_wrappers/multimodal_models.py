@@ -1,15 +1,20 @@
 """Wrapper around Sambanova multimodal APIs."""
 
 import base64
+import io
 import json
 import os
 import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, Generator, Iterator, List, Optional, Union
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple, Union
 
 import requests
 import sseclient
 
+BASE64_PATTERN = re.compile(r'[A-Za-z0-9+/]*={0,2}')
+
 
 class SambastudioMultimodal:
     """
@@ -27,6 +32,10 @@ class SambastudioMultimodal:
         top_k: int = 1,
         stop: Optional[List[str]] = None,
         do_sample: bool = False,
+        image_cache_size: int = 128,
+        max_image_size: Optional[int] = None,
+        max_image_payload_size: Optional[int] = None,
+        jpeg_quality: int = 85,
     ) -> None:
         """
         Initialize the SambastudioMultimodal.
@@ -40,6 +49,12 @@ class SambastudioMultimodal:
         :param int top_k: model top k,
         :param list stop: list of token to stop generation when stop token is found
         :param bool do_sample: whether to do sample for model generation
+        :param int image_cache_size: number of encoded images from paths or urls kept in memory, 0 to disable
+        :param int max_image_size: images with a larger width or height are downscaled to this size in pixels
+        :param int max_image_payload_size: images whose base64 payload is larger than this number of characters are
+            recompressed as JPEG and downscaled until they fit, e.g. to stay under the request size limit of the
+            endpoint. Downscaling requires the Pillow package.
+        :param int jpeg_quality: initial JPEG quality of the downscaled or recompressed images
         """
         self.base_url = base_url
         if self.base_url is None:
@@ -56,7 +71,13 @@ class SambastudioMultimodal:
         if stop is None:
             self.stop = []
         self.do_sample = do_sample
+        self.image_cache_size = image_cache_size
+        self.max_image_size = max_image_size
+        self.max_image_payload_size = max_image_payload_size
+        self.jpeg_quality = jpeg_quality
         self.http_session = requests.Session()
+        self._image_cache: OrderedDict[Tuple[Any, ...], str] = OrderedDict()
+        self._image_cache_lock = threading.Lock()
 
     def image_to_base64(self, image_path: str) -> str:
         """
@@ -79,12 +100,20 @@ class SambastudioMultimodal:
         :return: The base64 encoded string representation of the image.
         :rtype: str
         """
-        response = requests.get(url)
+        return base64.b64encode(self._download_image(url)).decode()
+
+    def _download_image(self, url: str) -> bytes:
+        """
+        Downloads an image from a URL.
+
+        :param str url: The URL of the image.
+        :return: The image file content.
+        :rtype: bytes
+        """
+        response = self.http_session.get(url)
         try:
             if response.status_code == 200:
-                image_binary = response.content
-                base64_image = base64.b64encode(image_binary).decode()
-                return base64_image
+                return response.content
             else:
                 raise ValueError(f'Unable to retrieve image from URL status code {response.status_code}')
         except Exception as e:
@@ -100,12 +129,12 @@ class SambastudioMultimodal:
         """
         image = image.strip()
 
-        if len(image) % 4 != 0:
+        if len(image) % 4 != 0 or not BASE64_PATTERN.fullmatch(image):
             return False
 
         try:
-            # Decode the base64 string
-            base64_bytes = base64.b64decode(image, validate=True)
+            # Only the first bytes are decoded, the file headers fit in them
+            base64_bytes = base64.b64decode(image[:16], validate=True)
 
             # Check if it starts with common image file headers
             if base64_bytes.startswith(b'\xff\xd8\xff'):  # JPEG
@@ -236,7 +265,7 @@ class SambastudioMultimodal:
             },
         }
         headers = {'Content-Type': 'application/json', 'key': self.api_key}
-        response = requests.post(self.base_url, headers=headers, data=json.dumps(data))
+        response = self.http_session.post(self.base_url, headers=headers, data=json.dumps(data))
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambastudio multimodal API call failed with status code {response.status_code}',
@@ -281,7 +310,7 @@ class SambastudioMultimodal:
             data['messages'][0]['content'].append({'type': 'image_url', 'image_url': {'url': image}})
 
         headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
-        response = requests.post(self.base_url, headers=headers, data=json.dumps(data))
+        response = self.http_session.post(self.base_url, headers=headers, data=json.dumps(data))
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambastudio multimodal API call failed with status code {response.status_code}.',
@@ -325,7 +354,7 @@ class SambastudioMultimodal:
             data['messages'][0]['content'].append({'type': 'image_url', 'image_url': {'url': image}})
 
         headers = {'Authorization': f'Bearer {self.api_key}', 'Content-Type': 'application/json'}
-        response = requests.post(self.base_url, headers=headers, data=json.dumps(data), stream=True)
+        response = self.http_session.post(self.base_url, headers=headers, data=json.dumps(data), stream=True)
         if response.status_code != 200:
             raise RuntimeError(
                 f'Sambastudio multimodal API call failed with status code {response.status_code}.',
@@ -334,9 +363,103 @@ class SambastudioMultimodal:
         else:
             return response
 
+    def _fit_image(self, image_binary: bytes) -> bytes:
+        """
+        Downscales and recompresses an image to the max_image_size and max_image_payload_size limits.
+
+        :param bytes image_binary: The image file content.
+        :return: The image unchanged if it is within the limits, else the JPEG encoded fitted image.
+        :rtype: bytes
+        """
+
+        def payload_size(num_bytes: int) -> int:
+            return 4 * ((num_bytes + 2) // 3)
+
+        if self.max_image_size is None and (
+            self.max_image_payload_size is None or payload_size(len(image_binary)) <= self.max_image_payload_size
+        ):
+            return image_binary
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError('Downscaling images requires the Pillow package. Install it with `pip install pillow`.')
+
+        image = Image.open(io.BytesIO(image_binary))
+        if self.max_image_size is not None and max(image.size) > self.max_image_size:
+            image.thumbnail((self.max_image_size, self.max_image_size))
+        elif self.max_image_payload_size is None or payload_size(len(image_binary)) <= self.max_image_payload_size:
+            return image_binary
+
+        image = image.convert('RGB')
+        quality = self.jpeg_quality
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=quality, optimize=True)
+            fitted_binary = buffer.getvalue()
+            if (
+                self.max_image_payload_size is None
+                or payload_size(len(fitted_binary)) <= self.max_image_payload_size
+                or max(image.size) <= 64
+            ):
+                return fitted_binary
+            # lower the quality first, then the resolution
+            if quality > 50:
+                quality = max(quality - 15, 50)
+            else:
+                image = image.resize((max(image.width * 3 // 4, 1), max(image.height * 3 // 4, 1)))
+
+    def _get_cached_image(self, key: Tuple[Any, ...], load: Callable[[], bytes]) -> str:
+        """
+        Gets the base64 payload of an image from the cache, loading, fitting and encoding it on a miss.
+
+        :param tuple key: The cache key of the image.
+        :param callable load: Function loading the image file content.
+        :return: The base64 encoded image.
+        :rtype: str
+        """
+        with self._image_cache_lock:
+            if key in self._image_cache:
+                self._image_cache.move_to_end(key)
+                return self._image_cache[key]
+        base64_image = base64.b64encode(self._fit_image(load())).decode()
+        if self.image_cache_size > 0:
+            with self._image_cache_lock:
+                self._image_cache[key] = base64_image
+                while len(self._image_cache) > self.image_cache_size:
+                    self._image_cache.popitem(last=False)
+        return base64_image
+
+    def _load_image_file(self, image_path: str) -> str:
+        """
+        Gets the base64 payload of an image file, cached until the file is modified.
+
+        :param str image_path: The path to the image file.
+        :return: The base64 encoded image.
+        :rtype: str
+        """
+        stat = os.stat(image_path)
+        key = ('path', os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+
+        def load() -> bytes:
+            with open(image_path, 'rb') as image_file:
+                return image_file.read()
+
+        return self._get_cached_image(key, load)
+
+    def _load_image_url(self, url: str) -> str:
+        """
+        Gets the base64 payload of an image url, downloaded once while it stays in the cache.
+
+        :param str url: The URL of the image.
+        :return: The base64 encoded image.
+        :rtype: str
+        """
+        return self._get_cached_image(('url', url), lambda: self._download_image(url))
+
     def _load_images(self, images: Optional[Union[str, List]] = None) -> List[Any]:
         """
-        Loads the images into base64 format or url.
+        Loads the images into base64 format.
+        Images from paths and urls are cached and fitted to the image size limits, base64 images are used as given.
 
         :param Union[str, List] images: Image or images to be used with the model url, absolute path or base64 image
         :return: List of base64 encoded / URL images
@@ -351,9 +474,9 @@ class SambastudioMultimodal:
                 image = image
                 images_list.append(image)
             elif self._is_file_path(image):
-                images_list.append(self.image_to_base64(image))
+                images_list.append(self._load_image_file(image))
             elif self._is_url(image):
-                images_list.append(image)
+                images_list.append(self._load_image_url(image))
             else:
                 raise ValueError('images should be provided as an url, a path or as a base64 encoded image')
         return images_list
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+SambaStudio Embeddings Test Script
+
+This script tests the concurrent batching and the retries of SambaStudioEmbeddings against a local fake endpoint that
+fails some of the batches, so no endpoint or API key is needed.
+
+Usage:
+    python tests/embeddings_test.py
+
+Returns:
+    0 if all tests pass, or a positive integer representing the number of failed tests.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Type
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Setup paths and global variables
+file_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(file_dir, '../../..'))  # absolute path for ai-starter-kit root repo
+
+sys.path.append(repo_dir)
+
+from utils.model_wrappers.langchain_embeddings import SambaStudioEmbeddings
+
+NUM_TEXTS = 40
+BATCH_SIZE = 4
+MAX_CONCURRENCY = 4
+# Batches with more texts than this are rejected as too large
+MAX_ENDPOINT_BATCH_SIZE = 8
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Embedding the fake endpoint returns for a text, so the order of the output can be checked"""
+    return [float(text.split()[-1]), float(len(text))]
+
+
+class FakeEmbeddingsEndpoint(ThreadingHTTPServer):
+    """Local embeddings endpoint of the `api/predict/generic` kind. The first attempt of every third batch is
+    rate limited, alternating between a Retry-After header and none, the first attempt of every fifth batch fails with
+    a server error, and earlier batches are answered later, so batches complete out of order.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), FakeEmbeddingsHandler)
+        self.lock = threading.Lock()
+        self.attempts: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.always_fail = False
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def reset(self) -> None:
+        with self.lock:
+            self.attempts = {}
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.always_fail = False
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    server: FakeEmbeddingsEndpoint
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def send_json(self, status_code: int, body: Dict[str, Any], headers: Dict[str, str] = {}) -> None:
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self) -> None:
+        texts: List[str] = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['instances']
+        first_idx = int(texts[0].split()[-1])
+        with self.server.lock:
+            attempt = self.server.attempts.get(texts[0], 0)
+            self.server.attempts[texts[0]] = attempt + 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        try:
+            time.sleep(0.01 + 0.002 * (NUM_TEXTS - first_idx))
+            batch_idx = first_idx // BATCH_SIZE
+            if self.server.always_fail:
+                self.send_json(503, {'error': 'unavailable'})
+            elif len(texts) > MAX_ENDPOINT_BATCH_SIZE:
+                self.send_json(413, {'error': 'batch too large'})
+            elif attempt == 0 and batch_idx % 3 == 0:
+                headers = {'Retry-After': '0.01'} if batch_idx % 2 == 0 else {}
+                self.send_json(429, {'error': 'rate limited'}, headers)
+            elif attempt == 0 and batch_idx % 5 == 0:
+                self.send_json(500, {'error': 'internal error'})
+            else:
+                self.send_json(200, {'predictions': [fake_embedding(text) for text in texts]})
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+
+class SambaStudioEmbeddingsTestCase(unittest.TestCase):
+    endpoint: FakeEmbeddingsEndpoint
+    texts: List[str]
+
+    @classmethod
+    def setUpClass(cls: Type['SambaStudioEmbeddingsTestCase']) -> None:
+        cls.endpoint = FakeEmbeddingsEndpoint()
+        threading.Thread(target=cls.endpoint.serve_forever, daemon=True).start()
+        cls.texts = [f'text number {idx}' for idx in range(NUM_TEXTS)]
+
+    def setUp(self) -> None:
+        self.endpoint.reset()
+
+    def create_embeddings(self, **kwargs: Any) -> SambaStudioEmbeddings:
+        params: Dict[str, Any] = {
+            'sambastudio_embeddings_base_url': self.endpoint.url,
+            'sambastudio_embeddings_base_uri': 'api/predict/generic',
+            'sambastudio_embeddings_project_id': 'project',
+            'sambastudio_embeddings_endpoint_id': 'endpoint',
+            'sambastudio_embeddings_api_key': 'fake-key',
+            'batch_size': BATCH_SIZE,
+            'max_concurrency': MAX_CONCURRENCY,
+            'max_retries': 3,
+            'retry_backoff': 0.01,
+        }
+        params.update(kwargs)
+        return SambaStudioEmbeddings(**params)
+
+    def check_retries(self) -> None:
+        num_batches = NUM_TEXTS // BATCH_SIZE
+        failed_batches = [idx for idx in range(num_batches) if idx % 3 == 0 or idx % 5 == 0]
+        for batch_idx in range(num_batches):
+            attempts = self.endpoint.attempts[self.texts[batch_idx * BATCH_SIZE]]
+            self.assertEqual(attempts, 2 if batch_idx in failed_batches else 1, f'Attempts of batch {batch_idx}')
+
+    def test_embed_documents_order(self) -> None:
+        embeddings = self.create_embeddings().embed_documents(self.texts)
+
+        self.assertEqual(embeddings, [fake_embedding(text) for text in self.texts], 'Output should keep input order')
+        self.check_retries()
+        self.assertGreater(self.endpoint.max_in_flight, 1, 'Batches should be sent concurrently')
+        self.assertLessEqual(self.endpoint.max_in_flight, MAX_CONCURRENCY)
+
+    def test_aembed_documents_order(self) -> None:
+        embeddings = asyncio.run(self.create_embeddings().aembed_documents(self.texts))
+
+        self.assertEqual(embeddings, [fake_embedding(text) for text in self.texts], 'Output should keep input order')
+        self.check_retries()
+        self.assertGreater(self.endpoint.max_in_flight, 1, 'Batches should be sent concurrently')
+        self.assertLessEqual(self.endpoint.max_in_flight, MAX_CONCURRENCY)
+
+    def test_sequential_embed_documents(self) -> None:
+        embeddings = self.create_embeddings(max_concurrency=1).embed_documents(self.texts)
+
+        self.assertEqual(embeddings, [fake_embedding(text) for text in self.texts])
+        self.assertEqual(self.endpoint.max_in_flight, 1)
+
+    def test_split_too_large_batches(self) -> None:
+        texts = self.texts[1:]
+        embeddings = self.create_embeddings(max_concurrency=2).embed_documents(texts, batch_size=2 * NUM_TEXTS)
+
+        self.assertEqual(embeddings, [fake_embedding(text) for text in texts], 'Split batches should keep input order')
+
+    def test_retries_exhausted(self) -> None:
+        self.endpoint.always_fail = True
+        with self.assertRaises(RuntimeError):
+            self.create_embeddings(max_retries=2).embed_documents(self.texts[:BATCH_SIZE])
+        self.assertEqual(self.endpoint.attempts[self.texts[0]], 3, 'The request should be sent once plus its retries')
+
+    @classmethod
+    def tearDownClass(cls: Type['SambaStudioEmbeddingsTestCase']) -> None:
+        cls.endpoint.shutdown()
+        cls.endpoint.server_close()
+
+
+def main() -> int:
+    suite = unittest.TestLoader().loadTestsFromTestCase(SambaStudioEmbeddingsTestCase)
+    test_result = unittest.TextTestRunner().run(suite)
+    return len(test_result.failures) + len(test_result.errors)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
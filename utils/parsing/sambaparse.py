@@ -3,7 +3,9 @@ import logging
 import os
 import shutil
 import subprocess
-from typing import Any, Dict, List, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Generator, List, Optional, Tuple, Union
 
 import yaml
 from dotenv import load_dotenv
@@ -251,6 +253,7 @@ class SambaParse:
                 table_text_key=self.config['additional_processing']['table_text_key'],
                 return_langchain_docs=self.config['additional_processing']['return_langchain_docs'],
                 convert_metadata_keys_to_string=self.config['additional_processing']['convert_metadata_keys_to_string'],
+                max_workers=self.config['additional_processing'].get('max_workers', 4),
             )
             logger.info('Additional processing completed.')
             return texts, metadata_list, langchain_docs
@@ -330,6 +333,104 @@ def convert_to_string(value: Union[List, Tuple, Dict, Any]) -> str:
         return str(value)
 
 
+def _process_element_file(
+    file_path: str,
+    extend_metadata: bool,
+    additional_metadata: Optional[Dict[str, Any]],
+    replace_table_text: bool,
+    table_text_key: str,
+    convert_metadata_keys_to_string: bool,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Extracts the texts and metadata of a JSON file of partitioned elements. The file is only rewritten when the
+    elements were modified, i.e. the first time it is processed with a given additional metadata and table setting.
+
+    Args:
+        file_path (str): The path of the JSON file.
+        extend_metadata (bool): Whether to extend the metadata with additional metadata.
+        additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+        replace_table_text (bool): Whether to replace table text with the specified table text key.
+        table_text_key (str): The key to use for replacing table text.
+        convert_metadata_keys_to_string (bool): Whether to convert non-string metadata keys to string.
+
+    Returns:
+        Tuple[List[str], List[Dict]]: A tuple containing the texts and metadata of the elements of the file.
+    """
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+
+    texts = []
+    metadata_list = []
+    modified = False
+
+    for element in data:
+        if extend_metadata and additional_metadata:
+            if any(
+                key not in element['metadata'] or element['metadata'][key] != value
+                for key, value in additional_metadata.items()
+            ):
+                element['metadata'].update(additional_metadata)
+                modified = True
+
+        if replace_table_text and element['type'] == 'Table':
+            if element['text'] != element['metadata'][table_text_key]:
+                element['text'] = element['metadata'][table_text_key]
+                modified = True
+
+        metadata = element['metadata'].copy()
+        if convert_metadata_keys_to_string:
+            metadata = {str(key): convert_to_string(value) for key, value in metadata.items()}
+        for key in element:
+            if key not in ['text', 'metadata', 'embeddings']:
+                metadata[key] = element[key]
+        if 'page_number' in metadata:
+            metadata['page'] = metadata['page_number']
+        else:
+            metadata['page'] = 1
+
+        metadata_list.append(metadata)
+        texts.append(element['text'])
+
+    if modified:
+        # written to a temporary file first so an interrupted run never leaves a truncated file
+        with open(f'{file_path}.tmp', 'w') as file:
+            json.dump(data, file, indent=2)
+        os.replace(f'{file_path}.tmp', file_path)
+
+    return texts, metadata_list
+
+
+def _iter_processed_files(
+    directory: str, max_workers: int, **kwargs: Any
+) -> Generator[Tuple[List[str], List[Dict[str, Any]]], None, None]:
+    """
+    Processes the JSON files of a directory in parallel, yielding the texts and metadata of each file in order.
+    Only a bounded window of files is processed ahead of the consumer, so memory does not grow with the number of
+    files.
+
+    Args:
+        directory (str): The directory containing the extracted JSON files, or a single JSON file.
+        max_workers (int): The number of files processed in parallel.
+        **kwargs: Processing options passed to `_process_element_file`.
+
+    Yields:
+        Tuple[List[str], List[Dict]]: The texts and metadata of the elements of each file.
+    """
+    if os.path.isfile(directory):
+        file_paths = [directory]
+    else:
+        file_paths = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.json')]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: Deque[Future] = deque()
+        for file_path in file_paths:
+            pending.append(executor.submit(_process_element_file, file_path, **kwargs))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 def additional_processing(
     directory: str,
     extend_metadata: bool,
@@ -338,6 +439,7 @@ def additional_processing(
     table_text_key: str,
     return_langchain_docs: bool,
     convert_metadata_keys_to_string: bool,
+    max_workers: int = 4,
 ) -> Tuple[List[str], List[Dict[str, Any]], List[Document]]:
     """
     Performs additional processing on the extracted documents.
@@ -350,52 +452,68 @@ def additional_processing(
         table_text_key (str): The key to use for replacing table text.
         return_langchain_docs (bool): Whether to return LangChain documents.
         convert_metadata_keys_to_string (bool): Whether to convert non-string metadata keys to string.
+        max_workers (int): The number of JSON files processed in parallel.
 
     Returns:
         Tuple[List[str], List[Dict], List[Document]]: A tuple containing the extracted texts, metadata, and LangChain
         documents.
     """
-    if os.path.isfile(directory):
-        file_paths = [directory]
-    else:
-        file_paths = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.json')]
-
     texts = []
     metadata_list = []
     langchain_docs = []
 
-    for file_path in file_paths:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-
-        for element in data:
-            if extend_metadata and additional_metadata:
-                element['metadata'].update(additional_metadata)
-
-            if replace_table_text and element['type'] == 'Table':
-                element['text'] = element['metadata'][table_text_key]
+    for file_texts, file_metadata_list in _iter_processed_files(
+        directory,
+        max_workers,
+        extend_metadata=extend_metadata,
+        additional_metadata=additional_metadata,
+        replace_table_text=replace_table_text,
+        table_text_key=table_text_key,
+        convert_metadata_keys_to_string=convert_metadata_keys_to_string,
+    ):
+        texts.extend(file_texts)
+        metadata_list.extend(file_metadata_list)
+        if return_langchain_docs:
+            langchain_docs.extend(get_langchain_docs(file_texts, file_metadata_list))
 
-            metadata = element['metadata'].copy()
-            if convert_metadata_keys_to_string:
-                metadata = {str(key): convert_to_string(value) for key, value in metadata.items()}
-            for key in element:
-                if key not in ['text', 'metadata', 'embeddings']:
-                    metadata[key] = element[key]
-            if 'page_number' in metadata:
-                metadata['page'] = metadata['page_number']
-            else:
-                metadata['page'] = 1
+    return texts, metadata_list, langchain_docs
 
-            metadata_list.append(metadata)
-            texts.append(element['text'])
 
-        if return_langchain_docs:
-            langchain_docs.extend(get_langchain_docs(texts, metadata_list))
+def iter_additional_processing(
+    directory: str,
+    extend_metadata: bool,
+    additional_metadata: Optional[Dict[str, Any]],
+    replace_table_text: bool,
+    table_text_key: str,
+    convert_metadata_keys_to_string: bool,
+    max_workers: int = 4,
+) -> Generator[Document, None, None]:
+    """
+    Performs additional processing on the extracted documents, yielding LangChain documents file by file instead of
+    loading all of them in memory. See `additional_processing`.
 
-        with open(file_path, 'w') as file:
-            json.dump(data, file, indent=2)
+    Args:
+        directory (str): The directory containing the extracted JSON files.
+        extend_metadata (bool): Whether to extend the metadata with additional metadata.
+        additional_metadata (Optional[Dict]): Additional metadata to include in the processed documents.
+        replace_table_text (bool): Whether to replace table text with the specified table text key.
+        table_text_key (str): The key to use for replacing table text.
+        convert_metadata_keys_to_string (bool): Whether to convert non-string metadata keys to string.
+        max_workers (int): The number of JSON files processed in parallel.
 
-    return texts, metadata_list, langchain_docs
+    Yields:
+        Document: The LangChain documents of the extracted elements.
+    """
+    for file_texts, file_metadata_list in _iter_processed_files(
+        directory,
+        max_workers,
+        extend_metadata=extend_metadata,
+        additional_metadata=additional_metadata,
+        replace_table_text=replace_table_text,
+        table_text_key=table_text_key,
+        convert_metadata_keys_to_string=convert_metadata_keys_to_string,
+    ):
+        yield from get_langchain_docs(file_texts, file_metadata_list)
 
 
 def get_langchain_docs(texts: List[str], metadata_list: List[Dict]) -> List[Document]:
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, Sequence, Tuple, TypeVar
+
+V = TypeVar('V')
+
+# SQLite limits the number of parameters of a query, so keys are looked up in chunks of this size
+MAX_QUERY_KEYS = 500
+
+
+class SQLiteCache(Generic[V]):
+    """Persistent key value cache stored in a table of a SQLite database.
+
+    The database runs in WAL mode, which keeps the cache safe to share between threads and processes. Values are
+    converted to and from a SQLite type with `encode` and `decode`. When `max_entries` is set, every hit refreshes the
+    last access time of its entry, and the least recently used entries are evicted once the cache holds more than
+    `max_entries` values. Entries are then evicted down to 1% below the bound, so the table is only counted again
+    after that many inserts.
+    """
+
+    # Fraction of max_entries evicted below the bound, so a full cache is not counted on every insert
+    EVICTION_HEADROOM = 0.01
+
+    def __init__(
+        self,
+        db_path: str,
+        table_name: str,
+        encode: Callable[[V], Any],
+        decode: Callable[[Any], V],
+        value_type: str = 'TEXT',
+        max_entries: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            db_path (str): path of the SQLite database, created with its directory if it does not exist
+            table_name (str): table of the cache, so several caches can share a database
+            encode (callable): converts a value to the SQLite type it is stored as
+            decode (callable): converts a stored value back
+            value_type (str): SQLite type of the stored values, e.g. 'TEXT' or 'BLOB'
+            max_entries (int, optional): maximum number of cached values. Defaults to no bound.
+        """
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError(f'max_entries must be a positive number. Got {max_entries}')
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.table_name = table_name
+        self.encode = encode
+        self.decode = decode
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False, timeout=60)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            # a table with another layout, e.g. written by an older version, is only a cache, so it is recreated
+            columns = {row[1] for row in self._connection.execute(f'PRAGMA table_info({table_name})')}
+            if columns and columns != {'key', 'value', 'last_access'}:
+                self._connection.execute(f'DROP TABLE {table_name}')
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table_name} '
+                f'(key TEXT PRIMARY KEY, value {value_type} NOT NULL, last_access REAL NOT NULL)'
+            )
+            if max_entries is not None:
+                self._connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table_name}_last_access_idx ON {table_name} (last_access)'
+                )
+            # upper bound of the number of entries, counting replaced keys and ignoring the other processes, so the
+            # table is only counted when it may be above the size bound
+            self._max_num_entries = self._count()
+
+    def _count(self) -> int:
+        return int(self._connection.execute(f'SELECT COUNT(*) FROM {self.table_name}').fetchone()[0])
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, V]:
+        """Gets the cached values of a list of keys, refreshing their last access time when the cache is bounded
+
+        Args:
+            keys (list): cache keys
+
+        Returns:
+            dict: values of the keys found in the cache
+        """
+        rows: Dict[str, Any] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique_keys), MAX_QUERY_KEYS):
+                chunk = unique_keys[i : i + MAX_QUERY_KEYS]
+                rows.update(
+                    self._connection.execute(
+                        f'SELECT key, value FROM {self.table_name} WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                    ).fetchall()
+                )
+            if rows and self.max_entries is not None:
+                now = time.time()
+                with self._connection:
+                    self._connection.executemany(
+                        f'UPDATE {self.table_name} SET last_access = ? WHERE key = ?', [(now, key) for key in rows]
+                    )
+        return {key: self.decode(value) for key, value in rows.items()}
+
+    def get(self, key: str) -> Optional[V]:
+        """Gets the cached value of a key
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            value of the key, or None if it is not cached
+        """
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Sequence[Tuple[str, V]]) -> None:
+        """Stores values, evicting the least recently used ones above the size bound
+
+        Args:
+            items (list): (key, value) pairs
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, self.encode(value), now) for key, value in items]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f'INSERT OR REPLACE INTO {self.table_name} (key, value, last_access) VALUES (?, ?, ?)', rows
+            )
+            self._max_num_entries += len(rows)
+            if self.max_entries is None or self._max_num_entries <= self.max_entries:
+                return
+            num_entries = self._count()
+            if num_entries > self.max_entries:
+                target_num_entries = self.max_entries - int(self.max_entries * self.EVICTION_HEADROOM)
+                self._connection.execute(
+                    f'DELETE FROM {self.table_name} WHERE key IN '
+                    f'(SELECT key FROM {self.table_name} ORDER BY last_access LIMIT ?)',
+                    (num_entries - target_num_entries,),
+                )
+                num_entries = target_num_entries
+            self._max_num_entries = num_entries
+
+    def put(self, key: str, value: V) -> None:
+        """Stores a value
+
+        Args:
+            key (str): cache key
+            value: value to store
+        """
+        self.put_many([(key, value)])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Header of the index files: size of the JSON Lines file the index covers
+HEADER_FORMAT = '<Q'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def hash_line(line: str) -> int:
+    """
+    Get the 64-bit content hash of a JSON line, independent of the order of its keys.
+
+    Parameters:
+    line (str): JSON line, invalid JSON is hashed as is
+
+    Returns:
+    int: content hash
+    """
+    try:
+        content = json.dumps(json.loads(line), sort_keys=True)
+    except json.JSONDecodeError:
+        content = line.strip()
+    return int.from_bytes(hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def read_index_file(index_path: str, typecode: str, expected_size: int) -> Optional[array]:
+    """
+    Read an index file, if it covers the JSON Lines file at its current size.
+
+    Parameters:
+    index_path (str): path of the index file
+    typecode (str): array typecode of the index values
+    expected_size (int): current size of the JSON Lines file
+
+    Returns:
+    array: index values, or None if the index is missing or stale
+    """
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or struct.unpack(HEADER_FORMAT, header)[0] != expected_size:
+            return None
+        values = array(typecode)
+        values.frombytes(f.read())
+    return values
+
+
+def append_index_file(index_path: str, values: array, covered_size: int) -> None:
+    """
+    Append values to an index file and record the size of the JSON Lines file it covers.
+
+    Parameters:
+    index_path (str): path of the index file
+    values (array): index values to append
+    covered_size (int): size of the JSON Lines file once the lines of the values are written
+    """
+    if not os.path.exists(index_path):
+        with open(index_path, 'wb') as f:
+            f.write(struct.pack(HEADER_FORMAT, 0))
+    with open(index_path, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        f.write(values.tobytes())
+        f.seek(0)
+        f.write(struct.pack(HEADER_FORMAT, covered_size))
+
+
+class MinHashLSH:
+    """
+    Near-duplicate filter of texts, using MinHash signatures of their word shingles and locality sensitive hashing.
+
+    Signatures are split in bands, and texts sharing a band are compared on their signatures, whose agreement
+    estimates the Jaccard similarity of their shingles.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 3) -> None:
+        """
+        Parameters:
+        threshold (float): estimated Jaccard similarity above which texts are near-duplicates
+        num_perm (int): number of hash permutations of the signatures, a multiple of `bands`
+        bands (int): number of bands of the signatures
+        shingle_size (int): number of words per shingle
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f'num_perm must be a multiple of bands. Got {num_perm} and {bands}')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(1)
+        self._a = generator.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._signatures: List[np.ndarray] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [dict() for _ in range(bands)]
+
+    def signature(self, text: str) -> np.ndarray:
+        """Get the MinHash signature of a text"""
+        words = re.findall(r'\w+', text.casefold())
+        shingles = {
+            ' '.join(words[i : i + self.shingle_size]) for i in range(max(len(words) - self.shingle_size + 1, 1))
+        }
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles],
+            dtype=np.uint64,
+        )
+        # uint64 products wrap around, as in the usual MinHash implementations
+        permuted = ((np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def is_near_duplicate(self, signature: np.ndarray) -> bool:
+        """Check whether a signature is a near-duplicate of an indexed one"""
+        candidates: Set[int] = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, []))
+        return any(np.mean(self._signatures[idx] == signature) >= self.threshold for idx in candidates)
+
+    def add(self, signature: np.ndarray) -> None:
+        """Index a signature"""
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(idx)
+
+
+class JsonlDedupIndex:
+    """
+    Persistent deduplication index of a JSON Lines file, checked when lines are appended.
+
+    The 64-bit content hashes of the lines are stored in `<file>.dedup`, so the file itself is never loaded in
+    memory and keeps its order. With a near-duplicate threshold, the MinHash signatures of a text of each line,
+    e.g. its question, are stored in `<file>.minhash`. Both files record the size of the JSON Lines file they cover,
+    and the hashes are rebuilt by streaming the file if it was modified outside the index.
+    """
+
+    def __init__(self, file_path: str, near_duplicate_threshold: Optional[float] = None) -> None:
+        """
+        Parameters:
+        file_path (str): path of the JSON Lines file
+        near_duplicate_threshold (Optional[float], optional): estimated Jaccard similarity above which the texts of
+            two lines are near-duplicates, None to only remove exact duplicates
+        """
+        self.file_path = file_path
+        self.hashes_path = f'{file_path}.dedup'
+        self.signatures_path = f'{file_path}.minhash'
+        file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+
+        hashes = read_index_file(self.hashes_path, 'Q', file_size)
+        if hashes is None:
+            hashes = self._rebuild_hashes(file_size)
+        self._hashes: Set[int] = set(hashes)
+
+        self.near_duplicates: Optional[MinHashLSH] = None
+        if near_duplicate_threshold is not None:
+            self.near_duplicates = MinHashLSH(threshold=near_duplicate_threshold)
+            signatures = read_index_file(self.signatures_path, 'I', file_size)
+            if signatures is None:
+                if file_size > 0:
+                    logging.warning(f'No near-duplicate index for {file_path}, only new lines will be compared')
+                with open(self.signatures_path, 'wb') as f:
+                    f.write(struct.pack(HEADER_FORMAT, file_size))
+                signatures = array('I')
+            num_perm = self.near_duplicates.num_perm
+            for i in range(0, len(signatures), num_perm):
+                self.near_duplicates.add(np.array(signatures[i : i + num_perm], dtype=np.uint32))
+
+    def _rebuild_hashes(self, file_size: int) -> array:
+        """Rebuild the hashes index by streaming the JSON Lines file"""
+        hashes = array('Q')
+        if file_size > 0:
+            logging.info(f'Building the deduplication index of {self.file_path}')
+            with open(self.file_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        hashes.append(hash_line(line))
+        with open(self.hashes_path, 'wb') as f:
+            f.write(struct.pack(HEADER_FORMAT, file_size))
+            f.write(hashes.tobytes())
+        return hashes
+
+    def append(self, lines: List[str], texts: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        Append the lines that are not duplicates to the JSON Lines file, and index them.
+
+        Parameters:
+        lines (list): JSON lines to append
+        texts (Optional[list], optional): text of each line compared by the near-duplicate filter. Defaults to the
+            lines themselves.
+
+        Returns:
+        tuple: number of lines appended and number of duplicate lines skipped
+        """
+        new_lines = []
+        new_hashes = array('Q')
+        new_signatures = array('I')
+        for idx, line in enumerate(lines):
+            line_hash = hash_line(line)
+            if line_hash in self._hashes:
+                continue
+            if self.near_duplicates is not None:
+                signature = self.near_duplicates.signature(texts[idx] if texts is not None else line)
+                if self.near_duplicates.is_near_duplicate(signature):
+                    continue
+                self.near_duplicates.add(signature)
+                new_signatures.extend(signature.tolist())
+            self._hashes.add(line_hash)
+            new_lines.append(line)
+            new_hashes.append(line_hash)
+
+        if len(new_lines) > 0:
+            with open(self.file_path, 'a') as f:
+                f.write('\n'.join(new_lines) + '\n')
+        file_size = os.path.getsize(self.file_path) if os.path.exists(self.file_path) else 0
+        append_index_file(self.hashes_path, new_hashes, file_size)
+        if self.near_duplicates is not None:
+            append_index_file(self.signatures_path, new_signatures, file_size)
+        return len(new_lines), len(lines) - len(new_lines)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
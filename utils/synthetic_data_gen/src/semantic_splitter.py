@@ -0,0 +1,130 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+SENTENCE_SPLIT_REGEX = r'(?<=[.?!])\s+'
+
+
+class BatchedSemanticSplitter:
+    """
+    Semantic text splitter with the percentile breakpoints of LangChain's `SemanticChunker`, embedding the sentences of
+    all the documents together.
+
+    Each sentence is embedded with its neighbours, the unique sentence windows of all the documents are embedded in
+    large batches sent concurrently, and the distances between consecutive windows and their percentiles are computed
+    with NumPy. Wrapping the embeddings in a `CachedEmbeddings` client makes re-splitting a corpus, e.g. with another
+    `breakpoint_threshold_amount`, free of embedding calls.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        breakpoint_threshold_amount: float = 95,
+        sentence_split_regex: str = SENTENCE_SPLIT_REGEX,
+        buffer_size: int = 1,
+        batch_size: int = 512,
+        max_workers: int = 4,
+    ) -> None:
+        """
+        Parameters:
+        embeddings (Embeddings): embeddings client used to embed the sentences
+        breakpoint_threshold_amount (float): percentile of the distances between consecutive sentences above which
+            the text is split
+        sentence_split_regex (str): regex splitting the text in sentences
+        buffer_size (int): number of sentences before and after each sentence embedded with it
+        batch_size (int): number of sentence windows per embedding call
+        max_workers (int): number of embedding calls sent concurrently
+        """
+        self.embeddings = embeddings
+        self.breakpoint_threshold_amount = breakpoint_threshold_amount
+        self.sentence_split_regex = sentence_split_regex
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def _get_sentence_windows(self, sentences: List[str]) -> List[str]:
+        """Get each sentence combined with its `buffer_size` neighbours"""
+        return [
+            ' '.join(sentences[max(i - self.buffer_size, 0) : i + self.buffer_size + 1]) for i in range(len(sentences))
+        ]
+
+    def _embed(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Embed unique texts in concurrent batches, returning their normalized vectors"""
+        unique_texts = list(dict.fromkeys(texts))
+        batches = [unique_texts[i : i + self.batch_size] for i in range(0, len(unique_texts), self.batch_size)]
+        logging.info(f'embedding {len(unique_texts)} sentences in {len(batches)} batches')
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            batch_vectors = list(executor.map(self.embeddings.embed_documents, batches))
+
+        vectors: Dict[str, np.ndarray] = {}
+        for batch, batch_vector in zip(batches, batch_vectors):
+            matrix = np.asarray(batch_vector, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+            vectors.update(zip(batch, matrix))
+        return vectors
+
+    def _split_sentences(
+        self, sentences: List[str], windows: List[str], vectors: Dict[str, np.ndarray], min_chunk_size: Optional[int]
+    ) -> List[str]:
+        """Split the sentences of a text at the distances above the breakpoint percentile"""
+        if len(sentences) == 1:
+            return sentences
+        matrix = np.stack([vectors[window] for window in windows])
+        # cosine distance between consecutive windows
+        distances = 1.0 - np.einsum('ij,ij->i', matrix[:-1], matrix[1:])
+        threshold = np.percentile(distances, self.breakpoint_threshold_amount)
+        breakpoints = np.flatnonzero(distances > threshold)
+
+        chunks = []
+        start = 0
+        for idx in breakpoints:
+            chunk = ' '.join(sentences[start : idx + 1])
+            # like SemanticChunker, a too short chunk is merged with the next one
+            if min_chunk_size is not None and len(chunk) < min_chunk_size:
+                continue
+            chunks.append(chunk)
+            start = idx + 1
+        if start < len(sentences):
+            chunks.append(' '.join(sentences[start:]))
+        return chunks
+
+    def split_texts(self, texts: List[str], min_chunk_size: Optional[int] = None) -> List[List[str]]:
+        """
+        Split texts into semantically coherent chunks.
+
+        Parameters:
+        texts (List[str]): texts to split
+        min_chunk_size (Optional[int], optional): minimum number of characters of a chunk. Defaults to None.
+
+        Returns:
+        List[List[str]]: chunks of each text
+        """
+        sentences_list = [re.split(self.sentence_split_regex, text) for text in texts]
+        windows_list = [self._get_sentence_windows(sentences) for sentences in sentences_list]
+        vectors = self._embed([window for windows in windows_list if len(windows) > 1 for window in windows])
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda args: self._split_sentences(*args, vectors, min_chunk_size),
+                    zip(sentences_list, windows_list),
+                )
+            )
+
+    def create_documents(self, texts: List[str], min_chunk_size: Optional[int] = None) -> List[Document]:
+        """
+        Split texts into semantically coherent chunks, as documents.
+
+        Parameters:
+        texts (List[str]): texts to split
+        min_chunk_size (Optional[int], optional): minimum number of characters of a chunk. Defaults to None.
+
+        Returns:
+        List[Document]: chunks of all the texts, in order
+        """
+        return [Document(page_content=chunk) for chunks in self.split_texts(texts, min_chunk_size) for chunk in chunks]
@@ -1,8 +1,12 @@
+import hashlib
 import json
 import logging
 import os
 import sys
-from typing import Any, Dict, List, Optional, Union
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set, Union
 
 import yaml
 from dotenv import load_dotenv
@@ -11,7 +15,6 @@ from langchain_community.embeddings import HuggingFaceInstructEmbeddings
 from langchain_community.llms.sambanova import SambaStudio
 from langchain_core.documents import Document
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_experimental.text_splitter import SemanticChunker
 from pydantic import BaseModel, Field
 
 logging.basicConfig(
@@ -27,8 +30,11 @@ sys.path.append(utils_dir)
 sys.path.append(repo_dir)
 
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.embedding_cache import CachedEmbeddings
 from utils.model_wrappers.langchain_embeddings import SambaStudioEmbeddings
 from utils.model_wrappers.langchain_llms import SambaNovaCloud
+from utils.synthetic_data_gen.src.dedup import JsonlDedupIndex, hash_line
+from utils.synthetic_data_gen.src.semantic_splitter import BatchedSemanticSplitter
 
 load_dotenv(os.path.join(repo_dir, '.env'))
 
@@ -48,6 +54,30 @@ class SyntheticData(BaseModel):
     data: List[SyntheticDatum] = Field(description='synthetic data pairs')
 
 
+class RateLimiter:
+    """Thread safe limiter spacing out the start of requests to a maximum rate"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None) -> None:
+        """
+        Parameters:
+        requests_per_minute (Optional[float], optional): maximum number of requests per minute, None for no limit.
+        """
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else None
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until the next request may start"""
+        if self.interval is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
 class SyntheticDataGen:
     """Class for generating synthetic data"""
 
@@ -74,6 +104,11 @@ class SyntheticDataGen:
         self.prompts = config['prompts']
         self.generation_config = config['generation']
         self.splitting_config = config['splitting']
+        # Set the QA generation chain once, it is shared by all the concurrent generations
+        self.qa_generate_chain = self.set_qa_generate_chain()
+        self.rate_limiter = RateLimiter(self.generation_config['requests_per_minute'])
+        # Deduplication indexes of the JSON Lines files, by path
+        self.dedup_indexes: Dict[str, JsonlDedupIndex] = {}
 
     def load_config(self, config_file: str) -> Any:
         """
@@ -111,12 +146,28 @@ class SyntheticDataGen:
         )
         return llm
 
-    def set_embedding_model(self) -> Union[SambaStudioEmbeddings, HuggingFaceInstructEmbeddings]:
+    def set_qa_generate_chain(self) -> Any:
+        """
+        Set the chain generating question answer pairs from a context.
+
+        Parameters:
+        None
+
+        Returns:
+        Runnable: prompt, LLM and JSON parser chain
+        """
+        prompt = load_prompt(os.path.join(utils_dir, 'synthetic_data_gen', self.prompts['generate_qa_prompt']))
+        synthetic_datum_parser = JsonOutputParser(pydantic_object=SyntheticData)
+        return prompt | self.llm | synthetic_datum_parser
+
+    def set_embedding_model(self) -> Union[SambaStudioEmbeddings, HuggingFaceInstructEmbeddings, CachedEmbeddings]:
+        # With a cache directory, the sentence embeddings are reused across runs and splitting thresholds
         embedding_model = APIGateway.load_embedding_model(
             type=self.embedding_model_info['type'],
             batch_size=self.embedding_model_info['batch_size'],
             bundle=self.embedding_model_info['bundle'],
             select_expert=self.embedding_model_info['select_expert'],
+            cache_dir=self.embedding_model_info.get('cache_dir'),
         )
         return embedding_model
 
@@ -129,6 +180,8 @@ class SyntheticDataGen:
         """
         Split large documents into smaller chunks based on semantic similarity.
 
+        The sentences of all the documents are embedded together in batches, see `BatchedSemanticSplitter`.
+
         Parameters:
         documents (Union[list, str]): A single string document or a list of string documents to be split.
         breakpoint_threshold_amount (int, optional): The threshold for determining the breakpoint in the document.
@@ -142,11 +195,11 @@ class SyntheticDataGen:
         # TODO add recursive character splitting first
         if isinstance(documents, str):
             documents = [documents]
-        text_splitter = SemanticChunker(
+        text_splitter = BatchedSemanticSplitter(
             embeddings=self.embedding_model,
-            breakpoint_threshold_type='percentile',
             breakpoint_threshold_amount=breakpoint_threshold_amount,
-            sentence_split_regex=r'(?<=[.?!])\s+',
+            batch_size=self.splitting_config['embedding_batch_size'],
+            max_workers=self.splitting_config['max_workers'],
         )
         logging.info('splitting documents')
         new_docs = text_splitter.create_documents(documents)
@@ -164,10 +217,16 @@ class SyntheticDataGen:
         out_file: Optional[str] = None,
         breakpoint_threshold_amount: Optional[int] = None,
         min_doc_length: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        resume: Optional[bool] = None,
     ) -> None:
         """
         Generate synthetic dataset in jsonl file for a given list of documents for LLM fine-tuning.
 
+        Chunks are generated concurrently, and each finished chunk is recorded in a progress file next to `out_file`,
+        so an interrupted run resumes from the chunks that were not finished.
+
         Parameters:
         documents (Union[list, str]): A single string document or a list of string documents.
         amount (Optional[int], optional): The number of question answer pairs to generate per document.
@@ -178,6 +237,9 @@ class SyntheticDataGen:
         breakpoint_threshold_amount (Optional[int], optional): The threshold for determining the breakpoint
             for splitting the original document.
         min_doc_length (Optional[int], optional): The minimum length for a document after splitting.
+        max_concurrency (Optional[int], optional): The maximum number of chunks generated concurrently.
+        max_retries (Optional[int], optional): The number of retries of a failing chunk before skipping it.
+        resume (Optional[bool], optional): Whether to skip the chunks finished by a previous interrupted run.
 
         Returns:
             None
@@ -196,29 +258,202 @@ class SyntheticDataGen:
             breakpoint_threshold_amount = self.splitting_config['breakpoint_threshold_amount']
         if min_doc_length is None:
             min_doc_length = self.splitting_config['min_doc_length']
+        if max_concurrency is None:
+            max_concurrency = self.generation_config['max_concurrency']
+        if max_retries is None:
+            max_retries = self.generation_config['max_retries']
+        if resume is None:
+            resume = self.generation_config['resume']
 
         if isinstance(documents, str):
             documents = [documents]
 
-        documents = self.split_documents(
-            documents=documents, breakpoint_threshold_amount=breakpoint_threshold_amount, min_doc_length=min_doc_length
+        chunks_path = f'{out_file}.chunks.json'
+        progress_path = f'{out_file}.progress.jsonl'
+        if not resume:
+            for path in [chunks_path, progress_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        documents = self.load_split_documents(
+            documents=documents,
+            breakpoint_threshold_amount=breakpoint_threshold_amount,
+            min_doc_length=min_doc_length,
+            chunks_path=chunks_path,
         )
+
+        # Skip the chunks finished by a previous run
+        finished_chunks = self.load_progress(progress_path)
+        pending_documents = {}
         for document in documents:
-            try:
-                qa_pairs = self.generate_qa_pairs(
+            chunk_key = self.get_chunk_key(
+                document.page_content, amount, include_context, include_thoughts, include_references
+            )
+            if chunk_key not in finished_chunks:
+                pending_documents[chunk_key] = document
+        if len(finished_chunks) > 0:
+            logging.info(f'Resuming generation, {len(pending_documents)} of {len(documents)} chunks remaining')
+
+        failed_chunks = 0
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                executor.submit(
+                    self.generate_qa_pairs_with_retries,
                     context=document.page_content,
                     amount=amount,
                     include_context=include_context,
                     include_thoughts=include_thoughts,
                     include_references=include_references,
-                )
+                    max_retries=max_retries,
+                ): chunk_key
+                for chunk_key, document in pending_documents.items()
+            }
+            # The generated pairs are written as each chunk finishes, then the chunk is marked as finished
+            for future in as_completed(futures):
+                chunk_key = futures[future]
+                try:
+                    qa_pairs = future.result()
+                except Exception as e:
+                    failed_chunks += 1
+                    logging.warning(
+                        f'Failed to generate qa pairs, error: \n {e} \n '
+                        f'for document: "{pending_documents[chunk_key]}", \nskipping'
+                    )
+                    continue
                 lines = self.qa_pairs_to_prompt_completion(qa_pairs)
-                self.update_jsonl(out_file, lines)  # type: ignore
-                logging.info(f'Added {amount} qa pairs to {out_file}')
-            except Exception as e:
-                logging.warning(f'Failed to generate qa pairs, error: \n {e} \n for document: "{document}", \nskipping')
+                self.update_jsonl(out_file, lines, texts=[qa_pair['question'] for qa_pair in qa_pairs])
+                self.update_jsonl(progress_path, [json.dumps({'chunk': chunk_key})], deduplicate=False)
+
+        if failed_chunks > 0:
+            logging.warning(f'{failed_chunks} chunks failed, run the generation again to resume them')
+        else:
+            # The generation is complete, so a new run starts from scratch
+            for path in [chunks_path, progress_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def load_split_documents(
+        self,
+        documents: List[str],
+        breakpoint_threshold_amount: int,
+        min_doc_length: Optional[int],
+        chunks_path: str,
+    ) -> List[Document]:
+        """
+        Split documents, reusing the chunks stored by a previous run on the same documents and splitting parameters.
+
+        Parameters:
+        documents (List[str]): A list of string documents to be split.
+        breakpoint_threshold_amount (int): The threshold for determining the breakpoint in the document.
+        min_doc_length (Optional[int]): The minimum length for a document chunk.
+        chunks_path (str): Path of the JSON file storing the chunks.
+
+        Returns:
+        List[Document]: A list of Document objects representing the splitted documents.
+        """
+        documents_key = hashlib.sha256(
+            json.dumps([documents, breakpoint_threshold_amount, min_doc_length]).encode('utf-8')
+        ).hexdigest()
+        if os.path.exists(chunks_path):
+            try:
+                with open(chunks_path, 'r') as f:
+                    stored_chunks = json.load(f)
+                if stored_chunks['documents_key'] == documents_key:
+                    logging.info(f'Loaded split documents from {chunks_path}')
+                    return [Document(page_content=chunk) for chunk in stored_chunks['chunks']]
+            except (OSError, ValueError, KeyError):
+                logging.warning(f'Invalid split documents file {chunks_path}, splitting documents again')
+
+        new_docs = self.split_documents(
+            documents=documents, breakpoint_threshold_amount=breakpoint_threshold_amount, min_doc_length=min_doc_length
+        )
+        if os.path.exists(os.path.dirname(chunks_path) or '.'):
+            with open(chunks_path, 'w') as f:
+                json.dump({'documents_key': documents_key, 'chunks': [doc.page_content for doc in new_docs]}, f)
+        return new_docs
+
+    def get_chunk_key(
+        self, context: str, amount: int, include_context: bool, include_thoughts: bool, include_references: bool
+    ) -> str:
+        """
+        Get the key identifying the generation of question answer pairs for a chunk in the progress file.
+
+        Parameters:
+        context (str): The context to generate question answer pairs from.
+        amount (int): The number of question answer pairs to generate.
+        include_context (bool): Whether to include the context in the result.
+        include_thoughts (bool): Whether to include the rezoning thought in result.
+        include_references (bool): Whether to include the references in the result.
+
+        Returns:
+        str: hash of the chunk and generation parameters
+        """
+        return hashlib.sha256(
+            json.dumps([context, amount, include_context, include_thoughts, include_references]).encode('utf-8')
+        ).hexdigest()
+
+    def load_progress(self, progress_path: str) -> Set[str]:
+        """
+        Load the keys of the chunks finished by a previous run.
+
+        Parameters:
+        progress_path (str): Path to the JSON Lines progress file.
+
+        Returns:
+        set: keys of the finished chunks
+        """
+        finished_chunks: Set[str] = set()
+        if not os.path.exists(progress_path):
+            return finished_chunks
+        with open(progress_path, 'r') as f:
+            for line in f:
+                try:
+                    finished_chunks.add(json.loads(line)['chunk'])
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # A line may be truncated if the previous run was interrupted while writing it
+                    continue
+        return finished_chunks
+
+    def generate_qa_pairs_with_retries(
+        self,
+        context: str,
+        amount: int = 5,
+        include_context: bool = True,
+        include_thoughts: bool = True,
+        include_references: bool = True,
+        max_retries: int = 3,
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate question answer pairs for a given context, retrying failed generations with exponential backoff.
+
+        Parameters:
+        context (str): The context to generate question answer pairs from.
+        amount (int, optional): The number of question answer pairs to generate. Defaults to 5.
+        include_context (bool, optional): Whether to include the context in the result. Defaults to True.
+        include_thoughts (bool, optional): Whether to include the rezoning thought in result. Defaults to True.
+        include_references (bool, optional): Whether to include the references in the result. Defaults to True.
+        max_retries (int, optional): The number of retries before giving up on the context. Defaults to 3.
 
-        self.remove_repeated_lines_in_place(out_file)
+        Returns:
+        list: A list of dictionaries containing the generated question answer pairs.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return self.generate_qa_pairs(
+                    context=context,
+                    amount=amount,
+                    include_context=include_context,
+                    include_thoughts=include_thoughts,
+                    include_references=include_references,
+                )
+            except Exception as e:
+                if attempt >= max_retries:
+                    raise
+                logging.info(f'Generation attempt {attempt + 1} failed, retrying, error: {e}')
+                time.sleep(2**attempt)
+                attempt += 1
 
     def generate_qa_pairs(
         self,
@@ -241,11 +476,8 @@ class SyntheticDataGen:
         Returns:
         dict: A dictionary containing the generated question answer pairs.
         """
-        prompt = load_prompt(os.path.join(utils_dir, 'synthetic_data_gen', self.prompts['generate_qa_prompt']))
-        synthetic_datum_parser = JsonOutputParser(pydantic_object=SyntheticData)
-        qa_generate_chain = prompt | self.llm | synthetic_datum_parser
         qa_pairs = []
-        generation = qa_generate_chain.invoke({'document': context, 'amount': amount})
+        generation = self.qa_generate_chain.invoke({'document': context, 'amount': amount})
         for datum in generation:
             qa_pair = {
                 'question': datum['question'],
@@ -258,13 +490,25 @@ class SyntheticDataGen:
             qa_pairs.append(qa_pair)
         return qa_pairs
 
-    def update_jsonl(self, file_path: str, new_lines: str) -> None:
+    def update_jsonl(
+        self,
+        file_path: str,
+        new_lines: List[str],
+        deduplicate: bool = True,
+        texts: Optional[List[str]] = None,
+    ) -> None:
         """
-        Update an existing jsonl file with new lines
+        Update an existing jsonl file with new lines, skipping the lines already in the file.
+
+        Duplicates are found with a persistent index of the content hashes of the lines stored next to the file,
+        and optionally with a near-duplicate filter over the texts of the lines, see `JsonlDedupIndex`.
 
         Parameters:
         file_path (str): Path to the JSON Lines file.
         new_lines (list): List of new lines to be added to the file.
+        deduplicate (bool, optional): Whether to skip the duplicate lines. Defaults to True.
+        texts (Optional[list], optional): Text of each new line compared by the near-duplicate filter,
+            e.g. its question. Defaults to the lines themselves.
 
         Returns:
         None
@@ -275,9 +519,18 @@ class SyntheticDataGen:
         if not os.path.exists(file_path):
             with open(file_path, 'w') as f:
                 f.write('')
-        with open(file_path, 'a') as f:
-            f.write('\n'.join(new_lines) + '\n')
-        logging.info(f'Updated {file_path} with new lines.')
+        if not deduplicate:
+            with open(file_path, 'a') as f:
+                f.write('\n'.join(new_lines) + '\n')
+            logging.info(f'Updated {file_path} with new lines.')
+            return
+
+        if file_path not in self.dedup_indexes:
+            self.dedup_indexes[file_path] = JsonlDedupIndex(
+                file_path, near_duplicate_threshold=self.generation_config.get('near_duplicate_threshold')
+            )
+        added_lines, skipped_lines = self.dedup_indexes[file_path].append(new_lines, texts)
+        logging.info(f'Updated {file_path} with {added_lines} new lines, skipped {skipped_lines} duplicates.')
 
     def qa_pairs_to_prompt_completion(self, qa_pairs: Union[List, Dict]) -> list:
         """
@@ -309,7 +562,9 @@ class SyntheticDataGen:
 
     def remove_repeated_lines_in_place(self, file_path: str) -> None:
         """
-        Remove repeated lines from a JSON Lines file and overwrite the original file.
+        Remove repeated lines from a JSON Lines file and overwrite the original file, keeping the order of the lines.
+
+        The file is streamed, only the content hashes of its lines are kept in memory.
 
         Parameters:
         file_path (str): Path to the JSON Lines file.
@@ -317,20 +572,24 @@ class SyntheticDataGen:
         Returns:
         None
         """
-        unique_lines = set()
+        unique_hashes = set()
+        tmp_path = f'{file_path}.tmp'
 
-        # Read the input file and collect unique lines
-        with open(file_path, 'r') as file:
+        # Stream the input file and write the first occurrence of each line
+        with open(file_path, 'r') as file, open(tmp_path, 'w') as outfile:
             for line in file:
                 try:
-                    json_object = json.loads(line)
-                    unique_lines.add(json.dumps(json_object, sort_keys=True))
+                    json.loads(line)
                 except json.JSONDecodeError:
                     logging.info(f'Invalid JSON line skipped: {line.strip()}')
-
-        # Write the unique lines back to the same file
-        with open(file_path, 'w') as outfile:
-            for unique_line in unique_lines:
-                outfile.write(unique_line + '\n')
+                    continue
+                line_hash = hash_line(line)
+                if line_hash not in unique_hashes:
+                    unique_hashes.add(line_hash)
+                    outfile.write(line.rstrip('\n') + '\n')
+        os.replace(tmp_path, file_path)
+
+        # The deduplication index no longer covers the rewritten file, it is rebuilt when next used
+        self.dedup_indexes.pop(file_path, None)
 
         logging.info(f'removed repeated lines, out file: {file_path}.')
@@ -17,10 +17,13 @@ Optional arguments:
 """
 
 import argparse
+import hashlib
+import json
 import logging
 import os
+import shutil
 import sys
-from typing import Any, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set
 
 from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import DirectoryLoader, UnstructuredURLLoader
@@ -37,10 +40,13 @@ sys.path.append(utils_dir)
 import uuid
 
 from utils.model_wrappers.api_gateway import APIGateway
+from utils.model_wrappers.embedding_cache import CachedEmbeddings
 
 EMBEDDING_MODEL = 'intfloat/e5-large-v2'
 NORMALIZE_EMBEDDINGS = True
 VECTORDB_LOG_FILE_NAME = 'vector_db.log'
+VECTORDB_MANIFEST_FILE_NAME = 'vdb_manifest.json'
+QDRANT_COLLECTION_NAME = 'test_collection'
 
 # Configure the logger
 logging.basicConfig(
@@ -71,15 +77,18 @@ class VectorDb:
         load_files: Load files from an input directory as langchain documents
         get_text_chunks: Get text chunks from a list of documents
         get_token_chunks: Get token chunks from a list of documents
+        get_chunk_ids: Get deterministic ids of chunks from their content
         create_vector_store: Create a vector store from chunks and an embedding model
         load_vdb: load a previous stored vector database
-        update_vdb: Update an existing vector store with new chunks
+        update_vdb: Update an existing vector store with the chunks of new, modified or deleted sources
         create_vdb: Create a vector database from the raw files in a specific input directory
     """
 
     def __init__(self) -> None:
         self.collection_id = str(uuid.uuid4())
         self.vector_collections: Set[Any] = set()
+        # local qdrant clients by database path, reused since a local database can only be opened by one client
+        self.qdrant_clients: Dict[str, Any] = {}
 
     def load_files(
         self,
@@ -178,6 +187,85 @@ class VectorDb:
 
         return chunks
 
+    @staticmethod
+    def get_chunk_ids(chunks: List[Any], source_key: str = 'source') -> List[str]:
+        """Gets deterministic ids of chunks from a hash of their content and source, so the same chunk always gets
+        the same id. Other metadata, e.g. parsing dates, is left out so it does not make unchanged chunks look changed.
+        Identical chunks get different ids by their order of appearance.
+
+        Args:
+            chunks (list): list of chunks
+            source_key (str): metadata key of the source of the chunks. Defaults to 'source'.
+
+        Returns:
+            list: UUID formatted chunk ids, valid for all the supported vector stores
+        """
+        chunk_ids = []
+        occurrences: Dict[str, int] = {}
+        for chunk in chunks:
+            content = json.dumps([chunk.page_content, str(chunk.metadata.get(source_key, ''))])
+            digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            occurrence = occurrences.get(digest, 0)
+            occurrences[digest] = occurrence + 1
+            if occurrence:
+                digest = hashlib.sha256(f'{digest}_{occurrence}'.encode('utf-8')).hexdigest()
+            chunk_ids.append(str(uuid.UUID(hex=digest[:32])))
+        return chunk_ids
+
+    @staticmethod
+    def load_manifest(db_path: str) -> Dict[str, Any]:
+        """Loads the manifest of a vector database, which maps each source to the ids of its chunks
+
+        Args:
+            db_path (str): path of the vector database
+
+        Returns:
+            dict: manifest with the db type, collection name and chunk ids per source. Empty if there is none.
+        """
+        manifest_path = os.path.join(db_path, VECTORDB_MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, 'r') as f:
+            manifest: Dict[str, Any] = json.load(f)
+        return manifest
+
+    @staticmethod
+    def save_manifest(db_path: str, manifest: Dict[str, Any]) -> None:
+        """Saves the manifest of a vector database, replacing the previous one only once it is fully written
+
+        Args:
+            db_path (str): path of the vector database
+            manifest (dict): manifest with the db type, collection name and chunk ids per source
+        """
+        os.makedirs(db_path, exist_ok=True)
+        manifest_path = os.path.join(db_path, VECTORDB_MANIFEST_FILE_NAME)
+        with open(f'{manifest_path}.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    @staticmethod
+    def get_cached_embeddings(embeddings: Any, cache_dir: Optional[str]) -> Any:
+        """Wraps an embedding model in a persistent cache of document embeddings, so unchanged chunks are only
+        embedded once across ingestions. Embeddings without a cache directory or already cached are returned as is.
+        """
+        if cache_dir is None or isinstance(embeddings, CachedEmbeddings):
+            return embeddings
+        return CachedEmbeddings(embeddings, cache_dir=cache_dir)
+
+    @staticmethod
+    def get_milvus_collection_name(collection_name: Optional[str]) -> str:
+        """Gets a valid Milvus collection name, which can only contain numbers, letters and underscores"""
+        return (collection_name or 'LangChainCollection').replace('-', '_')
+
+    @staticmethod
+    def _group_chunk_ids_by_source(
+        chunks: List[Any], chunk_ids: List[str], source_key: str
+    ) -> Dict[str, Dict[str, Any]]:
+        sources: Dict[str, Dict[str, Any]] = {}
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            sources.setdefault(str(chunk.metadata.get(source_key, '')), {})[chunk_id] = chunk
+        return sources
+
     def create_vector_store(
         self,
         chunks: list,
@@ -185,55 +273,83 @@ class VectorDb:
         db_type: str,
         output_db: Optional[str] = None,
         collection_name: Optional[str] = None,
+        source_key: str = 'source',
+        cache_dir: Optional[str] = None,
     ) -> Any:
-        """Creates a vector store
+        """Creates a vector store. Chunks get deterministic ids, and when the vector store is saved a manifest
+        mapping each source to its chunk ids is saved with it, so it can be updated incrementally with `update_vdb`.
+        A persisted chroma collection that already exists is updated that way too, instead of being recreated.
 
         Args:
             chunks (list): list of chunks
             embeddings (HuggingFaceInstructEmbeddings): embedding model
             db_type (str): vector db type
             output_db (str, optional): output path to save the vector db. Defaults to None.
+            collection_name (str, optional): collection name. Defaults to a new unique name.
+            source_key (str): metadata key of the source of the chunks. Defaults to 'source'.
+            cache_dir (str, optional): directory of a persistent cache of the chunk embeddings. Defaults to no cache.
         """
         if collection_name is None:
             collection_name = f'collection_{self.collection_id}'
             logger.info(f'This is the collection name: {collection_name}')
+        embeddings = self.get_cached_embeddings(embeddings, cache_dir)
+
+        chunk_ids = self.get_chunk_ids(chunks, source_key)
 
         vector_store: FAISS | Qdrant | Chroma | Milvus
         if db_type == 'faiss':
-            vector_store = FAISS.from_documents(documents=chunks, embedding=embeddings)
+            vector_store = FAISS.from_documents(documents=chunks, embedding=embeddings, ids=chunk_ids)
             if output_db:
                 vector_store.save_local(output_db)
 
         elif db_type == 'chroma':
+            self.vector_collections.add(collection_name)
             if output_db:
-                vector_store = Chroma()
-                vector_store.delete_collection()
-                vector_store = Chroma.from_documents(
-                    documents=chunks, embedding=embeddings, persist_directory=output_db, collection_name=collection_name
+                # A persisted collection is updated in place instead of being recreated, so only its new or changed
+                # chunks are embedded, and the sources it no longer has are deleted
+                manifest = self.load_manifest(output_db)
+                previous_sources = (
+                    manifest.get('sources', {}) if manifest.get('collection_name') == collection_name else {}
                 )
-            else:
-                vector_store = Chroma()
-                vector_store.delete_collection()
-                vector_store = Chroma.from_documents(
-                    documents=chunks, embedding=embeddings, collection_name=collection_name
+                chunk_sources = {str(chunk.metadata.get(source_key, '')) for chunk in chunks}
+                return self.update_vdb(
+                    chunks,
+                    embeddings,
+                    db_type,
+                    output_db=output_db,
+                    collection_name=collection_name,
+                    deleted_sources=[source for source in previous_sources if source not in chunk_sources],
+                    source_key=source_key,
+                    cache_dir=cache_dir,
                 )
-            self.vector_collections.add(collection_name)
+            vector_store = Chroma.from_documents(
+                documents=chunks, embedding=embeddings, ids=chunk_ids, collection_name=collection_name
+            )
 
         elif db_type == 'qdrant':
+            collection_name = QDRANT_COLLECTION_NAME
             if output_db:
+                # release the lock of a client opened on this database before reopening it
+                client = self.qdrant_clients.pop(os.path.abspath(output_db), None)
+                if client is not None:
+                    client.close()
                 vector_store = Qdrant.from_documents(
                     documents=chunks,
                     embedding=embeddings,
+                    ids=chunk_ids,
                     path=output_db,
-                    collection_name='test_collection',
+                    collection_name=collection_name,
                 )
+                self.qdrant_clients[os.path.abspath(output_db)] = vector_store.client
             else:
                 vector_store = Qdrant.from_documents(
                     documents=chunks,
                     embedding=embeddings,
-                    collection_name='test_collection',
+                    ids=chunk_ids,
+                    collection_name=collection_name,
                 )
         elif db_type == 'milvus':
+            collection_name = self.get_milvus_collection_name(collection_name)
             if output_db:
                 os.makedirs(output_db, exist_ok=True)
                 uri = os.path.join(output_db, 'milvus.db')
@@ -243,6 +359,7 @@ class VectorDb:
             vector_store = Milvus.from_documents(
                 documents=chunks,
                 embedding=embeddings,
+                ids=chunk_ids,
                 collection_name=collection_name,
                 connection_args={'uri': uri},
                 index_params={
@@ -252,6 +369,17 @@ class VectorDb:
                 },
             )
 
+        if output_db:
+            sources = self._group_chunk_ids_by_source(chunks, chunk_ids, source_key)
+            self.save_manifest(
+                output_db,
+                {
+                    'db_type': db_type,
+                    'collection_name': collection_name,
+                    'sources': {source: list(source_chunks) for source, source_chunks in sources.items()},
+                },
+            )
+
         logger.info(f'Vector store saved to {output_db}')
 
         return vector_store
@@ -279,8 +407,7 @@ class VectorDb:
             # TODO: Implement Qdrant loading
             pass
         elif db_type == 'milvus':
-            if collection_name is None:
-                collection_name = 'LangChainCollection'
+            collection_name = self.get_milvus_collection_name(collection_name)
             if persist_directory.endswith('.db'):
                 persist_directory = os.path.dirname(persist_directory)
             uri = os.path.join(persist_directory, 'milvus.db')
@@ -301,6 +428,36 @@ class VectorDb:
 
         return vector_store
 
+    def _load_vdb_for_update(
+        self, db_path: str, embeddings: Any, db_type: str, collection_name: Optional[str]
+    ) -> Optional[Any]:
+        """Loads a vector store to update, or returns None if the database has not been created yet"""
+        if db_type == 'faiss':
+            if not os.path.exists(os.path.join(db_path, 'index.faiss')):
+                return None
+        elif db_type == 'chroma':
+            # a named persisted collection is created when it is loaded
+            if collection_name is None and not os.path.exists(db_path):
+                return None
+        elif db_type == 'qdrant':
+            from qdrant_client import QdrantClient
+
+            client = self.qdrant_clients.get(os.path.abspath(db_path))
+            if client is None:
+                client = QdrantClient(path=db_path)
+                self.qdrant_clients[os.path.abspath(db_path)] = client
+            if not client.collection_exists(collection_name or QDRANT_COLLECTION_NAME):
+                return None
+            return Qdrant(
+                client=client, collection_name=collection_name or QDRANT_COLLECTION_NAME, embeddings=embeddings
+            )
+        elif db_type == 'milvus':
+            if not os.path.exists(os.path.join(db_path, 'milvus.db')):
+                return None
+        else:
+            raise ValueError(f'Unsupported database type: {db_type}')
+        return self.load_vdb(db_path, embeddings, db_type, collection_name)
+
     def update_vdb(
         self,
         chunks: List[Any],
@@ -308,23 +465,90 @@ class VectorDb:
         db_type: str,
         input_db: Optional[str] = None,
         output_db: Optional[str] = None,
+        collection_name: Optional[str] = None,
+        deleted_sources: Optional[List[str]] = None,
+        source_key: str = 'source',
+        cache_dir: Optional[str] = None,
     ) -> Any:
+        """Updates a vector database incrementally. Chunks are compared by their content hash ids with the ones in the
+        manifest of the database, so for each source in `chunks` only new or changed chunks are embedded and added,
+        and the chunks the source no longer has are deleted. Sources not in `chunks` are kept as they are, unless
+        they are listed in `deleted_sources`.
+
+        Args:
+            chunks (list): chunks of the new or modified sources
+            embeddings (HuggingFaceInstructEmbeddings): embedding model
+            db_type (str): vector db type
+            input_db (str, optional): path of the vector db to update. Defaults to `output_db`.
+            output_db (str, optional): path to save the updated vector db. Defaults to `input_db`, updating in place.
+            collection_name (str, optional): collection name. Defaults to the one in the manifest.
+            deleted_sources (list, optional): sources whose chunks are all deleted
+            source_key (str): metadata key of the source of the chunks. Defaults to 'source'.
+            cache_dir (str, optional): directory of a persistent cache of the chunk embeddings. Defaults to no cache.
+
+        Returns:
+            updated vector store
+        """
+        if input_db is None and output_db is None:
+            raise ValueError('input_db or output_db must be provided to update a vector database')
+        embeddings = self.get_cached_embeddings(embeddings, cache_dir)
+        db_path = output_db or input_db
+        assert db_path is not None
+        if input_db and output_db and os.path.abspath(input_db) != os.path.abspath(output_db):
+            shutil.copytree(input_db, output_db, dirs_exist_ok=True)
+
+        manifest = self.load_manifest(db_path)
+        if not manifest and os.path.exists(db_path):
+            logger.warning(
+                f'No manifest found in {db_path}, all the chunks will be added. Chunks of vector databases created '
+                'without a manifest can not be replaced or deleted.'
+            )
+        if manifest.get('db_type', db_type) != db_type:
+            raise ValueError(f'{db_path} is a {manifest["db_type"]} vector database, not {db_type}')
+        if collection_name and manifest.get('collection_name', collection_name) != collection_name:
+            logger.info(f'The manifest of {db_path} is for another collection, all the chunks will be added')
+            manifest['sources'] = {}
+        collection_name = collection_name or manifest.get('collection_name')
+        sources: Dict[str, List[str]] = manifest.get('sources', {})
+
+        vector_store = self._load_vdb_for_update(db_path, embeddings, db_type, collection_name)
+        if vector_store is None:
+            logger.info(f'No vector database found in {db_path}, creating a new one')
+            return self.create_vector_store(chunks, embeddings, db_type, db_path, collection_name, source_key)
+
+        # diff the chunk ids of each source against the manifest
+        new_sources = self._group_chunk_ids_by_source(chunks, self.get_chunk_ids(chunks, source_key), source_key)
+        ids_to_delete: List[str] = []
+        for source in deleted_sources or []:
+            ids_to_delete.extend(sources.pop(str(source), []))
+        chunks_to_add: Dict[str, Any] = {}
+        num_unchanged = 0
+        for source, source_chunks in new_sources.items():
+            previous_ids = set(sources.get(source, []))
+            ids_to_delete.extend(chunk_id for chunk_id in previous_ids if chunk_id not in source_chunks)
+            chunks_to_add.update(
+                (chunk_id, chunk) for chunk_id, chunk in source_chunks.items() if chunk_id not in previous_ids
+            )
+            num_unchanged += len(previous_ids.intersection(source_chunks))
+            sources[source] = list(source_chunks)
+
+        if ids_to_delete:
+            if db_type == 'faiss':
+                # FAISS raises on unknown ids, e.g. when the manifest is out of sync with the index
+                existing_ids = set(vector_store.index_to_docstore_id.values())
+                ids_to_delete = [chunk_id for chunk_id in ids_to_delete if chunk_id in existing_ids]
+            if ids_to_delete:
+                vector_store.delete(ids=ids_to_delete)
+        if chunks_to_add:
+            vector_store.add_documents(list(chunks_to_add.values()), ids=list(chunks_to_add))
         if db_type == 'faiss':
-            vector_store = FAISS.load_local(input_db, embeddings, allow_dangerous_deserialization=True)  # type: ignore
-            new_vector_store = self.create_vector_store(chunks, embeddings, db_type, None)
-            vector_store.merge_from(new_vector_store)
-            if output_db:
-                vector_store.save_local(output_db)
+            vector_store.save_local(db_path)
 
-        elif db_type == 'chroma':
-            # TODO implement update method for chroma
-            pass
-        elif db_type == 'qdrant':
-            # TODO implement update method for qdrant
-            pass
-        elif db_type == 'milvus':
-            # TODO implement update method for milvus
-            pass
+        self.save_manifest(db_path, {'db_type': db_type, 'collection_name': collection_name, 'sources': sources})
+        logger.info(
+            f'Vector store {db_path} updated: {len(chunks_to_add)} chunks added, {len(ids_to_delete)} deleted, '
+            f'{num_unchanged} unchanged'
+        )
 
         return vector_store
 
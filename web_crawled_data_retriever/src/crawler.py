@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urldefrag, urlencode, urlparse, urlunparse
+
+import httpx
+from langchain.docstore.document import Document
+
+logger = logging.getLogger(__name__)
+
+# lxml parses several times faster than the parser of the standard library, which is used when it is not installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/120.0.0.0 Safari/537.36'
+    ),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so the different spellings of a page are crawled once. The scheme and host are lowercased,
+    default ports and fragments are removed, an empty path becomes '/' and query parameters are sorted.
+
+    Args:
+        url (str): URL to normalize
+
+    Returns:
+        str: normalized URL
+    """
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = (parsed.hostname or '').lower()
+    if parsed.port is not None and parsed.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{parsed.port}'
+    if parsed.username:
+        credentials = parsed.username + (f':{parsed.password}' if parsed.password else '')
+        netloc = f'{credentials}@{netloc}'
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, query, ''))
+
+
+class FetchCache:
+    """On-disk cache of fetched pages with their ETag and Last-Modified validators.
+
+    Each page is stored as a JSON file named after the hash of its URL. Entries younger than `max_age` are served
+    without any request, older ones are revalidated with a conditional GET, so unchanged pages are not downloaded
+    again.
+    """
+
+    def __init__(self, cache_dir: str, max_age: float = 0.0) -> None:
+        """
+        Args:
+            cache_dir (str): directory where the pages are stored
+            max_age (float): age in seconds under which cached pages are used without revalidating them
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+
+    def _get_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Gets the cached entry of a URL, with its `content`, `etag`, `last_modified` and `fetched_at` fields"""
+        try:
+            with open(self._get_path(url), 'r') as cache_file:
+                entry: Dict[str, Any] = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def put(self, url: str, content: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Stores a page, replacing the cache file atomically so concurrent crawls never read a partial entry"""
+        path = self._get_path(url)
+        entry = {
+            'url': url,
+            'content': content,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+        }
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return bool(time.time() - entry['fetched_at'] < self.max_age)
+
+
+class AsyncCrawler:
+    """Breadth-first web crawler fetching the pages of the frontier concurrently.
+
+    Up to `max_concurrency` requests run at once, with at most `max_connections_per_host` of them and a delay of
+    `host_delay` seconds between request starts for any single host. URLs are deduplicated once normalized, and
+    links are extracted from the fetched pages in a worker pool while the other pages are downloaded.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_connections_per_host: int = 4,
+        host_delay: float = 0.0,
+        timeout: float = 30.0,
+        cache_dir: Optional[str] = None,
+        cache_max_age: float = 0.0,
+        parse_workers: int = 4,
+        verify_ssl: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Args:
+            max_concurrency (int): maximum number of concurrent requests
+            max_connections_per_host (int): maximum number of concurrent requests to the same host
+            host_delay (float): minimum time in seconds between the starts of two requests to the same host
+            timeout (float): timeout in seconds of each request
+            cache_dir (str, optional): directory of the fetch cache. Defaults to no cache.
+            cache_max_age (float): age in seconds under which cached pages are used without revalidating them
+            parse_workers (int): number of workers extracting links from the fetched pages
+            verify_ssl (bool): whether to verify the SSL certificates of the websites
+            headers (dict, optional): headers sent with each request. Defaults to `DEFAULT_HEADERS`.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_connections_per_host = max_connections_per_host
+        self.host_delay = host_delay
+        self.timeout = timeout
+        self.cache = FetchCache(cache_dir, cache_max_age) if cache_dir is not None else None
+        self.parse_workers = parse_workers
+        self.verify_ssl = verify_ssl
+        self.headers = headers or DEFAULT_HEADERS
+
+    async def _wait_for_host(self, host: str, host_state: Dict[str, Any]) -> None:
+        """Waits until a request to the host may start, given the time the previous one started"""
+        async with host_state['lock']:
+            wait_time = host_state['next_request_time'] - time.monotonic()
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+            host_state['next_request_time'] = time.monotonic() + self.host_delay
+
+    def get_fresh_content(self, url: str) -> Optional[str]:
+        """Gets the content of a page from the fetch cache if it is younger than the cache max age"""
+        if self.cache is None:
+            return None
+        entry = self.cache.get(url)
+        return entry['content'] if entry is not None and self.cache.is_fresh(entry) else None
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """Fetches the content of a page. Pages in the fetch cache are requested with a conditional GET, and their
+        cached content is used if they were not modified.
+
+        Args:
+            client (httpx.AsyncClient): HTTP client
+            url (str): URL of the page
+
+        Returns:
+            str: page content, or None if it could not be fetched
+        """
+        entry = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.warning(f'Error fetching {url}: {e!r}')
+            return None
+
+        if response.status_code == 304 and entry is not None:
+            content: str = entry['content']
+        elif response.is_success:
+            content = response.text
+        else:
+            logger.warning(f'Error fetching {url}: status code {response.status_code}')
+            return None
+        if self.cache is not None:
+            self.cache.put(url, content, response.headers.get('etag'), response.headers.get('last-modified'))
+        return content
+
+    async def crawl(
+        self,
+        urls: Set[str],
+        depth: int = 1,
+        max_pages: Optional[int] = None,
+        find_links: Optional[Callable[[List[Document]], Set[str]]] = None,
+        load_pdf: Optional[Callable[[str], List[Document]]] = None,
+    ) -> Tuple[List[Document], List[str]]:
+        """Crawls the given URLs and the pages they link to, up to a depth
+
+        Args:
+            urls (set): URLs to start from
+            depth (int): number of link levels to crawl, 1 only fetches the given URLs
+            max_pages (int, optional): maximum number of crawled URLs. Defaults to no limit.
+            find_links (callable, optional): function getting the links to follow from a list of fetched documents,
+                run in the worker pool. Required when depth is higher than 1.
+            load_pdf (callable, optional): function loading the documents of a PDF URL, run in the worker pool.
+                PDF URLs are skipped when not set.
+
+        Returns:
+            list: fetched documents, ordered by depth and discovery order
+            list: crawled URLs, including the ones that could not be fetched
+        """
+        if depth > 1 and find_links is None:
+            raise ValueError('find_links is required to crawl with a depth higher than 1')
+        loop = asyncio.get_running_loop()
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        hosts: Dict[str, Dict[str, Any]] = {}
+        seen: Set[str] = set()
+        crawled_urls: List[str] = []
+        results: Dict[int, Tuple[int, List[Document]]] = {}
+
+        async def crawl_url(
+            client: httpx.AsyncClient, executor: Executor, url: str, url_depth: int, idx: int
+        ) -> Tuple[int, int, List[Document], Set[str]]:
+            if url.lower().endswith('.pdf'):
+                if load_pdf is None:
+                    return idx, url_depth, [], set()
+                async with global_semaphore:
+                    return idx, url_depth, await loop.run_in_executor(executor, load_pdf, url), set()
+
+            host = urlparse(url).netloc
+            if host not in hosts:
+                hosts[host] = {
+                    'semaphore': asyncio.Semaphore(self.max_connections_per_host),
+                    'lock': asyncio.Lock(),
+                    'next_request_time': 0.0,
+                }
+            host_state = hosts[host]
+            content = self.get_fresh_content(url)
+            if content is None:
+                # the host delay is waited out before taking a global slot, so waiting hosts do not block the others
+                async with host_state['semaphore']:
+                    await self._wait_for_host(host, host_state)
+                    async with global_semaphore:
+                        content = await self.fetch(client, url)
+            if content is None:
+                return idx, url_depth, [], set()
+            docs = [Document(page_content=content, metadata={'source': url})]
+            links: Set[str] = set()
+            if url_depth < depth and find_links is not None:
+                links = await loop.run_in_executor(executor, find_links, docs)
+            return idx, url_depth, docs, links
+
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        async with httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=limits,
+            verify=self.verify_ssl,
+            follow_redirects=True,
+        ) as client:
+            with ThreadPoolExecutor(max_workers=self.parse_workers) as executor:
+                pending: Set[asyncio.Task[Tuple[int, int, List[Document], Set[str]]]] = set()
+
+                def schedule(new_urls: List[str], url_depth: int) -> None:
+                    for new_url in new_urls:
+                        normalized_url = normalize_url(new_url)
+                        if normalized_url in seen:
+                            continue
+                        if max_pages is not None and len(crawled_urls) >= max_pages:
+                            return
+                        seen.add(normalized_url)
+                        crawled_urls.append(new_url)
+                        pending.add(
+                            asyncio.create_task(crawl_url(client, executor, new_url, url_depth, len(crawled_urls) - 1))
+                        )
+
+                schedule(sorted(urls), 1)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        idx, url_depth, docs, links = task.result()
+                        results[idx] = (url_depth, docs)
+                        schedule(sorted(links), url_depth + 1)
+                    logger.debug(f'Crawled {len(results)}/{len(crawled_urls)} URLs')
+
+        logger.info(f'Crawled {len(crawled_urls)} URLs')
+        docs = [doc for idx in sorted(results, key=lambda idx: (results[idx][0], idx)) for doc in results[idx][1]]
+        return docs, crawled_urls
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import sys
+from functools import partial
 from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import urldefrag, urljoin, urlparse
 
@@ -9,7 +11,6 @@ from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from langchain.chains import RetrievalQA
 from langchain.docstore.document import Document
-from langchain.document_loaders import AsyncHtmlLoader
 from langchain.document_transformers import Html2TextTransformer
 from langchain.prompts import load_prompt
 from langchain_community.document_loaders import UnstructuredURLLoader
@@ -26,6 +27,7 @@ sys.path.append(repo_dir)
 from typing import Any, Dict, List
 
 from utils.vectordb.vector_db import VectorDb
+from web_crawled_data_retriever.src.crawler import HTML_PARSER, AsyncCrawler
 
 load_dotenv(os.path.join(repo_dir, '.env'))
 nest_asyncio.apply()
@@ -103,26 +105,24 @@ class WebCrawlingRetrieval:
         return docs
 
     @staticmethod
-    def load_htmls(urls: Set[str], extra_loaders: Optional[List[str]] = None) -> List[Document]:
+    def load_htmls(
+        urls: Set[str], extra_loaders: Optional[List[str]] = None, crawler: Optional[AsyncCrawler] = None
+    ) -> List[Document]:
         """
-        Load HTML documents from the given URLs.
+        Load HTML documents from the given URLs, fetching them concurrently.
         Args:
             urls (list): A list of URLs to load HTML documents from.
+            extra_loaders (list, optional): list of extra loaders to use, only 'pdf' is available.
+            crawler (AsyncCrawler, optional): crawler fetching the URLs. Defaults to one with default settings.
         Returns:
             list: A list of loaded HTML documents.
         """
         if extra_loaders is None:
             extra_loaders = []
-        docs = []
-        for url in urls:
-            if url.endswith('.pdf'):
-                if 'pdf' in extra_loaders:
-                    docs.extend(WebCrawlingRetrieval.load_remote_pdf(url))
-                else:
-                    continue
-            else:
-                loader = AsyncHtmlLoader(url, verify_ssl=False)
-                docs.extend(loader.load())
+        if crawler is None:
+            crawler = AsyncCrawler()
+        load_pdf = WebCrawlingRetrieval.load_remote_pdf if 'pdf' in extra_loaders else None
+        docs, _ = asyncio.run(crawler.crawl(urls, load_pdf=load_pdf))
         return docs
 
     @staticmethod
@@ -164,7 +164,7 @@ class WebCrawlingRetrieval:
             page_content = doc.page_content
             base_url = doc.metadata['source']
             # excluded_links.append(base_url) #enable this to prevent to crawl inside the same root website
-            soup = BeautifulSoup(page_content, 'html.parser')
+            soup = BeautifulSoup(page_content, HTML_PARSER)
             # Identify the main content section (customize based on HTML structure)
             main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content')
             if main_content:
@@ -193,12 +193,29 @@ class WebCrawlingRetrieval:
         docs = html2text_transformer.transform_documents(documents=docs)
         return docs
 
+    def get_crawler(self) -> AsyncCrawler:
+        """
+        Creates a crawler with the web crawling parameters of the config.
+        Returns:
+            AsyncCrawler: the crawler.
+        """
+        cache_dir = self.web_crawling_params['fetch_cache_dir']
+        return AsyncCrawler(
+            max_concurrency=self.web_crawling_params['max_concurrency'],
+            max_connections_per_host=self.web_crawling_params['max_connections_per_host'],
+            host_delay=self.web_crawling_params['host_delay'],
+            timeout=self.web_crawling_params['timeout'],
+            cache_dir=os.path.join(kit_dir, cache_dir) if cache_dir else None,
+            cache_max_age=self.web_crawling_params['fetch_cache_max_age'],
+            parse_workers=self.web_crawling_params['parse_workers'],
+        )
+
     def web_crawl(
         self, urls: Set[str], excluded_links: Optional[List[str]] = None, depth: int = 1
     ) -> Tuple[List[Document], List[str]]:
         """
         Perform web crawling, retrieve and clean HTML documents from the given URLs, with specified depth
-        of exploration.
+        of exploration. Pages are fetched concurrently as soon as they are discovered, and each URL is crawled once.
         Args:
             urls (list): A list of URLs to crawl.
             excluded_links (list, optional): A list of links to exclude from crawling. Defaults to None.
@@ -214,22 +231,15 @@ class WebCrawlingRetrieval:
             depth > self.web_crawling_params['max_depth']
         ):  # Max depth change with precaution number of sites grow exponentially
             depth = self.web_crawling_params['max_depth']
-        scraped_urls: List[Any] = []
-        raw_docs: List[Any] = []
-        for _ in range(depth):
-            if len(scraped_urls) + len(urls) >= self.web_crawling_params['max_scraped_websites']:
-                list_urls = list(urls)[: self.web_crawling_params['max_scraped_websites'] - len(scraped_urls)]
-                urls = set(list_urls)
-
-            scraped_docs = WebCrawlingRetrieval.load_htmls(urls, self.extra_loaders)
-            scraped_urls.extend(urls)
-            urls = WebCrawlingRetrieval.find_links(scraped_docs, excluded_links)
-
-            excluded_links.extend(scraped_urls)
-            raw_docs.extend(scraped_docs)
-
-            if len(scraped_urls) == self.web_crawling_params['max_scraped_websites']:
-                break
+        raw_docs, scraped_urls = asyncio.run(
+            self.get_crawler().crawl(
+                urls,
+                depth=depth,
+                max_pages=self.web_crawling_params['max_scraped_websites'],
+                find_links=partial(WebCrawlingRetrieval.find_links, excluded_links=excluded_links),
+                load_pdf=WebCrawlingRetrieval.load_remote_pdf if 'pdf' in self.extra_loaders else None,
+            )
+        )
 
         docs = WebCrawlingRetrieval.clean_docs(raw_docs)
         return docs, scraped_urls
@@ -249,6 +259,15 @@ class WebCrawlingRetrieval:
             process_prompt=False,
         )
 
+    def get_embedding_cache_dir(self) -> Optional[str]:
+        """
+        Gets the directory of the cache of the chunk embeddings set in the config.
+        Returns:
+            str: the cache directory, or None if the cache is disabled.
+        """
+        cache_dir = self.embedding_model_info.get('cache_dir')
+        return os.path.join(kit_dir, cache_dir) if cache_dir else None
+
     def create_load_vector_store(self, force_reload: bool = False, update: bool = False) -> None:
         """
         Create a vector store based on the given documents.
@@ -275,11 +294,12 @@ class WebCrawlingRetrieval:
             self.chunks = self.vectordb.get_text_chunks(
                 self.documents, self.retrieval_info['chunk_size'], self.retrieval_info['chunk_overlap']
             )
-            self.vector_store = self.vectordb.load_vdb(
-                persist_directory, self.embeddings, db_type=self.retrieval_info['db_type']
-            )
             self.vector_store = self.vectordb.update_vdb(
-                self.chunks, self.embeddings, self.retrieval_info['db_type'], persist_directory
+                self.chunks,
+                self.embeddings,
+                self.retrieval_info['db_type'],
+                persist_directory,
+                cache_dir=self.get_embedding_cache_dir(),
             )
 
         else:
@@ -288,7 +308,11 @@ class WebCrawlingRetrieval:
                 self.documents, self.retrieval_info['chunk_size'], self.retrieval_info['chunk_overlap']
             )
             self.vector_store = self.vectordb.create_vector_store(
-                self.chunks, self.embeddings, self.retrieval_info['db_type'], None
+                self.chunks,
+                self.embeddings,
+                self.retrieval_info['db_type'],
+                None,
+                cache_dir=self.get_embedding_cache_dir(),
             )
 
     def create_and_save_local(
@@ -314,12 +338,21 @@ class WebCrawlingRetrieval:
         if update:
             self.config['update'] = True
             self.vector_store = self.vectordb.update_vdb(
-                self.chunks, self.embeddings, self.retrieval_info['db_type'], input_directory, persist_directory
+                self.chunks,
+                self.embeddings,
+                self.retrieval_info['db_type'],
+                input_directory,
+                persist_directory,
+                cache_dir=self.get_embedding_cache_dir(),
             )
 
         else:
             self.vector_store = self.vectordb.create_vector_store(
-                self.chunks, self.embeddings, self.retrieval_info['db_type'], persist_directory
+                self.chunks,
+                self.embeddings,
+                self.retrieval_info['db_type'],
+                persist_directory,
+                cache_dir=self.get_embedding_cache_dir(),
             )
 
     def retrieval_qa_chain(self) -> RetrievalQA:
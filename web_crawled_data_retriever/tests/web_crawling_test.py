@@ -11,11 +11,15 @@ Returns:
     0 if all tests pass, or a positive integer representing the number of failed tests.
 """
 
+import asyncio
 import logging
 import os
 import sys
+import tempfile
+import threading
 import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,6 +38,7 @@ from typing import Any, Dict, List, Type
 from dotenv import load_dotenv
 from langchain.docstore.document import Document
 
+from web_crawled_data_retriever.src.crawler import AsyncCrawler, normalize_url
 from web_crawled_data_retriever.src.web_crawling_retriever import WebCrawlingRetrieval
 
 load_dotenv(os.path.join(repo_dir, '.env'))
@@ -110,6 +115,101 @@ class WebCrawlingTestCase(unittest.TestCase):
         logger.info(f'Total execution time: {total_time:.2f} seconds')
 
 
+# Pages of the local fixture website, each linking to the next level
+FIXTURE_PAGES = {
+    '/': ['/a', '/b', '/a#section', '/b?'],
+    '/a': ['/c', '/'],
+    '/b': ['/c', '/d'],
+    '/c': [],
+    '/d': [],
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    requests: List[str] = []
+
+    def do_GET(self) -> None:
+        FixtureHandler.requests.append(self.path)
+        path = self.path.split('?')[0]
+        if path not in FIXTURE_PAGES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{path}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        links = ''.join(f'<a href="{link}">{link}</a>' for link in FIXTURE_PAGES[path])
+        body = f'<html><body><main><p>page {path}</p>{links}</main></body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class AsyncCrawlerTestCase(unittest.TestCase):
+    server: ThreadingHTTPServer
+    base_url: str
+
+    @classmethod
+    def setUpClass(cls: Type['AsyncCrawlerTestCase']) -> None:
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    def setUp(self) -> None:
+        FixtureHandler.requests = []
+
+    def crawl(self, crawler: AsyncCrawler, depth: int, max_pages: Any = None) -> Any:
+        return asyncio.run(
+            crawler.crawl(
+                {self.base_url + '/'}, depth=depth, max_pages=max_pages, find_links=WebCrawlingRetrieval.find_links
+            )
+        )
+
+    def test_normalize_url(self) -> None:
+        self.assertEqual(normalize_url('HTTP://Example.com:80?b=1&a=2#top'), 'http://example.com/?a=2&b=1')
+        self.assertEqual(normalize_url('https://example.com:8443/x'), 'https://example.com:8443/x')
+
+    def test_crawl_depth_and_deduplication(self) -> None:
+        docs, urls = self.crawl(AsyncCrawler(), depth=3)
+        sources = [doc.metadata['source'] for doc in docs]
+        self.assertEqual(len(urls), 5, 'Each page should be crawled once')
+        self.assertEqual(sorted(FixtureHandler.requests), ['/', '/a', '/b', '/c', '/d'])
+        self.assertEqual(sources[0], self.base_url + '/', 'Documents should be ordered by depth')
+        self.assertEqual(set(sources[3:]), {self.base_url + '/c', self.base_url + '/d'})
+
+        docs, urls = self.crawl(AsyncCrawler(), depth=2, max_pages=2)
+        self.assertEqual(len(urls), 2, 'The number of crawled pages should be limited')
+
+    def test_conditional_get(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            docs, _ = self.crawl(AsyncCrawler(cache_dir=cache_dir), depth=2)
+            FixtureHandler.requests = []
+            cached_docs, _ = self.crawl(AsyncCrawler(cache_dir=cache_dir), depth=2)
+            self.assertEqual(len(FixtureHandler.requests), 3, 'Cached pages should be revalidated')
+            self.assertEqual(
+                [doc.page_content for doc in cached_docs],
+                [doc.page_content for doc in docs],
+                'Not modified pages should be read from the cache',
+            )
+
+            FixtureHandler.requests = []
+            self.crawl(AsyncCrawler(cache_dir=cache_dir, cache_max_age=3600), depth=2)
+            self.assertEqual(FixtureHandler.requests, [], 'Fresh cached pages should not be requested')
+
+    @classmethod
+    def tearDownClass(cls: Type['AsyncCrawlerTestCase']) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
 class CustomTextTestResult(unittest.TextTestResult):
     test_results: List[Dict[str, Any]]
 
@@ -131,7 +231,9 @@ class CustomTextTestResult(unittest.TextTestResult):
 
 
 def main() -> int:
-    suite = unittest.TestLoader().loadTestsFromTestCase(WebCrawlingTestCase)
+    suite = unittest.TestSuite()
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(AsyncCrawlerTestCase))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(WebCrawlingTestCase))
     test_result = unittest.TextTestRunner(resultclass=CustomTextTestResult).run(suite)
 
     logger.info('\nTest Results:')